@@ -4,41 +4,46 @@
 
 from typing import Any, Dict
 
-from .apiversion import Kind, Resource, parse_api_version
+from common.serialization import dump_fragment
+
+from .apiversion import Kind, Resource, get_kind_and_resource
 from .options import Options
 from .userinfo import UserInfo
 
 
 class AdmissionReviewRequest(object):
-    def __init__(self, obj: dict):
-        api_version = parse_api_version(obj['apiVersion'])
+    # Only per-object fields are stored on instances, fields that are the same for every
+    # admission review are class attributes and sub-objects are shared between instances
+    __slots__ = ('kind', 'resource', 'name', 'namespace', 'object', '_serialized')
 
-        # Random uid uniquely identifying this admission call
-        self.uid = ('705ab4f5-6393-11e8-b7cc-42010a800002',)
+    # Random uid uniquely identifying this admission call
+    uid = ('705ab4f5-6393-11e8-b7cc-42010a800002',)
 
-        # Fully-qualified group/version/kind of the incoming object
-        self.kind = Kind(api_version.group, api_version.version, obj['kind'])
+    # subresource, if the request is to a subresource
+    sub_resource = None
 
-        # Fully-qualified group/version/kind of the resource being modified
-        self.resource = Resource(api_version.group, api_version.version, obj['kind'])
+    # operation can be CREATE, UPDATE, DELETE, or CONNECT
+    operation = 'CREATE'
 
-        # subresource, if the request is to a subresource
-        self.sub_resource = None
+    user_info = UserInfo()
 
-        # Fully-qualified group/version/kind of the incoming object in the original request to the API server.
-        # This only differs from `kind` if the webhook specified `matchPolicy: Equivalent` and the
-        # original request to the API server was converted to a version the webhook registered for.
-        self.request_kind = self.kind
+    # oldObject is the existing object.
+    # It is null for CREATE and CONNECT operations.
+    oldObject = None
 
-        # Fully-qualified group/version/kind of the resource being modified in the original request to the API server.
-        # This only differs from `resource` if the webhook specified `matchPolicy: Equivalent` and the
-        # original request to the API server was converted to a version the webhook registered for.
-        self.request_resource = self.resource
+    # options contains the options for the operation being admitted, like meta.k8s.io/v1 CreateOptions, UpdateOptions, or DeleteOptions.
+    # It is null for CONNECT operations.
+    options = Options()
 
-        # subresource, if the request is to a subresource
-        # This only differs from `subResource` if the webhook specified `matchPolicy: Equivalent` and the
-        # original request to the API server was converted to a version the webhook registered for.
-        self.request_sub_resource = self.sub_resource
+    # dryRun indicates the API request is running in dry run mode and will not be persisted.
+    # Webhooks with side effects should avoid actuating those side effects when dryRun is true.
+    # See http://k8s.io/docs/reference/using-api/api-concepts/#make-a-dry-run-request for more details.
+    dryRun = False
+
+    def __init__(self, obj: dict):
+        # Fully-qualified group/version/kind of the incoming object and
+        # fully-qualified group/version/kind of the resource being modified
+        self.kind, self.resource = get_kind_and_resource(obj['apiVersion'], obj['kind'])
 
         # Name of the resource being modified
         self.name = obj['metadata']['name']
@@ -46,46 +51,67 @@ class AdmissionReviewRequest(object):
         # Namespace of the resource being modified, if the resource is namespaced (or is a Namespace object)
         self.namespace = obj['metadata'].get('namespace', '')
 
-        # operation can be CREATE, UPDATE, DELETE, or CONNECT
-        self.operation = 'CREATE'
-
-        self.user_info = UserInfo()
-
         # object is the new object being admitted.
         # It is null for DELETE operations.
         self.object = obj
 
-        # oldObject is the existing object.
-        # It is null for CREATE and CONNECT operations.
-        self.oldObject = None
+        # Serialized `review` fragments by encoding, see serialize()
+        self._serialized = None
 
-        # options contains the options for the operation being admitted, like meta.k8s.io/v1 CreateOptions, UpdateOptions, or DeleteOptions.
-        # It is null for CONNECT operations.
-        self.options = Options()
+    @property
+    def request_kind(self) -> Kind:
+        # Fully-qualified group/version/kind of the incoming object in the original request to the API server.
+        # This only differs from `kind` if the webhook specified `matchPolicy: Equivalent` and the
+        # original request to the API server was converted to a version the webhook registered for.
+        return self.kind
 
-        # dryRun indicates the API request is running in dry run mode and will not be persisted.
-        # Webhooks with side effects should avoid actuating those side effects when dryRun is true.
-        # See http://k8s.io/docs/reference/using-api/api-concepts/#make-a-dry-run-request for more details.
-        self.dryRun = False
+    @property
+    def request_resource(self) -> Resource:
+        # Fully-qualified group/version/kind of the resource being modified in the original request to the API server.
+        # This only differs from `resource` if the webhook specified `matchPolicy: Equivalent` and the
+        # original request to the API server was converted to a version the webhook registered for.
+        return self.resource
+
+    @property
+    def request_sub_resource(self):
+        # subresource, if the request is to a subresource
+        # This only differs from `subResource` if the webhook specified `matchPolicy: Equivalent` and the
+        # original request to the API server was converted to a version the webhook registered for.
+        return self.sub_resource
 
     def as_dict(self) -> Dict[str, Any]:
+        # requestKind and requestResource are the very same dicts as kind and resource, as they always were
+        kind = self.kind.as_dict()
+        resource = self.resource.as_dict()
         return {
             "uid": self.uid,
-            "kind": vars(self.kind),
-            "resource": vars(self.resource),
+            "kind": kind,
+            "resource": resource,
             "subResource": self.sub_resource,
-            "requestKind": vars(self.request_kind),
-            "requestResource": vars(self.request_resource),
+            "requestKind": kind,
+            "requestResource": resource,
             "requestSubResource": self.request_sub_resource,
             "name": self.name,
             "namespace": self.namespace,
             "operation": self.operation,
-            "userInfo": vars(self.user_info),
+            "userInfo": self.user_info.as_dict(),
             "object": self.object,
             "oldObject": self.oldObject,
-            "options": vars(self.options),
+            "options": self.options.as_dict(),
             "dryRun": self.dryRun,
         }
 
+    def serialize(self, encoding='yaml', cache=True) -> str:
+        # The review does not change once created, so it is serialized only once however many constraints it matches.
+        # Without cache the serialized review is not kept, memory stays bounded by what the caller holds.
+        if self._serialized is not None and encoding in self._serialized:
+            return self._serialized[encoding]
+        serialized = dump_fragment('review', self.as_dict(), encoding)
+        if cache:
+            if self._serialized is None:
+                self._serialized = {}
+            self._serialized[encoding] = serialized
+        return serialized
+
     def __repr__(self):
-        return str(self.as_dict())
\ No newline at end of file
+        return str(self.as_dict())
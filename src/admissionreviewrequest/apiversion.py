@@ -2,26 +2,52 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+
 class ApiVersion(object):
+    __slots__ = ('group', 'version')
+
     def __init__(self, group: str, version: str):
         self.group = group
         self.version = version
 
 
 class Kind(ApiVersion):
+    __slots__ = ('kind',)
+
     def __init__(self, group: str, version: str, kind: str):
         super().__init__(group, version)
         self.kind = kind
 
+    def as_dict(self) -> Dict[str, Any]:
+        return {'group': self.group, 'version': self.version, 'kind': self.kind}
+
 
 class Resource(ApiVersion):
+    __slots__ = ('resource',)
+
     def __init__(self, group: str, version: str, kind: str):
         super().__init__(group, version)
         self.resource = kind
 
+    def as_dict(self) -> Dict[str, Any]:
+        return {'group': self.group, 'version': self.version, 'resource': self.resource}
+
 
 def parse_api_version(api_version: str) -> ApiVersion:
     if '/' in api_version:
         return ApiVersion(*api_version.split('/', 1))
 
     return ApiVersion('', api_version)
+
+
+# Kind and Resource instances are shared by all objects of the same apiVersion and kind, they must not be modified
+@lru_cache(maxsize=None)
+def get_kind_and_resource(api_version: str, kind: str) -> Tuple[Kind, Resource]:
+    parsed_api_version = parse_api_version(api_version)
+    return (
+        Kind(parsed_api_version.group, parsed_api_version.version, kind),
+        Resource(parsed_api_version.group, parsed_api_version.version, kind),
+    )
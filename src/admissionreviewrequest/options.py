@@ -2,7 +2,15 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
+from typing import Any, Dict
+
+
 class Options(object):
+    __slots__ = ('api_version', 'kind')
+
     def __init__(self):
         self.api_version = 'meta.k8s.io/v1'
         self.kind = 'CreateOptions'
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'api_version': self.api_version, 'kind': self.kind}
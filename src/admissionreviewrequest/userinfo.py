@@ -2,7 +2,12 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
+from typing import Any, Dict
+
+
 class UserInfo(object):
+    __slots__ = ('username', 'uid', 'groups', 'extra')
+
     def __init__(self):
         # Username of the authenticated user making the request to the API server
         self.username = 'admin'
@@ -17,3 +22,12 @@ class UserInfo(object):
         # This is populated by the API server authentication layer and should be included
         # if any SubjectAccessReview checks are performed by the webhook.
         self.extra = {'some-key': ['some-value1', 'some-value2']}
+
+    def as_dict(self) -> Dict[str, Any]:
+        # Copies, so the instance shared by all admission reviews cannot be modified through a returned dict
+        return {
+            'username': self.username,
+            'uid': self.uid,
+            'groups': list(self.groups),
+            'extra': {key: list(values) for key, values in self.extra.items()},
+        }
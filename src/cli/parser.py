@@ -3,9 +3,12 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from argparse import ArgumentParser, Namespace, RawTextHelpFormatter
-from common.cmd import exit_if_command_not_found
+from os import cpu_count
+from common.cmd import exit_if_command_not_found, set_command_timeout
+from common.files import expand_paths
 from logging import DEBUG
-from common.logger import Logger, set_log_level
+from common.logger import set_log_level
+from conftest.results import OUTPUT_FORMATS, get_output_formats
 
 def parse_and_validate_args() -> Namespace:
     parser = ArgumentParser(
@@ -51,12 +54,26 @@ python3 conftest-runner.py \
         metavar='<location>',
     )
 
+    parser.add_argument(
+        '--job-file',
+        '-jf',
+        dest='job_file',
+        action='store',
+        help='YAML file with a list of jobs, at the top level or under the jobs key. '
+        + 'Every job sets chart or kubernetesObjects and optionally values '
+        + '(a file, glob or list of them), namespace, releaseName, namespacesFile and name. '
+        + 'All jobs are evaluated against the same policies, which are prepared only once',
+        metavar='<path>',
+    )
+
     parser.add_argument(
         '--input-chart-values',
         '-icv',
         dest='input_chart_values',
         action='store',
-        help='user supplied values.yaml file used for chart rendering',
+        nargs='+',
+        help='user supplied values.yaml file used for chart rendering. Several files or glob patterns render '
+        + 'the chart once per values file, results are reported for every values file',
         metavar='<path>',
     )
 
@@ -159,9 +176,9 @@ python3 conftest-runner.py \
         '-o',
         dest='output_format',
         action='store',
-        help='conftest command output format',
+        help='output format, one of ' + ', '.join(OUTPUT_FORMATS) + '; several comma separated formats are '
+             'written to output files differing in the extension',
         metavar='<output>',
-        choices=('stdout', 'json', 'tap', 'table', 'junit', 'github'),
     )
 
     parser.add_argument(
@@ -169,10 +186,19 @@ python3 conftest-runner.py \
         '-of',
         dest='output_file',
         action='store',
-        help='path to file where output will be saved',
+        help='path to file where output will be saved, with --watch it holds the latest results of all constraints',
         metavar='<output>',
     )
 
+    parser.add_argument(
+        '--output-dir',
+        '-od',
+        dest='output_dir',
+        action='store',
+        help='path to directory where output of every constraint will be saved to a file of its own',
+        metavar='<path>',
+    )
+
     parser.add_argument(
         '--verbose',
         '-v',
@@ -225,11 +251,168 @@ python3 conftest-runner.py \
         metavar='<options>',
     )
 
+    parser.add_argument(
+        '--helm-cache-dir',
+        '-hcd',
+        dest='helm_cache_dir',
+        action='store',
+        help='directory caching rendered manifests of local charts, '
+        + 'a chart is not rendered again as long as the chart, values and helm options are unchanged',
+        metavar='<path>',
+    )
+
+    parser.add_argument(
+        '--jobs',
+        '-j',
+        dest='jobs',
+        action='store',
+        type=int,
+        default=cpu_count() or 1,
+        help='number of conftest commands run concurrently (default: number of CPUs)',
+        metavar='<number>',
+    )
+
+    parser.add_argument(
+        '--batch',
+        '-b',
+        dest='batch',
+        action='store_true',
+        help='run a single conftest command for all constraints sharing a policy namespace',
+    )
+
+    parser.add_argument(
+        '--chunk-memory',
+        '-cm',
+        dest='chunk_memory',
+        action='store',
+        type=int,
+        help='split the input documents of every conftest command into chunks of at most this many megabytes, '
+        + 'the number of documents per chunk adapts to the measured evaluation time of a document',
+        metavar='<megabytes>',
+    )
+
+    parser.add_argument(
+        '--result-cache-dir',
+        '-rcd',
+        dest='result_cache_dir',
+        action='store',
+        help='directory caching results of every evaluated input document between runs, '
+        + 'only documents not evaluated before by the same policy and parameters are passed to conftest',
+        metavar='<path>',
+    )
+
+    parser.add_argument(
+        '--policy-store',
+        '-ps',
+        dest='policy_store',
+        action='store',
+        help='directory keeping policies between runs under a hash of their Rego, '
+        + 'unchanged policies are neither saved nor verified by conftest again. Requires conftest with every evaluator',
+        metavar='<path>',
+    )
+
+    parser.add_argument(
+        '--result-cache-size',
+        '-rcs',
+        dest='result_cache_size',
+        action='store',
+        type=int,
+        default=256,
+        help='maximum size of the result cache in megabytes, least recently used results are removed first '
+        + '(default: 256)',
+        metavar='<megabytes>',
+    )
+
+    parser.add_argument(
+        '--input-encoding',
+        '-ie',
+        dest='input_encoding',
+        action='store',
+        default='yaml',
+        help='encoding of documents passed to conftest, json is considerably cheaper to produce than yaml',
+        metavar='<encoding>',
+        choices=('yaml', 'json'),
+    )
+
+    parser.add_argument(
+        '--evaluator',
+        '-e',
+        dest='evaluator',
+        action='store',
+        default='conftest',
+        help='backend evaluating the policies: a conftest command per constraint, '
+        + 'a single long-lived opa server loading the policies once, '
+        + 'or an opa eval command evaluating all documents of a constraint in one query',
+        metavar='<evaluator>',
+        choices=('conftest', 'opa-server', 'opa-eval'),
+    )
+
+    parser.add_argument(
+        '--opa-binary',
+        '-ob',
+        dest='opa_binary',
+        action='store',
+        default='opa',
+        help='path to opa binary used by the opa-server and opa-eval evaluators',
+        metavar='<binary path>',
+    )
+
+    parser.add_argument(
+        '--command-timeout',
+        '-ct',
+        dest='command_timeout',
+        action='store',
+        type=float,
+        help='seconds after which a helm, conftest or opa eval command is killed and the run fails '
+        + '(default: no timeout)',
+        metavar='<seconds>',
+    )
+
+    parser.add_argument(
+        '--watch',
+        '-wt',
+        dest='watch',
+        action='store_true',
+        help='keep running and evaluate again the constraints affected by changes of the input, namespaces, '
+        + 'constraint templates or constraints files and charts',
+    )
+
+    parser.add_argument(
+        '--watch-interval',
+        '-wti',
+        dest='watch_interval',
+        action='store',
+        type=float,
+        default=1.0,
+        help='seconds between checks of the watched files (default: 1)',
+        metavar='<seconds>',
+    )
+
+    parser.add_argument(
+        '--profile',
+        '-prf',
+        dest='profile',
+        action='store',
+        help='write a JSON report with durations of the runner stages and time spent in subprocesses '
+        + 'versus in-process code',
+        metavar='<path>',
+    )
+
+    parser.add_argument(
+        '--profile-hotspots',
+        '-prfh',
+        dest='profile_hotspots',
+        action='store_true',
+        help='profile in-process code with cProfile and add its top hotspots to the --profile report',
+    )
+
     args = parser.parse_args()
     if (args.input_kubernetes_objects and args.input_chart):
         parser.error("Options --input-kubernetes-objects and --input-chart are mutually exclusive!")
-    if (not args.input_kubernetes_objects and not args.input_chart):
-        parser.error("One of --input-kubernetes-objects/--input-chart options must be set!")
+    if (args.job_file and (args.input_kubernetes_objects or args.input_chart)):
+        parser.error("Option --job-file is mutually exclusive with --input-kubernetes-objects/--input-chart!")
+    if (not args.input_kubernetes_objects and not args.input_chart and not args.job_file):
+        parser.error("One of --input-kubernetes-objects/--input-chart/--job-file options must be set!")
 
     if (args.policy_constraint_templates_file and args.policy_chart_constraint_templates):
         parser.error("Options --policy-constraint-templates-file and --policy-chart-constraint-templates are mutually exclusive!")
@@ -241,14 +424,63 @@ python3 conftest-runner.py \
     if (not args.policy_constraints_file and not args.policy_chart_constraints):
         parser.error("One of --policy-constraints-file/--policy-chart-constraints options must be set!")
 
-    if args.output_file is not None:
-        Logger(args.output_file)
+    if args.jobs < 1:
+        parser.error("Option --jobs must be a positive number!")
+
+    output_formats = get_output_formats(args.output_format)
+    if set(output_formats) - set(OUTPUT_FORMATS) or len(set(output_formats)) != len(output_formats):
+        parser.error("Option --output-format must be a list of distinct formats out of " + ', '.join(OUTPUT_FORMATS)
+                     + "!")
+    if len(output_formats) > 1 and not args.output_file and not args.output_dir:
+        parser.error("Several output formats can be used only with --output-file or --output-dir!")
+
+    if args.result_cache_dir and args.evaluator != 'conftest':
+        parser.error("Option --result-cache-dir is supported only by the conftest evaluator!")
+
+    if args.policy_store and args.evaluator == 'opa-server':
+        parser.error("Option --policy-store is supported only by the conftest evaluator!")
+
+    if args.chunk_memory is not None and args.chunk_memory < 1:
+        parser.error("Option --chunk-memory must be a positive number!")
+
+    if args.chunk_memory and (args.evaluator != 'conftest' or args.result_cache_dir):
+        parser.error("Option --chunk-memory is supported only by the conftest evaluator without --result-cache-dir!")
+
+    if args.result_cache_size < 1:
+        parser.error("Option --result-cache-size must be a positive number!")
+
+    if args.watch and args.job_file:
+        parser.error("Options --watch and --job-file are mutually exclusive!")
+
+    # A single values file is used as before, several values files are evaluated as separate jobs
+    values_files = expand_paths(args.input_chart_values) if args.input_chart_values else ()
+    args.input_chart_values = values_files[0] if len(values_files) == 1 else None
+    args.input_chart_values_variants = values_files if len(values_files) > 1 else ()
+    if args.input_chart_values_variants and not args.input_chart:
+        parser.error("Several --input-chart-values files can be used only with --input-chart!")
+    if args.input_chart_values_variants and args.watch:
+        parser.error("Option --watch supports only a single --input-chart-values file!")
+
+    if args.profile_hotspots and not args.profile:
+        parser.error("Option --profile-hotspots requires --profile!")
+
+    if args.watch_interval <= 0:
+        parser.error("Option --watch-interval must be a positive number!")
+
+    if args.command_timeout is not None and args.command_timeout <= 0:
+        parser.error("Option --command-timeout must be a positive number!")
+    set_command_timeout(args.command_timeout)
+
     if args.verbose:
         set_log_level(DEBUG)
 
     if (args.input_chart or args.policy_chart_constraint_templates or args.policy_chart_constraints):
-        exit_if_command_not_found(f"{args.helm_binary} version -c", args.verbose)
+        exit_if_command_not_found([args.helm_binary, "version", "-c"], args.verbose)
 
-    exit_if_command_not_found("conftest --version", args.verbose)
+    if args.evaluator in ('opa-server', 'opa-eval'):
+        exit_if_command_not_found([args.opa_binary, "version"], args.verbose)
+    # The policy store verifies policies with conftest whichever evaluator is used
+    if args.evaluator == 'conftest' or args.policy_store:
+        exit_if_command_not_found(["conftest", "--version"], args.verbose)
 
     return args
@@ -2,40 +2,95 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
-from subprocess import CompletedProcess, CalledProcessError, PIPE, run
+from shlex import join, split
+from subprocess import CompletedProcess, CalledProcessError, PIPE, Popen, TimeoutExpired, run
+from time import perf_counter
+from typing import List, Optional, Sequence, Union
 
+from common.exceptions import CommandError
 from common.logger import Logger
+from common.profiler import Profiler
 
+_timeout: Optional[float] = None
 
-def call_command(command: str, stdin='', stdout=PIPE, stderr=PIPE) -> CompletedProcess:
-    if stdin:
-        return run(command, shell=True, check=True, stdout=stdout, stderr=stderr, universal_newlines=True, input=stdin)
-    return run(command, shell=True, check=True, stdout=stdout, stderr=stderr)
+
+def set_command_timeout(timeout: Optional[float]):
+    # Applies to every command not given a timeout of its own
+    global _timeout
+    _timeout = timeout
+
+
+def get_command_timeout() -> Optional[float]:
+    return _timeout
+
+
+def get_args(command: Union[str, Sequence[str]]) -> List[str]:
+    # Commands are run without a shell, a command line is split into arguments the way the shell would split it
+    if isinstance(command, str):
+        return split(command)
+    return list(command)
+
+
+def call_command(command: Union[str, Sequence[str]], stdin: Union[str, bytes] = '', stdout=PIPE, stderr=PIPE,
+                 text=False, check=True, timeout: Optional[float] = None) -> CompletedProcess:
+    # str stdin is passed and the output read as text, otherwise stdin and the output are bytes.
+    # With check set, a non-zero exit code raises CalledProcessError, otherwise it is left to the caller.
+    args = get_args(command)
+    text = text or isinstance(stdin, str) and stdin != ''
+    start = perf_counter()
+    try:
+        return run(args, check=check, stdout=stdout, stderr=stderr, universal_newlines=text, input=stdin or None,
+                   timeout=timeout if timeout is not None else _timeout)
+    except TimeoutExpired as e:
+        raise CommandError(f'Command {join(args)} timed out after {e.timeout} seconds')
+    except OSError as e:
+        raise CommandError(f'Calling {args[0]} failed: {e.strerror or e}')
+    finally:
+        Profiler.get_instance().add_subprocess(perf_counter() - start)
+
+
+def open_command(command: Union[str, Sequence[str]], stderr=PIPE) -> Popen:
+    # stdout is a text pipe consumed incrementally by the caller
+    args = get_args(command)
+    try:
+        return Popen(args, stdout=PIPE, stderr=stderr, universal_newlines=True)
+    except OSError as e:
+        raise CommandError(f'Calling {args[0]} failed: {e.strerror or e}')
 
 
 def log_called_process_output(logger_func, process_result):
     error_output_str = process_result.stderr if process_result.stderr else ''
     output_str = process_result.stdout if process_result.stdout else ''
+    if isinstance(error_output_str, bytes):
+        error_output_str = error_output_str.decode(errors='replace')
+    if isinstance(output_str, bytes):
+        output_str = output_str.decode(errors='replace')
     for line in error_output_str.strip().splitlines():
         logger_func('[stderr]: ' + str(line))
     for line in output_str.strip().splitlines():
         logger_func(line)
 
 
-def exit_if_command_not_found(command: str, verbose: bool):
+def exit_if_command_not_found(command: Union[str, Sequence[str]], verbose: bool):
     logger = Logger.get_instance()
+    binary = get_args(command)[0]
     try:
         if verbose:
-            logger.debug(command.split()[0] + " " + call_command(command).stdout.decode('UTF-8'))
+            logger.debug(binary + " " + call_command(command).stdout.decode('UTF-8'))
         else:
             call_command(command)
+    except CommandError as err:
+        if verbose:
+            logger.debug(err)
+        logger.error(f'{binary} not found, check README in order to install')
+        exit(1)
     except CalledProcessError as err:
         if err.returncode != 0:
             if verbose:
                 logger.debug(err)
                 logger.debug(err.stdout)
                 logger.debug(err.stderr)
-            logger.error(f'{command.split()[0]} not found, check README in order to install')
+            logger.error(f'{binary} not found, check README in order to install')
         else:
             logger.error(err)
         exit(1)
@@ -20,3 +20,11 @@ class ConftestError(Exception):
 
 class InvalidParametersError(Exception):
     pass
+
+
+class OpaError(Exception):
+    pass
+
+
+class CommandError(Exception):
+    pass
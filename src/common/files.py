@@ -3,9 +3,12 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from atexit import register
-from os import path
+from contextlib import contextmanager
+from glob import glob
+from os import path, remove, replace
 from shutil import rmtree
-from tempfile import mkdtemp
+from tempfile import mkdtemp, mkstemp
+from typing import Iterable, Tuple
 
 from common.exceptions import FileError
 
@@ -35,9 +38,40 @@ def write_to_file(file_path: str, content: str):
         raise FileError('Creating file failed: ' + str(e))
 
 
+def write_to_file_atomically(file_path: str, content: str):
+    with open_atomically(file_path) as f:
+        f.write(content)
+
+
+@contextmanager
+def open_atomically(file_path: str, buffering: int = -1):
+    # Content is written next to the target and renamed over it on success, so readers never see a partial file
+    try:
+        fd, temp_path = mkstemp(dir=path.dirname(file_path) or '.', prefix='.' + path.basename(file_path))
+    except OSError as e:
+        raise FileError('Creating file failed: ' + str(e))
+    try:
+        with open(fd, 'w', buffering=buffering) as f:
+            yield f
+        replace(temp_path, file_path)
+    except BaseException as e:
+        remove(temp_path)
+        if isinstance(e, OSError):
+            raise FileError('Creating file failed: ' + str(e))
+        raise
+
+
 def read_file_to_str(path: str) -> str:
     try:
         with open(path) as f:
             return f.read()
     except OSError as e:
-        raise FileError('Reading file failed: ' + str(e))
\ No newline at end of file
+        raise FileError('Reading file failed: ' + str(e))
+
+
+def expand_paths(patterns: Iterable[str]) -> Tuple[str, ...]:
+    # Patterns matching no file are kept, so the missing file is reported by the command reading it
+    paths = []
+    for pattern in patterns:
+        paths += sorted(glob(pattern)) or [pattern]
+    return tuple(paths)
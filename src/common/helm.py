@@ -2,43 +2,256 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
+from contextlib import nullcontext
+from functools import lru_cache
+from hashlib import sha256
+from os import makedirs, path, walk
+from shlex import join, split
 from subprocess import CalledProcessError
-from typing import Dict, Iterable
-from yaml import load_all, SafeLoader
+from tempfile import TemporaryFile
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from .cmd import call_command, log_called_process_output
-from .exceptions import TemplateError
+from .cmd import call_command, log_called_process_output, open_command
+from .exceptions import CommandError, FileError, TemplateError
+from .files import open_atomically, read_file_to_str, write_to_file_atomically
 from .logger import Logger
+from .profiler import Profiler
+from .serialization import load_documents
 
 
 def render_manifests(helm_binary: str, helm_options: str, chart_location: str, values_yaml_location=None, namespace=None,
-                     release_name='') -> str:
+                     release_name='', cache_dir=None) -> str:
     logger = Logger.get_instance()
 
-    command = f'{helm_binary} template {helm_options} {release_name} {chart_location}'
-    if values_yaml_location:
-        command += ' -f ' + values_yaml_location
-    if namespace:
-        command += ' -n ' + namespace
-    logger.debug(command)
+    command = _get_template_command(helm_binary, helm_options, chart_location, values_yaml_location, namespace,
+                                    release_name)
+    logger.debug(join(command))
+
+    cache_file = _get_cache_file(cache_dir, helm_binary, helm_options, chart_location, values_yaml_location, namespace,
+                                 release_name)
+    if cache_file and path.isfile(cache_file):
+        logger.debug('Using cached manifests: ' + cache_file)
+        return read_file_to_str(cache_file)
 
     try:
         process_result = call_command(command)
-        return process_result.stdout.decode() if process_result.stdout else ''
+        manifests = process_result.stdout.decode() if process_result.stdout else ''
     except CalledProcessError as e:
         log_called_process_output(Logger.get_instance().error, e)
         raise TemplateError('Rendering chart failed.')
 
+    if cache_file:
+        write_to_file_atomically(cache_file, manifests)
+        logger.debug('Cached manifests: ' + cache_file)
+
+    return manifests
+
+
+def stream_manifests(helm_binary: str, helm_options: str, chart_location: str, values_yaml_location=None,
+                     namespace=None, release_name='', cache_dir=None) -> Iterator[Dict]:
+    # Manifests are parsed while helm is still writing them, the rendered output is never held in memory as a whole
+    logger = Logger.get_instance()
+
+    command = _get_template_command(helm_binary, helm_options, chart_location, values_yaml_location, namespace,
+                                    release_name)
+    logger.debug(join(command))
+
+    cache_file = _get_cache_file(cache_dir, helm_binary, helm_options, chart_location, values_yaml_location, namespace,
+                                 release_name)
+    if cache_file and path.isfile(cache_file):
+        logger.debug('Using cached manifests: ' + cache_file)
+        yield from read_manifests(cache_file)
+        return
+
+    start = perf_counter()
+    with TemporaryFile() as stderr, open_command(command, stderr) as process:
+        try:
+            with open_atomically(cache_file) if cache_file else nullcontext() as cache:
+                yield from iter_manifests(_TeeReader(process.stdout, cache) if cache else process.stdout)
+                if process.wait() != 0:
+                    stderr.seek(0)
+                    for line in stderr.read().decode().strip().splitlines():
+                        logger.error('[stderr]: ' + line)
+                    raise TemplateError('Rendering chart failed.')
+        finally:
+            if process.poll() is None:
+                process.kill()
+            # helm runs while the manifests are consumed, its lifetime ends once it has been waited for
+            process.wait()
+            Profiler.get_instance().add_subprocess(perf_counter() - start)
+
+    if cache_file:
+        logger.debug('Cached manifests: ' + cache_file)
+
+
+def render_cache_key(helm_binary: str, helm_options: str, chart_location: str, values_yaml_location=None,
+                     namespace=None, release_name='') -> Optional[str]:
+    # Only local charts can be hashed, charts from repositories or URLs are always rendered
+    if not path.exists(chart_location):
+        return None
+
+    # Values files given in the helm options are hashed as well, options referring to remote files disable caching
+    option_files = get_option_files(helm_options)
+    if any(not path.isfile(file_path) for file_path in option_files):
+        return None
+
+    helm_version = _get_helm_version(helm_binary)
+    if helm_version is None:
+        return None
+
+    key = sha256()
+    for value in (helm_binary, helm_version, helm_options, namespace or '', release_name or ''):
+        key.update(value.encode() + b'\0')
+
+    for file_path in option_files + ((values_yaml_location,) if values_yaml_location else ()):
+        _update_with_file(key, file_path)
+    key.update(b'\0')
+
+    if path.isfile(chart_location):
+        _update_with_file(key, chart_location)
+    else:
+        _update_with_chart(key, chart_location, set())
+
+    return key.hexdigest()
+
+
+def get_option_files(helm_options: str) -> Tuple[str, ...]:
+    # Files read by helm template through -f/--values and --set-file, e.g. `-f a.yaml --set-file key=b.txt`.
+    # Values given as URLs are returned as well.
+    files = []
+    options = split(helm_options)
+    for index, option in enumerate(options):
+        if option in ('-f', '--values', '--set-file'):
+            flag, value = option, options[index + 1] if index + 1 < len(options) else ''
+        elif option.startswith(('--values=', '--set-file=')):
+            flag, value = option.split('=', 1)
+        elif option.startswith('-f'):
+            flag, value = '-f', option[3:] if option.startswith('-f=') else option[2:]
+        else:
+            continue
+        for item in value.split(','):
+            files.append(item.split('=', 1)[-1] if flag == '--set-file' else item)
+    return tuple(files)
+
+
+@lru_cache(maxsize=None)
+def _get_helm_version(helm_binary: str) -> Optional[str]:
+    # Manifests rendered by another helm version may differ
+    try:
+        return call_command([helm_binary, 'version']).stdout.decode()
+    except (CalledProcessError, CommandError):
+        return None
+
+
+def _update_with_chart(key, chart_location: str, visited: Set[str]):
+    # Walk the whole chart tree, including vendored charts/ dependencies, in a stable order
+    visited.add(path.realpath(chart_location))
+    for dir_path, dir_names, file_names in walk(chart_location):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            file_path = path.join(dir_path, file_name)
+            key.update(path.relpath(file_path, chart_location).encode() + b'\0')
+            _update_with_file(key, file_path)
+
+    # file:// dependencies may live outside of the chart directory
+    for dependency_location in _get_file_dependencies(chart_location):
+        real_location = path.realpath(dependency_location)
+        if any(real_location == chart or real_location.startswith(chart + path.sep) for chart in visited):
+            continue
+        key.update(dependency_location.encode() + b'\0')
+        _update_with_chart(key, dependency_location, visited)
+
+
+def _get_file_dependencies(chart_location: str) -> Tuple[str, ...]:
+    dependencies = []
+    # Dependencies are listed in Chart.yaml of apiVersion v2 charts and in requirements.yaml of v1 charts
+    for file_name in ('Chart.yaml', 'requirements.yaml'):
+        file_path = path.join(chart_location, file_name)
+        if not path.isfile(file_path):
+            continue
+        try:
+            with open(file_path) as f:
+                chart = next(load_documents(f), None)
+        except OSError as e:
+            raise FileError('Reading file failed: ' + str(e))
+        for dependency in (chart or {}).get('dependencies') or ():
+            repository = dependency.get('repository') or ''
+            if repository.startswith('file://'):
+                dependencies.append(path.join(chart_location, repository[len('file://'):]))
+    return tuple(dependencies)
+
+
+def _get_template_command(helm_binary: str, helm_options: str, chart_location: str, values_yaml_location=None,
+                          namespace=None, release_name='') -> List[str]:
+    # Additional options are given as a single command line string, they are split as the shell would split them
+    command = [helm_binary, 'template', *split(helm_options)]
+    if release_name:
+        command.append(release_name)
+    command.append(chart_location)
+    if values_yaml_location:
+        command += ['-f', values_yaml_location]
+    if namespace:
+        command += ['-n', namespace]
+    return command
+
+
+def _get_cache_file(cache_dir: Optional[str], helm_binary: str, helm_options: str, chart_location: str,
+                    values_yaml_location=None, namespace=None, release_name='') -> Optional[str]:
+    if not cache_dir:
+        return None
+
+    cache_key = render_cache_key(helm_binary, helm_options, chart_location, values_yaml_location, namespace,
+                                 release_name)
+    if cache_key is None:
+        return None
+
+    try:
+        makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        raise FileError('Creating directory failed: ' + str(e))
+    return path.join(cache_dir, cache_key + '.yaml')
+
+
+def _update_with_file(key, file_path: str):
+    try:
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                key.update(chunk)
+    except OSError as e:
+        raise FileError('Reading file failed: ' + str(e))
+    key.update(b'\0')
+
 
 def parse_manifests(manifests: str) -> Iterable[Dict]:
-    manifests = tuple(
-        manifest
-        for manifest in load_all(manifests, Loader=SafeLoader)
-        if manifest is not None
-    )
-    validate(manifests)
+    return tuple(iter_manifests(manifests))
 
-    return manifests
+
+def read_manifests(file_path: str) -> Iterator[Dict]:
+    try:
+        with open(file_path) as f:
+            yield from iter_manifests(f)
+    except OSError as e:
+        raise FileError('Reading file failed: ' + str(e))
+
+
+def iter_manifests(manifests) -> Iterator[Dict]:
+    for manifest in load_documents(manifests):
+        if manifest is not None:
+            validate((manifest,))
+            yield manifest
+
+
+class _TeeReader(object):
+    # Copies everything read from the stream to the sink
+    def __init__(self, stream, sink):
+        self._stream = stream
+        self._sink = sink
+
+    def read(self, size=-1) -> str:
+        data = self._stream.read(size)
+        self._sink.write(data)
+        return data
 
 
 def validate(manifests: Iterable[Dict]):
@@ -2,13 +2,17 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
+from atexit import register
 from logging import getLogger, StreamHandler, INFO, Formatter, FileHandler
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 from sys import stdout
 
 
 class Logger():
     _instance = None
     _handler = None
+    _queue_handler = None
 
     @staticmethod
     def get_instance():
@@ -27,9 +31,19 @@ class Logger():
 
             Logger._handler.setLevel(INFO)
             Logger._handler.setFormatter(Formatter('%(levelname)s - %(message)s'))
+
+            # Records are only queued by the logging threads, writing them to the file or stdout happens on
+            # a listener thread which is drained at exit
+            log_queue = SimpleQueue()
+            Logger._queue_handler = QueueHandler(log_queue)
+            Logger._queue_handler.setLevel(INFO)
+            listener = QueueListener(log_queue, Logger._handler, respect_handler_level=True)
+            listener.start()
+            register(listener.stop)
+
             logger = getLogger('conftest')
             logger.setLevel(INFO)
-            logger.addHandler(Logger._handler)
+            logger.addHandler(Logger._queue_handler)
 
             Logger._instance = logger
 
@@ -37,9 +51,21 @@ def set_log_level(level):
     Logger.get_instance().setLevel(level)
     for handler in Logger.get_instance().handlers:
         handler.setLevel(level)
+    Logger._handler.setLevel(level)
 
 def info_passed(logger, formatted_output):
     logger.info("\x1b[32mPASSED " + formatted_output + "\033[0m")
 
 def info_failed(logger, formatted_output):
     logger.info("\x1b[31mFAILURE " + formatted_output + "\033[0m")
+
+
+class lazy(object):
+    # Defers building of a log message argument until a handler actually emits the record, e.g.
+    # logger.debug('objects: %s', lazy(admission_reviews_to_str, admission_reviews))
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+
+    def __str__(self):
+        return str(self._func(*self._args))
@@ -0,0 +1,139 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import threading
+from cProfile import Profile
+from contextlib import contextmanager
+from os import times
+from pstats import Stats
+from sys import setprofile
+from threading import Lock
+from time import perf_counter, process_time
+from typing import Dict, List, Optional
+
+from common.files import write_to_file_atomically
+
+HOTSPOTS = 25
+# Threads blocked on locks, queues, pipes or sleeping are idle, their time is not a hotspot
+IDLE_FUNCTIONS = (
+    "<method 'acquire' of '_thread.lock' objects>",
+    "<method 'acquire' of '_thread.RLock' objects>",
+    "<method 'get' of '_queue.SimpleQueue' objects>",
+    "<method 'poll' of 'select.poll' objects>",
+    "<method 'select' of 'select.epoll' objects>",
+    "<built-in method time.sleep>",
+)
+
+
+# Collects wall-clock durations of the runner stages and of the subprocesses it calls, and optionally profiles
+# in-process code with cProfile. Nothing is recorded until the profiler is enabled.
+class Profiler(object):
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        if Profiler._instance is None:
+            Profiler._instance = Profiler()
+        return Profiler._instance
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = Lock()
+        self._stages = {}
+        self._subprocess_calls = 0
+        self._subprocess_seconds = 0.0
+        self._start = None
+        self._start_times = None
+        self._profiles: List[Profile] = []
+
+    def enable(self, hotspots: bool = False):
+        self.enabled = True
+        self._start = perf_counter()
+        self._start_times = (process_time(), times())
+        if hotspots:
+            # cProfile profiles only the thread enabling it, every thread started later gets a profile of its own
+            threading.setprofile(self._profile_thread)
+            self._profile_thread()
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._add_stage(name, perf_counter() - start)
+
+    def add_subprocess(self, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._subprocess_calls += 1
+            self._subprocess_seconds += seconds
+
+    def get_report(self) -> Dict:
+        cpu_seconds = process_time() - self._start_times[0]
+        children_times = times()
+        report = {
+            'wall_seconds': perf_counter() - self._start,
+            # Stages running concurrently on several threads are summed up
+            'stages': self._stages,
+            'in_process': {'cpu_seconds': cpu_seconds},
+            'subprocess': {
+                'calls': self._subprocess_calls,
+                'wall_seconds': self._subprocess_seconds,
+                'cpu_seconds': children_times.children_user + children_times.children_system
+                - self._start_times[1].children_user - self._start_times[1].children_system,
+            },
+        }
+        hotspots = self._get_hotspots()
+        if hotspots is not None:
+            report['hotspots'] = hotspots
+        return report
+
+    def write_report(self, file_path: str):
+        threading.setprofile(None)
+        write_to_file_atomically(file_path, json.dumps(self.get_report(), indent=4))
+
+    def _profile_thread(self, *_):
+        setprofile(None)
+        profile = Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Since Python 3.12 a single profile already covers all threads
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def _get_hotspots(self) -> Optional[List[Dict]]:
+        if not self._profiles:
+            return None
+        stats = Stats(self._profiles[0])
+        for profile in self._profiles[1:]:
+            stats.add(profile)
+
+        hotspots = sorted(
+            (item for item in stats.stats.items() if item[0][2] not in IDLE_FUNCTIONS),
+            key=lambda item: item[1][2],
+            reverse=True
+        )[:HOTSPOTS]
+        return [
+            {
+                'function': f'{file}:{line}({function})',
+                'calls': calls,
+                'own_seconds': own_seconds,
+                'cumulative_seconds': cumulative_seconds,
+            }
+            for (file, line, function), (_, calls, own_seconds, cumulative_seconds, _) in hotspots
+        ]
+
+    def _add_stage(self, name: str, seconds: float):
+        with self._lock:
+            record = self._stages.setdefault(name, {'calls': 0, 'seconds': 0.0})
+            record['calls'] += 1
+            record['seconds'] += seconds
@@ -0,0 +1,49 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+from typing import Any, Dict, Iterable, Iterator
+from yaml import dump, dump_all, load_all
+
+# libyaml bindings are an order of magnitude faster, pure Python implementation is used when PyYAML lacks them
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
+
+def load_documents(stream) -> Iterator[Any]:
+    return load_all(stream, Loader=SafeLoader)
+
+
+def dump_documents(documents: Iterable[Dict], encoding='yaml') -> str:
+    if encoding == 'json':
+        return join_documents((dump_json_document(document) for document in documents), encoding)
+    return dump_all(documents, Dumper=SafeDumper)
+
+
+def dump_json_document(document: Any) -> str:
+    # Timestamps parsed by YAML loader are not JSON serializable, conftest would read them as strings anyway
+    return json.dumps(document, default=str)
+
+
+# Fragments are single `key: value` entries of a mapping, serialized separately so they can be cached and joined
+# into complete documents without serializing the same value twice
+def dump_fragment(key: str, value: Any, encoding='yaml') -> str:
+    if encoding == 'json':
+        return json.dumps(key) + ': ' + dump_json_document(value)
+    return dump({key: value}, Dumper=SafeDumper)
+
+
+def join_fragments(fragments: Iterable[str], encoding='yaml') -> str:
+    if encoding == 'json':
+        return '{' + ', '.join(fragments) + '}'
+    return ''.join(fragments)
+
+
+def join_documents(documents: Iterable[str], encoding='yaml') -> str:
+    if encoding == 'json':
+        # JSON is a subset of YAML, so JSON encoded documents still form a YAML stream conftest reads as before
+        return '\n---\n'.join(documents)
+    return '---\n'.join(documents)
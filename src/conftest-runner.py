@@ -3,42 +3,332 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
 from cli.parser import parse_and_validate_args
-from common.exceptions import ConftestError, FileError, InvalidManifestError, InvalidParametersError, TemplateError
-from common.logger import Logger
-from conftest import run_conftest
+from common.exceptions import (
+    CommandError, ConftestError, FileError, InvalidManifestError, InvalidParametersError, OpaError, TemplateError
+)
+from common.helm import get_option_files
+from common.logger import Logger, info_failed, info_passed
+from common.profiler import Profiler
+from conftest import ChunkSizer, ConstraintResult, OutputSinks, ResultCache, get_conftest_version, \
+    report_conftest, run_conftest, submit_conftest
 from constraints import generate_constraints, get_constraints
 from constrainttemplates import generate_policies, get_constraint_templates
 from constrainttemplates.policy import create_policies_dir
+from constrainttemplates.policystore import PolicyStore
 from inputobjects import convert_kubernetes_objects_to_admission_reviews, get_kubernetes_objects
+from jobs import JobEvaluations, get_values_jobs, read_jobs
 from namespaces import get_namespaces, convert_namespaces_to_admission_reviews
+from opa import OpaEval, OpaServer
+from watch import Watcher, get_changed_constraints, get_constraint_id
+
+ERRORS = (
+    TemplateError, FileError, ConftestError, InvalidManifestError, InvalidParametersError, OpaError, CommandError
+)
+
+
+def prepare_admission_review_requests(args):
+    # Rendering, parsing and conversion are streamed, so they are measured as a single stage
+    with Profiler.get_instance().stage('prepare_input'):
+        kubernetes_objects = get_kubernetes_objects(args)
+        return convert_kubernetes_objects_to_admission_reviews(kubernetes_objects, args.input_chart_namespace)
+
+
+def prepare_constraint_templates(args):
+    with Profiler.get_instance().stage('prepare_constraint_templates'):
+        return tuple(get_constraint_templates(args))
+
+
+def prepare_policies(constraint_templates, constraints, policies_dir, policy_store):
+    # Only policies of kinds having constraints are saved
+    with Profiler.get_instance().stage('prepare_policies'):
+        return generate_policies(constraint_templates, policies_dir, constraints, policy_store)
+
+
+def prepare_constraints(args):
+    with Profiler.get_instance().stage('prepare_constraints'):
+        constraints_obj = get_constraints(args)
+        return generate_constraints(constraints_obj)
+
+
+def prepare_admission_review_namespaces(args):
+    with Profiler.get_instance().stage('prepare_namespaces'):
+        namespaces = get_namespaces(args)
+        #conversion is not necessary but it simplifies the code - see usage of filter_matching_constraint
+        return convert_namespaces_to_admission_reviews(namespaces)
+
+
+def evaluate(args, policies_dir, policies, constraints, admission_review_namespaces, admission_review_requests,
+             opa_evaluator, result_cache, chunk_sizer) -> int:
+    return run_conftest(policies_dir, policies, constraints,
+                        admission_review_namespaces, admission_review_requests,
+                        args.output_format, args.output_file, args.warning_mode, args.fail_fast, args.jobs,
+                        args.batch, opa_evaluator, args.input_encoding, result_cache, args.output_dir, chunk_sizer)
+
+
+def prepare_job(args, job, executor, job_evaluations, policies_dir, policies, constraints, opa_evaluator, result_cache,
+                chunk_sizer):
+    if job_evaluations.stopped:
+        return ()
+    job_args = job.get_args(args)
+    admission_review_namespaces = prepare_admission_review_namespaces(job_args)
+    admission_review_requests = prepare_admission_review_requests(job_args)
+    return job_evaluations.submit(
+        lambda: submit_conftest(executor, policies_dir, policies, constraints,
+                                admission_review_namespaces, admission_review_requests,
+                                args.batch, opa_evaluator, args.input_encoding, result_cache, chunk_sizer)
+    )
+
+
+def run_jobs(args, jobs, policies_dir, policies, constraints, opa_evaluator, result_cache, chunk_sizer) -> int:
+    logger = Logger.get_instance()
+
+    # Inputs of the jobs are rendered concurrently and all evaluations share one worker pool,
+    # results are reported job by job in the order of the job file
+    exit_codes = []
+    job_evaluations = JobEvaluations()
+    # Results of all jobs are written to the same output files
+    with OutputSinks(args.output_format, args.output_file, args.output_dir) as output_sinks, \
+            ThreadPoolExecutor(max_workers=args.jobs) as render_executor, \
+            ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        job_futures = tuple(
+            render_executor.submit(prepare_job, args, job, executor, job_evaluations, policies_dir, policies,
+                                   constraints, opa_evaluator, result_cache, chunk_sizer)
+            for job in jobs
+        )
+        for job, job_future in zip(jobs, job_futures):
+            logger.info('')
+            logger.info('Job ' + job.name)
+            try:
+                exit_code = report_conftest(
+                    job_future.result(), args.output_format, args.warning_mode, args.fail_fast, opa_evaluator,
+                    (lambda constraint_result: output_sinks.write(get_job_results(job, constraint_result)))
+                    if output_sinks else None
+                )
+            except ERRORS as e:
+                logger.error(e)
+                exit_code = 1
+            exit_codes.append(exit_code)
+            if exit_code != 0 and args.fail_fast:
+                # Jobs not rendered yet are cancelled, jobs still rendering stop before submitting evaluations
+                for job_future in job_futures:
+                    job_future.cancel()
+                job_evaluations.stop()
+                break
+
+    logger.info('')
+    for job, exit_code in zip(jobs, exit_codes):
+        if exit_code == 0:
+            info_passed(logger, job.name)
+        else:
+            info_failed(logger, job.name)
+    return 1 if any(exit_codes) else 0
+
+
+def get_job_results(job, constraint_result):
+    # Jobs evaluate the same constraints, results are told apart by the job name
+    return ConstraintResult(
+        constraint_result.constraint,
+        tuple(result.renamed(job.name + ' - ' + result.filename) for result in constraint_result.results),
+        constraint_result.stderr,
+        job.name
+    )
+
+
+def watch(args, policies_dir, policy_store, constraint_templates, policies, constraints, admission_review_namespaces,
+          admission_review_requests, result_cache, chunk_sizer):
+    logger = Logger.get_instance()
+
+    # Files given in the helm options are read by every chart rendered
+    option_files = get_option_files(args.helm_options) if args.helm_options else ()
+    watcher = Watcher({
+        'input': (
+            args.input_kubernetes_objects, args.input_chart, args.input_chart_values,
+            *(option_files if args.input_chart else ())
+        ),
+        'namespaces': (args.input_namespaces_file,),
+        'constraint_templates': (
+            args.policy_constraint_templates_file, args.policy_chart_constraint_templates,
+            args.policy_chart_constraint_templates_values,
+            *(option_files if args.policy_chart_constraint_templates else ())
+        ),
+        'constraints': (
+            args.policy_constraints_file, args.policy_chart_constraints, args.policy_chart_constraints_values,
+            *(option_files if args.policy_chart_constraints else ())
+        ),
+    })
+
+    # Everything prepared stays in memory, a change re-runs only the stages reading the changed source
+    changed_constraints = constraints
+    opa_evaluator = None
+    results = {}
+    try:
+        while True:
+            if changed_constraints:
+                try:
+                    if args.evaluator != 'conftest' and opa_evaluator is None:
+                        opa_evaluator = create_opa_evaluator(args, policies_dir)
+                        opa_evaluator.start()
+                    evaluate_watched(args, policies_dir, policies, constraints, changed_constraints,
+                                     admission_review_namespaces, admission_review_requests, opa_evaluator,
+                                     result_cache, chunk_sizer, results)
+                except ERRORS as e:
+                    logger.error(e)
+            else:
+                logger.info('No constraint affected by the changes')
+
+            logger.info('')
+            logger.info('Watching for changes...')
+            changed_sources = watcher.wait(args.watch_interval)
+
+            try:
+                new_admission_review_requests = prepare_admission_review_requests(args) \
+                    if 'input' in changed_sources else admission_review_requests
+                new_admission_review_namespaces = prepare_admission_review_namespaces(args) \
+                    if 'namespaces' in changed_sources else admission_review_namespaces
+                new_constraint_templates = prepare_constraint_templates(args) \
+                    if 'constraint_templates' in changed_sources else constraint_templates
+                new_constraints = prepare_constraints(args) \
+                    if 'constraints' in changed_sources else constraints
+                # Policies of removed constraint templates must not be loaded again, a new directory is used.
+                # Policies are saved only for kinds having constraints, so they are saved again for new kinds too.
+                if 'constraint_templates' in changed_sources or get_kinds(new_constraints) != get_kinds(constraints):
+                    new_policies_dir = create_policies_dir(args)
+                    new_policies = prepare_policies(new_constraint_templates, new_constraints, new_policies_dir,
+                                                    policy_store)
+                else:
+                    new_policies_dir = policies_dir
+                    new_policies = policies
+            except ERRORS as e:
+                logger.error(e)
+                changed_constraints = ()
+                continue
+
+            if changed_sources & {'input', 'namespaces'}:
+                changed_constraints = new_constraints
+            else:
+                changed_constraints = get_changed_constraints(new_constraints, constraints, new_policies, policies)
+            if opa_evaluator and new_policies_dir != policies_dir:
+                opa_evaluator.stop()
+                opa_evaluator = None
+
+            admission_review_requests = new_admission_review_requests
+            admission_review_namespaces = new_admission_review_namespaces
+            constraint_templates = new_constraint_templates
+            policies_dir = new_policies_dir
+            policies = new_policies
+            constraints = new_constraints
+    except KeyboardInterrupt:
+        logger.info('Stopped watching for changes')
+    finally:
+        if opa_evaluator:
+            opa_evaluator.stop()
+
+
+def evaluate_watched(args, policies_dir, policies, constraints, changed_constraints, admission_review_namespaces,
+                     admission_review_requests, opa_evaluator, result_cache, chunk_sizer, results) -> int:
+    if not args.output_file and not args.output_dir:
+        return evaluate(args, policies_dir, policies, changed_constraints, admission_review_namespaces,
+                        admission_review_requests, opa_evaluator, result_cache, chunk_sizer)
+
+    # Output files hold the latest results of all constraints, results of constraints not evaluated again
+    # are kept from previous iterations
+    evaluated = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        evaluations = submit_conftest(executor, policies_dir, policies, changed_constraints,
+                                      admission_review_namespaces, admission_review_requests,
+                                      args.batch, opa_evaluator, args.input_encoding, result_cache, chunk_sizer)
+        exit_code = report_conftest(evaluations, args.output_format, args.warning_mode, args.fail_fast, opa_evaluator,
+                                    evaluated.append)
+    for constraint in changed_constraints:
+        results.pop(get_constraint_id(constraint), None)
+    for constraint_result in evaluated:
+        results[get_constraint_id(constraint_result.constraint)] = constraint_result
+    constraint_ids = tuple(get_constraint_id(constraint) for constraint in constraints)
+    for constraint_id in set(results) - set(constraint_ids):
+        del results[constraint_id]
+
+    with OutputSinks(args.output_format, args.output_file, args.output_dir) as output_sinks:
+        for constraint_id in constraint_ids:
+            if constraint_id in results:
+                output_sinks.write(results[constraint_id])
+    return exit_code
+
+
+def create_opa_evaluator(args, policies_dir):
+    if args.evaluator == 'opa-server':
+        return OpaServer(args.opa_binary, policies_dir)
+    return OpaEval(args.opa_binary, policies_dir)
+
+
+def get_kinds(constraints):
+    return {constraint['kind'] for constraint in constraints}
+
 
 def main():
     args = parse_and_validate_args()
 
-    kubernetes_objects = get_kubernetes_objects(args)
-    admission_review_requests = convert_kubernetes_objects_to_admission_reviews(
-        kubernetes_objects, args.input_chart_namespace)
+    profiler = Profiler.get_instance()
+    if args.profile:
+        profiler.enable(args.profile_hotspots)
+    try:
+        exit_code = run(args)
+    finally:
+        if args.profile:
+            profiler.write_report(args.profile)
+            Logger.get_instance().info('Profile report written to ' + args.profile)
+    exit(exit_code)
+
+
+def run(args) -> int:
+    jobs = read_jobs(args.job_file) if args.job_file else get_values_jobs(args)
 
     policies_dir = create_policies_dir(args)
 
-    constraint_templates_obj = get_constraint_templates(args)
-    policies = generate_policies(constraint_templates_obj, policies_dir)
+    # Rendering and parsing of the three charts are independent, the slowest one determines the preparation time
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        constraint_templates_future = executor.submit(prepare_constraint_templates, args)
+        constraints_future = executor.submit(prepare_constraints, args)
+
+        if not jobs:
+            admission_review_requests_future = executor.submit(prepare_admission_review_requests, args)
+            admission_review_namespaces = prepare_admission_review_namespaces(args)
+            admission_review_requests = admission_review_requests_future.result()
 
-    constraints_obj = get_constraints(args)
-    constraints = generate_constraints(constraints_obj)
+        constraint_templates = constraint_templates_future.result()
+        constraints = constraints_future.result()
+    # Verdicts and verifications cached between runs are only valid for the conftest version producing them
+    conftest_version = get_conftest_version() if args.policy_store or args.result_cache_dir else None
+    policy_store = PolicyStore(args.policy_store, conftest_version) if args.policy_store else None
+    if policy_store:
+        policy_store.open()
+    policies = prepare_policies(constraint_templates, constraints, policies_dir, policy_store)
 
-    namespaces = get_namespaces(args)
-    #conversion is not necessary but it simplifies the code - see usage of filter_matching_constraint
-    admission_review_namespaces = convert_namespaces_to_admission_reviews(namespaces)
+    result_cache = ResultCache(args.result_cache_dir, args.result_cache_size * 1024 * 1024,
+                               conftest_version) if args.result_cache_dir else None
+    # The chunk size learnt from earlier commands is kept for the whole run
+    chunk_sizer = ChunkSizer(args.chunk_memory * 1024 * 1024) if args.chunk_memory else None
+    with result_cache or nullcontext():
+        if args.watch:
+            watch(args, policies_dir, policy_store, constraint_templates, policies, constraints,
+                  admission_review_namespaces, admission_review_requests, result_cache, chunk_sizer)
+            return 0
 
-    run_conftest(policies_dir, policies, constraints,
-                 admission_review_namespaces, admission_review_requests,
-                 args.output_format, args.output_file, args.warning_mode, args.fail_fast)
+        opa_evaluator = create_opa_evaluator(args, policies_dir) if args.evaluator != 'conftest' else None
+        with opa_evaluator or nullcontext(), Profiler.get_instance().stage('evaluate'):
+            if jobs:
+                return run_jobs(args, jobs, policies_dir, policies, constraints, opa_evaluator, result_cache,
+                                chunk_sizer)
+            return evaluate(args, policies_dir, policies, constraints,
+                            admission_review_namespaces, admission_review_requests, opa_evaluator, result_cache,
+                            chunk_sizer)
 
 if __name__ == '__main__':
     try:
         main()
-    except (TemplateError, FileError, ConftestError, InvalidManifestError, InvalidParametersError) as e:
+    except ERRORS as e:
         Logger.get_instance().error(e)
         exit(1)
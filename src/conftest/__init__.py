@@ -2,4 +2,8 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
+from .chunks import *
 from .conftest import *
+from .resultcache import *
+from .results import *
+from .sinks import *
@@ -0,0 +1,68 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+from threading import Lock
+from typing import Any, Iterable, Iterator, List, Tuple
+
+INITIAL_CHUNK_SIZE = 64
+# Chunks are sized to take about this long, the conftest start-up cost is small next to it while fail fast
+# and memory use stay bounded
+CHUNK_TARGET_SECONDS = 2.0
+# Weight of the latest chunk in the measured latency, smooths out chunks of unusually cheap or costly documents
+LATENCY_SMOOTHING = 0.5
+# A chunk grows or shrinks by at most this factor, so a single slow or fast chunk does not swing the size
+MAX_CHUNK_GROWTH = 2
+
+
+# Splits input documents into chunks passed to a single conftest command each. A chunk never exceeds the memory
+# limit, its number of documents follows the latency per document measured on previous chunks. The sizer is shared
+# by all workers, the latency of a document is about the same for every constraint of a run.
+class ChunkSizer(object):
+    def __init__(self, memory_limit: int, target_seconds: float = CHUNK_TARGET_SECONDS):
+        self.memory_limit = memory_limit
+        self.target_seconds = target_seconds
+        self._lock = Lock()
+        self._size = INITIAL_CHUNK_SIZE
+        self._seconds_per_document = None
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._size
+
+    def record(self, documents: int, seconds: float):
+        if documents < 1:
+            return
+        with self._lock:
+            seconds_per_document = seconds / documents
+            if self._seconds_per_document is None:
+                self._seconds_per_document = seconds_per_document
+            else:
+                self._seconds_per_document = LATENCY_SMOOTHING * seconds_per_document \
+                    + (1 - LATENCY_SMOOTHING) * self._seconds_per_document
+            if self._seconds_per_document > 0:
+                size = int(self.target_seconds / self._seconds_per_document)
+            else:
+                size = self._size * MAX_CHUNK_GROWTH
+            self._size = max(1, self._size // MAX_CHUNK_GROWTH, min(size, self._size * MAX_CHUNK_GROWTH))
+
+    # Documents are (key, serialized document) pairs, they are consumed lazily so only a single chunk is kept
+    # in memory at a time. Sizes are counted in characters, documents are almost entirely ASCII.
+    # A document larger than the memory limit is passed in a chunk of its own.
+    def chunks(self, documents: Iterable[Tuple[Any, str]]) -> Iterator[Tuple[Tuple[Any, str], ...]]:
+        chunk: List[Tuple[Any, str]] = []
+        chunk_length = 0
+        size = self.size
+        for key, document in documents:
+            document_length = len(document)
+            if chunk and (len(chunk) >= size or chunk_length + document_length > self.memory_limit):
+                yield tuple(chunk)
+                chunk = []
+                chunk_length = 0
+                # The size is read once the previous chunk has been evaluated
+                size = self.size
+            chunk.append((key, document))
+            chunk_length += document_length
+        if chunk:
+            yield tuple(chunk)
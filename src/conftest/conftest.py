@@ -2,146 +2,39 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import Dict, Iterable
-from yaml import safe_dump_all
+import re
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from os import path
+from shlex import join
+from subprocess import CompletedProcess
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
 from admissionreviewrequest import AdmissionReviewRequest
-from common.cmd import call_command, log_called_process_output
+from common.cmd import call_command
+from common.exceptions import ConftestError
 from common.files import write_to_file
-from common.logger import Logger, info_passed, info_failed
+from common.logger import Logger, info_passed, info_failed, lazy
+from common.profiler import Profiler
+from common.serialization import dump_fragment, join_documents, join_fragments
+from constraints import group_equivalent_constraints
 from constrainttemplates import Policy
-from inputobjects import filter_matching_constraint
-import re
-from .input import Input
-import json
-import xml.etree.ElementTree as ET
-
-
-def strip_ansi(text):
-    return re.sub('\033\\[([0-9]+)(;[0-9]+)*m', '', text)
-
-
-def extract_stdout(output_str: str) -> Dict:
-    summary = _get_initial_summary()
-
-    result_stripped = strip_ansi(output_str.splitlines()[-1])
-    result_summary = _match_summary(result_stripped)
-
-    if result_summary is not None:
-        for key in summary:
-            summary[key] += int(result_summary[key])
-    else:
-        Logger.get_instance().error(f'Unexpected format of summary output: {result_stripped}')
-        exit(1)
-
-    return summary
-
-
-def extract_json(output_str: str) -> Dict:
-    summary = _get_initial_summary()
-
-    results = json.loads(output_str)[0]
-    summary['passed'] += results.get('successes', 0)
-    summary['failures'] += len(results.get('failures', []))
-    summary['warnings'] += len(results.get('warnings', []))
-    summary['tests'] = summary['passed'] + summary['warnings'] + summary['failures'] + len(results.get('skipped', []))
-
-    return summary
-
-
-def extract_tap(output_str: str) -> Dict:
-    summary = _get_initial_summary()
-
-    summary['tests'] += int(re.match(r'1..(?P<tests>\d+)', output_str)['tests'])
-
-    summary['failures'] += len(re.findall(r'not ok', output_str[:output_str.find("#")], flags=re.MULTILINE))
-    summary['passed'] += len(re.findall(r'^ok', output_str, flags=re.MULTILINE))
-    warn_except = output_str[output_str.find("#") - 1: output_str.find("# successes")]
-    summary['warnings'] += len(re.findall(r'not ok',
-                                          warn_except[:warn_except.find("# exceptions")], flags=re.MULTILINE))
-    summary['exceptions'] += len(re.findall(r'not ok',
-                                            warn_except[warn_except.find("# exceptions"):], flags=re.MULTILINE))
-
-    return summary
-
-
-def extract_table(output_str: str) -> Dict:
-    summary = _get_initial_summary()
-
-    summary['failures'] += len(re.findall(r'failure', output_str))
-    summary['passed'] += len(re.findall(r'success', output_str))
-    summary['warnings'] += len(re.findall(r'warning', output_str))
-    summary['exceptions'] += len(re.findall(r'exception', output_str))
-    summary['tests'] = summary['failures'] + summary['passed'] + summary['warnings'] \
-        + summary['exceptions'] + len(re.findall(r'skipped', output_str))
-
-    return summary
+from inputobjects import MatchEngine
+from opa import OpaEval, OpaServer
+from .chunks import ChunkSizer
+from .input import Input, serialize_documents, serialize_inputs
+from .resultcache import ResultCache, get_result_key
+from .results import CheckResult, ConstraintResult, format_summary, get_output_formats, get_summary, \
+    merge_results, parse_conftest_json, render
+from .sinks import OutputSinks
 
-
-def extract_junit(output_str: str) -> Dict:
-    summary = _get_initial_summary()
-
-    testsuite = ET.fromstring(output_str).find('testsuite').attrib
-    summary['tests'] += int(testsuite.get('tests', 0))
-    summary['failures'] += int(testsuite.get('failures', 0))
-    summary['passed'] += int(testsuite.get('tests', 0)) - int(testsuite.get('failures', 0))
-
-    return summary
-
-
-def extract_github(output_str: str) -> Dict:
-    summary = _get_initial_summary()
-
-    result_stripped = strip_ansi(output_str.splitlines()[-1])
-    result_summary = _match_summary(result_stripped)
-
-    if result_summary is not None:
-        for key in summary:
-            summary[key] += int(result_summary[key])
-    else:
-        Logger.get_instance().error(f'Unexpected format of summary output: {result_stripped}')
-        exit(1)
-
-    return summary
-
-
-def _get_initial_summary() -> Dict:
-    return {
-        'tests': 0,
-        'passed': 0,
-        'warnings': 0,
-        'failures': 0,
-        'exceptions': 0
-    }
-
-
-def _match_summary(output: str) -> re.Match:
-    return re.match(
-        r'(?P<tests>\d+) test[s]?, (?P<passed>\d+) passed, (?P<warnings>\d+) warning[s]?,'
-        r' (?P<failures>\d+) failure[s]?, (?P<exceptions>\d+) exception[s]?', output)
-
-
-def extract_summary(result, output) -> Dict:
-    output_str = result.stdout if result.stdout else ''
-    if output_str:
-        if output == 'stdout':
-            return extract_stdout(output_str)
-        elif output == 'json':
-            return extract_json(output_str)
-        elif output == 'tap':
-            return extract_tap(output_str)
-        elif output == 'table':
-            return extract_table(output_str)
-        elif output == 'junit':
-            return extract_junit(output_str)
-        elif output == 'github':
-            return extract_github(output_str)
-    return _get_initial_summary()
+# Rules conftest counts as tests, other rules of a policy such as denylist or warnings are helpers
+RULE_PATTERN = re.compile('^(deny|violation|warn)(_[a-zA-Z0-9]+)*$')
 
 
 def log_overall_summary(summary, logger):
-    formatted_output = f'{summary["tests"]} tests, {summary["passed"]} passed, {summary["warnings"]} warnings, ' \
-                       f'{summary["failures"]} failures, {summary["exceptions"]} exceptions'
+    formatted_output = format_summary(summary)
     if summary['tests'] == summary['passed']:
         info_passed(logger, formatted_output)
     else:
@@ -157,62 +50,435 @@ def run_conftest(
     output_format: str,
     output_file: str,
     warning_mode: bool,
-    fail_fast: bool
-):
+    fail_fast: bool,
+    jobs: int = 1,
+    batch: bool = False,
+    opa_evaluator: Optional[Union[OpaServer, OpaEval]] = None,
+    input_encoding: str = 'yaml',
+    result_cache: Optional[ResultCache] = None,
+    output_dir: Optional[str] = None,
+    chunk_sizer: Optional[ChunkSizer] = None
+) -> int:
     logger = Logger.get_instance()
     logger.debug('Call run_conftest')
 
-    overall_status_summary = _get_initial_summary()
-
-    output_format = 'stdout' if output_format is None else output_format
+    # Output files are written constraint by constraint and finalized once all results are reported
+    with OutputSinks(output_format, output_file, output_dir) as output_sinks, \
+            ThreadPoolExecutor(max_workers=jobs) as executor:
+        evaluations = submit_conftest(
+            executor, policies_dir, policies, constraints, admission_review_namespaces, admission_review_requests,
+            batch, opa_evaluator, input_encoding, result_cache, chunk_sizer
+        )
+        return report_conftest(evaluations, output_format, warning_mode, fail_fast, opa_evaluator,
+                               output_sinks.write if output_sinks else None)
 
-    exit_with_fail = False
 
-    for constraint in constraints:
-        logger.debug('')
-        logger.debug('Filtering admission review requests matching constraint ' + constraint['metadata']['name'])
-        admission_review_requests_matching_constraint = filter_matching_constraint(
-            admission_review_requests, constraint['spec']['match'], admission_review_namespaces
+def submit_conftest(
+    executor: Executor,
+    policies_dir: str,
+    policies: Dict[str, Policy],
+    constraints: Iterable[Dict],
+    admission_review_namespaces: Iterable[AdmissionReviewRequest],
+    admission_review_requests: Iterable[AdmissionReviewRequest],
+    batch: bool = False,
+    opa_evaluator: Optional[Union[OpaServer, OpaEval]] = None,
+    input_encoding: str = 'yaml',
+    result_cache: Optional[ResultCache] = None,
+    chunk_sizer: Optional[ChunkSizer] = None
+) -> Tuple[Tuple[Tuple[Tuple[Dict, ...], ...], Future], ...]:
+    # Evaluations only start on the executor, several inputs can share one executor and be reported one by one
+
+    # Equivalent constraints are evaluated once, through their first member
+    equivalent_constraints = {id(group[0]): group for group in group_equivalent_constraints(constraints)}
+    if batch:
+        batches = tuple(
+            tuple(equivalent_constraints[id(constraint)] for constraint in namespace_constraints)
+            for namespace_constraints in group_constraints_by_policy_namespace(
+                (group[0] for group in equivalent_constraints.values()), policies
+            ).values()
         )
-
-        parameters = constraint['spec']['parameters'] if 'parameters' in constraint['spec'] else {}
-        stdin = safe_dump_all(
-            Input(admission_review_request, parameters).as_dict()
-            for admission_review_request in admission_review_requests_matching_constraint
+    else:
+        batches = tuple((group,) for group in equivalent_constraints.values())
+
+    with Profiler.get_instance().stage('index'):
+        match_engine = MatchEngine(admission_review_requests, admission_review_namespaces)
+
+    return tuple(
+        (
+            constraint_groups,
+            executor.submit(
+                _test_constraints, policies_dir, policies, constraint_groups, match_engine, batch, opa_evaluator,
+                input_encoding, result_cache, chunk_sizer
+            )
         )
-        if stdin == '':
-            logger.debug('No admission review request matching constraint found. Skipping.')
-            continue
+        for constraint_groups in batches
+    )
 
-        logger.info('')
-        logger.info('Calling conftest command for constraint ' + constraint['metadata']['name'])
-        if output_file:
-            command = f'conftest test - --policy {policies_dir} --namespace {policies[constraint["kind"]].namespace} ' \
-                      f'-o {output_format} --no-color || exit 0 '
-        else:
-            command = f'conftest test - --policy {policies_dir} --namespace {policies[constraint["kind"]].namespace} ' \
-                  f'-o {output_format} || exit 0 '
-        logger.debug(command)
 
-        result = call_command(command, stdin)
-        log_called_process_output(logger.info, result)
+def report_conftest(
+    evaluations: Tuple[Tuple[Tuple[Tuple[Dict, ...], ...], Future], ...],
+    output_format: str,
+    warning_mode: bool,
+    fail_fast: bool,
+    opa_evaluator: Optional[Union[OpaServer, OpaEval]] = None,
+    write_result: Optional[Callable[[ConstraintResult], None]] = None
+) -> int:
+    logger = Logger.get_instance()
+    profiler = Profiler.get_instance()
+
+    # Only the first output format is logged. Results written to output files are not repeated in the log,
+    # only their summary is, unless verbose output is requested.
+    log_format = get_output_formats(output_format)[0]
+    overall_status_summary = get_summary(())
+
+    exit_with_fail = False
 
-        if output_file:
-            write_to_file(output_file, result.stdout)
+    # Results are consumed in submission order, so the output does not depend on which worker finishes first
+    for constraint_groups, future in evaluations:
+        constraint_results = _expand_equivalent_constraints(constraint_groups, future.result())
+        if not constraint_results:
+            continue
+        results = tuple(result for constraint_result in constraint_results for result in constraint_result.results)
 
-        if result.stderr != '' or 'FAIL' in result.stdout:
+        logger.info('')
+        if opa_evaluator:
+            logger.info(f'Evaluating constraint {_constraint_names(constraint_groups)} '
+                        f'with {opa_evaluator.description}')
+        else:
+            logger.info('Calling conftest command for constraint ' + _constraint_names(constraint_groups))
+        for line in constraint_results[0].stderr.strip().splitlines():
+            logger.info('[stderr]: ' + line)
+        with profiler.stage('render'):
+            if write_result:
+                for constraint_result in constraint_results:
+                    write_result(constraint_result)
+                logger.debug(lazy(render, results, log_format))
+                logger.info(format_summary(get_summary(results)))
+            else:
+                for line in render(results, log_format).strip().splitlines():
+                    logger.info(line)
+
+        if any(constraint_result.failed for constraint_result in constraint_results):
             logger.error('One or more tests fail to run')
             if fail_fast:
+                _cancel(future for _, future in evaluations)
                 if warning_mode:
-                    exit(0)
+                    return 0
                 else:
-                    exit(1)
+                    return 1
             elif not warning_mode:
                 exit_with_fail = True
-        overall_status_summary = extract_summary(result, output_format)
-        logger.info(result.stdout)
+        with profiler.stage('summarize'):
+            _add_summary(overall_status_summary, get_summary(results))
 
     log_overall_summary(overall_status_summary, logger)
 
     if exit_with_fail:
-        exit(1)
+        return 1
+    return 0
+
+
+def group_constraints_by_policy_namespace(
+    constraints: Iterable[Dict], policies: Dict[str, Policy]
+) -> Dict[str, Tuple[Dict, ...]]:
+    groups = {}
+    for constraint in constraints:
+        namespace = policies[constraint['kind']].namespace
+        groups[namespace] = groups.get(namespace, ()) + (constraint,)
+    return groups
+
+
+def _test_constraints(
+    policies_dir: str,
+    policies: Dict[str, Policy],
+    constraint_groups: Tuple[Tuple[Dict, ...], ...],
+    match_engine: MatchEngine,
+    batch: bool,
+    opa_evaluator: Optional[Union[OpaServer, OpaEval]],
+    input_encoding: str,
+    result_cache: Optional[ResultCache],
+    chunk_sizer: Optional[ChunkSizer]
+) -> Tuple[ConstraintResult, ...]:
+    logger = Logger.get_instance()
+    profiler = Profiler.get_instance()
+
+    constraints = tuple(constraint_group[0] for constraint_group in constraint_groups)
+    with profiler.stage('match'):
+        inputs = tuple(
+            (constraint, _get_matching_admission_reviews(constraint, match_engine)) for constraint in constraints
+        )
+    inputs = tuple((constraint, admission_reviews) for constraint, admission_reviews in inputs if admission_reviews)
+    if not inputs:
+        logger.debug('No admission review request matching constraint found. Skipping.')
+        return ()
+
+    policy = policies[constraints[0]['kind']]
+    if opa_evaluator:
+        with profiler.stage('execute'):
+            return _evaluate_with_opa(
+                opa_evaluator,
+                policy,
+                tuple(
+                    (
+                        constraint,
+                        tuple(
+                            Input(admission_review, _get_parameters(constraint))
+                            for admission_review in admission_reviews
+                        )
+                    )
+                    for constraint, admission_reviews in inputs
+                )
+            )
+    if result_cache:
+        with profiler.stage('execute'):
+            return _evaluate_with_result_cache(result_cache, policies_dir, policy, inputs, input_encoding)
+
+    if chunk_sizer:
+        return _evaluate_in_chunks(chunk_sizer, policies_dir, policy, inputs, batch, input_encoding)
+
+    with profiler.stage('serialize'):
+        inputs = tuple(
+            (constraint, serialize_inputs(admission_reviews, _get_parameters(constraint), input_encoding))
+            for constraint, admission_reviews in inputs
+        )
+    with profiler.stage('execute'):
+        results, stderr = _call_conftest(policies_dir, policy, inputs, batch)
+    return tuple(
+        ConstraintResult(constraint, results.get(_get_input_name(constraint), ()), stderr) for constraint, _ in inputs
+    )
+
+
+def _call_conftest(
+    policies_dir: str, policy: Policy, inputs: Tuple[Tuple[Dict, str], ...], batch: bool
+) -> Tuple[Dict[str, Tuple[CheckResult, ...]], str]:
+    # Returns results by the input name of the constraint, and the stderr of the conftest command
+    if not batch:
+        process_result = call_command(get_conftest_command(('-',), policies_dir, policy), inputs[0][1], check=False)
+        # Documents read from stdin are reported as a single input file, it is named after the constraint
+        input_name = _get_input_name(inputs[0][0])
+        return (
+            {input_name: tuple(result.renamed(input_name) for result in _parse_results(process_result))},
+            process_result.stderr
+        )
+
+    # Every constraint gets its own input file, so conftest reports results under the constraint kind and name
+    with TemporaryDirectory() as inputs_dir:
+        input_files = []
+        for constraint, stdin in inputs:
+            input_file = path.join(inputs_dir, _get_input_name(constraint) + '.yaml')
+            write_to_file(input_file, stdin)
+            input_files.append(input_file)
+        process_result = call_command(get_conftest_command(input_files, policies_dir, policy), text=True, check=False)
+
+    results = {}
+    for result in _parse_results(process_result):
+        input_name = path.splitext(path.basename(result.filename))[0]
+        results[input_name] = results.get(input_name, ()) + (result.renamed(input_name),)
+    return results, process_result.stderr
+
+
+def _evaluate_in_chunks(
+    chunk_sizer: ChunkSizer,
+    policies_dir: str,
+    policy: Policy,
+    inputs: Tuple[Tuple[Dict, Tuple[AdmissionReviewRequest, ...]], ...],
+    batch: bool,
+    input_encoding: str
+) -> Tuple[ConstraintResult, ...]:
+    # Documents of all constraints are split into chunks evaluated by a conftest command each, the results of
+    # the chunks are merged into a single result per constraint
+    profiler = Profiler.get_instance()
+
+    # Serialized reviews are not cached, so documents of evaluated chunks are released and memory stays bounded
+    documents = (
+        (index, document)
+        for index, (constraint, admission_reviews) in enumerate(inputs)
+        for document in serialize_documents(admission_reviews, _get_parameters(constraint), input_encoding, False)
+    )
+    results = {}
+    stderr = {}
+    chunks = chunk_sizer.chunks(documents)
+    while True:
+        with profiler.stage('serialize'):
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            chunk_inputs = {}
+            for index, document in chunk:
+                chunk_inputs.setdefault(index, []).append(document)
+            chunk_inputs = tuple(
+                (inputs[index][0], join_documents(index_documents, input_encoding))
+                for index, index_documents in chunk_inputs.items()
+            )
+        Logger.get_instance().debug(f'Evaluating chunk of {len(chunk)} documents of policy {policy.namespace}')
+        with profiler.stage('execute'):
+            start = perf_counter()
+            chunk_results, chunk_stderr = _call_conftest(policies_dir, policy, chunk_inputs, batch)
+            chunk_sizer.record(len(chunk), perf_counter() - start)
+        for constraint, _ in chunk_inputs:
+            input_name = _get_input_name(constraint)
+            results[input_name] = results.get(input_name, ()) + chunk_results.get(input_name, ())
+            if chunk_stderr:
+                stderr[input_name] = stderr.get(input_name, '') + chunk_stderr
+    return tuple(
+        ConstraintResult(
+            constraint,
+            merge_results(results.get(_get_input_name(constraint), ())),
+            stderr.get(_get_input_name(constraint), '')
+        )
+        for constraint, _ in inputs
+    )
+
+
+def _expand_equivalent_constraints(
+    constraint_groups: Tuple[Tuple[Dict, ...], ...], constraint_results: Tuple[ConstraintResult, ...]
+) -> Tuple[ConstraintResult, ...]:
+    # Every member of a group of equivalent constraints gets the results of the evaluated first member
+    results = {id(constraint_result.constraint): constraint_result for constraint_result in constraint_results}
+    return tuple(
+        ConstraintResult(
+            constraint,
+            tuple(result.renamed(_get_input_name(constraint)) for result in results[id(group[0])].results),
+            results[id(group[0])].stderr
+        )
+        for group in constraint_groups if id(group[0]) in results
+        for constraint in group
+    )
+
+
+def _get_matching_admission_reviews(
+    constraint: Dict, match_engine: MatchEngine
+) -> Tuple[AdmissionReviewRequest, ...]:
+    logger = Logger.get_instance()
+
+    logger.debug('Filtering admission review requests matching constraint %s', constraint['metadata']['name'])
+    return match_engine.match(constraint['spec']['match'])
+
+
+def _get_parameters(constraint: Dict) -> Dict:
+    return constraint['spec']['parameters'] if 'parameters' in constraint['spec'] else {}
+
+
+def _get_input_name(constraint: Dict) -> str:
+    return f'{constraint["kind"]}-{constraint["metadata"]["name"]}'
+
+
+def get_conftest_command(inputs: Sequence[str], policies_dir: str, policy: Policy) -> List[str]:
+    # Only the queried policy and its libs are loaded, policies without saved files are read from policies_dir.
+    # Results are always read as json, the output formats are rendered from them. Failing tests make conftest
+    # exit with a non-zero code, so the command is not checked, errors are told apart by stderr.
+    command = ['conftest', 'test', *inputs]
+    for policy_path in policy.files or (policies_dir,):
+        command += ['--policy', policy_path]
+    command += ['--namespace', policy.namespace, '-o', 'json']
+    Logger.get_instance().debug(join(command))
+    return command
+
+
+def _parse_results(process_result: CompletedProcess) -> Tuple[CheckResult, ...]:
+    # Conftest reports errors of its own, e.g. a policy failing to compile, on stderr without any results
+    if process_result.stderr and not process_result.stdout.strip():
+        return ()
+    return parse_conftest_json(process_result.stdout)
+
+
+def _evaluate_with_opa(
+    opa_evaluator: Union[OpaServer, OpaEval], policy: Policy, inputs: Tuple[Tuple[Dict, Tuple[Input, ...]], ...]
+) -> Tuple[ConstraintResult, ...]:
+    # Documents of all constraints are evaluated at once, results are gathered the same way conftest does:
+    # every deny/violation/warn rule is a single test per document
+    documents_results = iter(opa_evaluator.evaluate_documents(
+        policy, tuple(document.as_dict() for _, documents in inputs for document in documents)
+    ))
+    constraint_results = []
+    for constraint, documents in inputs:
+        result = CheckResult(_get_input_name(constraint), policy.namespace)
+        for document_results in (next(documents_results) for _ in documents):
+            for rule, rule_results in document_results.items():
+                if not RULE_PATTERN.match(rule):
+                    continue
+                if not rule_results:
+                    result.successes += 1
+                elif rule.startswith('warn'):
+                    result.warnings += (_to_conftest_result(rule_result) for rule_result in rule_results)
+                else:
+                    result.failures += (_to_conftest_result(rule_result) for rule_result in rule_results)
+        constraint_results.append(ConstraintResult(constraint, (result,)))
+    return tuple(constraint_results)
+
+
+def _evaluate_with_result_cache(
+    result_cache: ResultCache,
+    policies_dir: str,
+    policy: Policy,
+    inputs: Tuple[Tuple[Dict, Tuple[AdmissionReviewRequest, ...]], ...],
+    input_encoding: str
+) -> Tuple[ConstraintResult, ...]:
+    # Every input document is cached on its own, only documents without a cached verdict are passed to conftest
+    documents = {}
+    constraint_keys = []
+    for constraint, admission_reviews in inputs:
+        parameters_fragment = dump_fragment('parameters', _get_parameters(constraint), input_encoding)
+        keys = []
+        for admission_review in admission_reviews:
+            document = join_fragments((admission_review.serialize(input_encoding), parameters_fragment), input_encoding)
+            key = get_result_key('\n'.join((policy.policy,) + policy.libs), document)
+            documents[key] = document
+            keys.append(key)
+        constraint_keys.append((constraint, keys))
+
+    verdicts = {key: result_cache.get(key) for key in documents}
+    missing_documents = {key: document for key, document in documents.items() if verdicts[key] is None}
+    Logger.get_instance().debug(f'{len(documents) - len(missing_documents)} of {len(documents)} input documents '
+                                f'found in result cache')
+    if missing_documents:
+        # Files are named after the cache key, so conftest reports the verdict of each document separately
+        with TemporaryDirectory() as inputs_dir:
+            for key, document in missing_documents.items():
+                write_to_file(path.join(inputs_dir, key + '.yaml'), document)
+            command = get_conftest_command((inputs_dir,), policies_dir, policy)
+            process_result = call_command(command, text=True, check=False)
+        if process_result.stderr != '':
+            return tuple(ConstraintResult(constraint, (), process_result.stderr) for constraint, _ in inputs)
+        for file_result in parse_conftest_json(process_result.stdout):
+            key = path.splitext(path.basename(file_result.filename))[0]
+            # Every counter of the result is cached, a cached verdict reports the same as the first evaluation
+            verdicts[key] = {name: value for name, value in file_result.as_dict().items()
+                             if name not in ('filename', 'namespace')}
+            result_cache.put(key, verdicts[key])
+        if None in verdicts.values():
+            raise ConftestError('Conftest did not report results of all input documents')
+
+    constraint_results = []
+    for constraint, keys in constraint_keys:
+        input_name = _get_input_name(constraint)
+        results = merge_results(
+            CheckResult.from_dict(dict(verdicts[key], filename=input_name, namespace=policy.namespace)) for key in keys
+        )
+        constraint_results.append(ConstraintResult(constraint, results))
+    return tuple(constraint_results)
+
+
+def _to_conftest_result(rule_result) -> Dict:
+    if not isinstance(rule_result, dict):
+        return {'msg': str(rule_result)}
+    metadata = {key: value for key, value in rule_result.items() if key != 'msg'}
+    if metadata:
+        return {'msg': rule_result.get('msg', ''), 'metadata': metadata}
+    return {'msg': rule_result.get('msg', '')}
+
+
+def _constraint_names(constraint_groups: Iterable[Tuple[Dict, ...]]) -> str:
+    return ', '.join(
+        constraint['metadata']['name'] for constraint_group in constraint_groups for constraint in constraint_group
+    )
+
+
+def _add_summary(summary: Dict, other: Dict):
+    for key in summary:
+        summary[key] += other[key]
+
+
+def _cancel(futures: Iterable[Future]):
+    for future in futures:
+        future.cancel()
@@ -2,9 +2,10 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, Iterator
 
 from admissionreviewrequest import AdmissionReviewRequest
+from common.serialization import dump_fragment, join_documents, join_fragments
 
 
 class Input(object):
@@ -14,3 +15,20 @@ class Input(object):
 
     def as_dict(self) -> Dict[str, Any]:
         return {"review": self.review.as_dict(), "parameters": self.parameters}
+
+
+def serialize_inputs(admission_reviews: Iterable[AdmissionReviewRequest], parameters: dict, encoding='yaml') -> str:
+    return join_documents(serialize_documents(admission_reviews, parameters, encoding), encoding)
+
+
+def serialize_documents(
+    admission_reviews: Iterable[AdmissionReviewRequest], parameters: dict, encoding='yaml', cache=True
+) -> Iterator[str]:
+    # Equivalent to dumping Input(review, parameters).as_dict() of every review, but each review is serialized only
+    # once per run and reused by every constraint it matches, only the parameters are serialized per constraint.
+    # Without cache the reviews are serialized again for every call and nothing is kept once a document is consumed.
+    parameters_fragment = dump_fragment('parameters', parameters, encoding)
+    return (
+        join_fragments((admission_review.serialize(encoding, cache), parameters_fragment), encoding)
+        for admission_review in admission_reviews
+    )
@@ -0,0 +1,100 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import re
+from hashlib import sha256
+from os import listdir, makedirs, path, remove, stat, utime
+from shutil import rmtree
+from typing import Dict, Optional
+
+from common.cmd import call_command
+from common.exceptions import FileError
+from common.files import write_to_file_atomically
+from common.logger import Logger
+
+# Marks the version directories created by the result cache, only those are removed from the cache directory
+RESULT_CACHE_MARKER = '.conftest-runner-result-cache'
+VERSION_DIR_PATTERN = re.compile('[0-9a-f]{16}')
+# Changed whenever cached verdicts change their content, verdicts of earlier runner versions are not reused
+RESULT_FORMAT = '2'
+
+
+# Verdicts of single input documents evaluated by a policy, kept on disk between runs.
+# Entries live in a directory named after the conftest version, so upgrading conftest (or the OPA it embeds)
+# never reuses verdicts of the previous version.
+class ResultCache(object):
+    def __init__(self, cache_dir: str, max_size: int, version: str):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.version = version
+        self.entries_dir = path.join(cache_dir, sha256((RESULT_FORMAT + '\0' + version).encode()).hexdigest()[:16])
+
+    def open(self):
+        try:
+            makedirs(self.entries_dir, exist_ok=True)
+            if not path.exists(path.join(self.entries_dir, RESULT_CACHE_MARKER)):
+                write_to_file_atomically(path.join(self.entries_dir, RESULT_CACHE_MARKER), self.version)
+        except OSError as e:
+            raise FileError('Creating directory failed: ' + str(e))
+        for entry in listdir(self.cache_dir):
+            entry_path = path.join(self.cache_dir, entry)
+            if entry_path != self.entries_dir and VERSION_DIR_PATTERN.fullmatch(entry) \
+                    and path.isfile(path.join(entry_path, RESULT_CACHE_MARKER)):
+                Logger.get_instance().debug('Removing results cached by another conftest version: ' + entry_path)
+                rmtree(entry_path, ignore_errors=True)
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry_path = self._get_entry_path(key)
+        try:
+            with open(entry_path) as f:
+                result = json.load(f)
+            # Modification time records the last use, the least recently used entries are pruned first
+            utime(entry_path)
+        except (OSError, ValueError):
+            return None
+        return result
+
+    def put(self, key: str, result: Dict):
+        write_to_file_atomically(self._get_entry_path(key), json.dumps(result))
+
+    def prune(self):
+        entries = []
+        for entry in listdir(self.entries_dir):
+            if not entry.endswith('.json'):
+                continue
+            try:
+                entry_stat = stat(path.join(self.entries_dir, entry))
+            except OSError:
+                continue
+            entries.append((entry_stat.st_mtime, entry_stat.st_size, entry))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, entry in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                remove(path.join(self.entries_dir, entry))
+            except OSError:
+                continue
+            size -= entry_size
+
+    def _get_entry_path(self, key: str) -> str:
+        return path.join(self.entries_dir, key + '.json')
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.prune()
+
+
+def get_result_key(policy: str, document: str) -> str:
+    # The document holds both the admission review and the constraint parameters
+    return sha256(policy.encode() + b'\0' + document.encode()).hexdigest()
+
+
+def get_conftest_version() -> str:
+    return call_command(['conftest', '--version']).stdout.decode()
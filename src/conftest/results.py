@@ -0,0 +1,277 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+from typing import Dict, Iterable, List, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from common.exceptions import ConftestError
+
+OUTPUT_FORMATS = ('stdout', 'json', 'jsonl', 'tap', 'table', 'junit', 'github')
+OUTPUT_FILE_EXTENSIONS = {
+    'stdout': '.txt',
+    'json': '.json',
+    'jsonl': '.jsonl',
+    'tap': '.tap',
+    'table': '.table',
+    'junit': '.xml',
+    'github': '.github',
+}
+
+
+# Results of one input file as reported by `conftest test -o json`, failures, warnings, exceptions and skipped
+# are lists of {"msg": ..., "metadata": ...} entries
+class CheckResult(object):
+    def __init__(self, filename: str, namespace: str, successes: int = 0, failures: List[Dict] = None,
+                 warnings: List[Dict] = None, exceptions: List[Dict] = None, skipped: List[Dict] = None):
+        self.filename = filename
+        self.namespace = namespace
+        self.successes = successes
+        self.failures = failures or []
+        self.warnings = warnings or []
+        self.exceptions = exceptions or []
+        self.skipped = skipped or []
+
+    @staticmethod
+    def from_dict(result: Dict):
+        return CheckResult(
+            result.get('filename', ''),
+            result.get('namespace', ''),
+            result.get('successes', 0),
+            result.get('failures'),
+            result.get('warnings'),
+            result.get('exceptions'),
+            result.get('skipped')
+        )
+
+    def as_dict(self) -> Dict:
+        # Empty lists are left out, as conftest does
+        result = {'filename': self.filename, 'namespace': self.namespace, 'successes': self.successes}
+        for key in ('warnings', 'failures', 'exceptions', 'skipped'):
+            if getattr(self, key):
+                result[key] = getattr(self, key)
+        return result
+
+    def renamed(self, filename: str):
+        return CheckResult(filename, self.namespace, self.successes, self.failures, self.warnings, self.exceptions,
+                           self.skipped)
+
+
+# Results of a single constraint, stderr holds errors of the conftest command evaluating it
+class ConstraintResult(object):
+    def __init__(self, constraint: Dict, results: Tuple[CheckResult, ...], stderr: str = '', job: str = None):
+        self.constraint = constraint
+        self.results = results
+        self.stderr = stderr
+        self.job = job
+
+    @property
+    def name(self) -> str:
+        return self.constraint['metadata']['name']
+
+    @property
+    def input_name(self) -> str:
+        return f'{self.constraint["kind"]}-{self.name}'
+
+    @property
+    def failed(self) -> bool:
+        return self.stderr != '' or any(result.failures for result in self.results)
+
+
+def parse_conftest_json(output_str: str) -> Tuple[CheckResult, ...]:
+    if not output_str.strip():
+        return ()
+    try:
+        return tuple(CheckResult.from_dict(result) for result in json.loads(output_str))
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ConftestError('Unexpected format of conftest output: ' + str(e))
+
+
+def merge_results(results: Iterable[CheckResult]) -> Tuple[CheckResult, ...]:
+    # Results of the same input file and namespace reported by several conftest commands, e.g. for chunks of
+    # the documents of a constraint, are reported as one, in the order they first appear
+    merged = {}
+    for result in results:
+        key = (result.filename, result.namespace)
+        if key not in merged:
+            merged[key] = CheckResult(result.filename, result.namespace)
+        merged[key].successes += result.successes
+        merged[key].failures += result.failures
+        merged[key].warnings += result.warnings
+        merged[key].exceptions += result.exceptions
+        merged[key].skipped += result.skipped
+    return tuple(merged.values())
+
+
+def get_summary(results: Iterable[CheckResult]) -> Dict:
+    summary = {'tests': 0, 'passed': 0, 'warnings': 0, 'failures': 0, 'exceptions': 0}
+    skipped = 0
+    for result in results:
+        summary['passed'] += result.successes
+        summary['warnings'] += len(result.warnings)
+        summary['failures'] += len(result.failures)
+        summary['exceptions'] += len(result.exceptions)
+        skipped += len(result.skipped)
+    summary['tests'] = summary['passed'] + summary['warnings'] + summary['failures'] + summary['exceptions'] + skipped
+    return summary
+
+
+def format_summary(summary: Dict) -> str:
+    return f'{summary["tests"]} tests, {summary["passed"]} passed, {summary["warnings"]} warnings, ' \
+           f'{summary["failures"]} failures, {summary["exceptions"]} exceptions'
+
+
+def get_output_formats(output_format) -> Tuple[str, ...]:
+    # Several formats are given as a comma separated list, e.g. stdout,junit
+    if not output_format:
+        return ('stdout',)
+    if isinstance(output_format, str):
+        return tuple(output_format.split(','))
+    return tuple(output_format)
+
+
+def get_output_files(output_file: str, output_formats: Tuple[str, ...]) -> Dict[str, str]:
+    # A single format is written to the output file, several formats to files differing in the extension
+    if len(output_formats) == 1:
+        return {output_formats[0]: output_file}
+    root = output_file[:-len(OUTPUT_FILE_EXTENSIONS[output_formats[0]])] \
+        if output_file.endswith(OUTPUT_FILE_EXTENSIONS[output_formats[0]]) else output_file
+    return {output_format: root + OUTPUT_FILE_EXTENSIONS[output_format] for output_format in output_formats}
+
+
+def render(results: Iterable[CheckResult], output_format: str) -> str:
+    results = tuple(results)
+    return RENDERERS[output_format](results)
+
+
+def render_stdout(results: Tuple[CheckResult, ...]) -> str:
+    lines = []
+    for result in results:
+        lines += render_stdout_lines(result)
+    lines.append('')
+    lines.append(format_summary(get_summary(results)))
+    return '\n'.join(lines)
+
+
+def render_stdout_lines(result: CheckResult) -> List[str]:
+    lines = [f'WARN - {result.filename} - {result.namespace} - {w["msg"]}' for w in result.warnings]
+    lines += (f'FAIL - {result.filename} - {result.namespace} - {f["msg"]}' for f in result.failures)
+    lines += (f'EXCP - {result.filename} - {result.namespace} - {e["msg"]}' for e in result.exceptions)
+    return lines
+
+
+def render_json(results: Tuple[CheckResult, ...]) -> str:
+    return json.dumps([result.as_dict() for result in results], indent=4)
+
+
+def render_jsonl(results: Tuple[CheckResult, ...]) -> str:
+    # One compact JSON document per line, so results can be appended and read without parsing the whole file
+    return '\n'.join(json.dumps(result.as_dict(), separators=(',', ':')) for result in results)
+
+
+def render_tap(results: Tuple[CheckResult, ...]) -> str:
+    lines = [f'1..{get_summary(results)["tests"]}']
+    counter = 0
+    for result in results:
+        prefix = f'{result.filename} - {result.namespace} - '
+        for title, status, entries in (
+            (None, 'not ok', result.failures),
+            ('# warnings', 'not ok', result.warnings),
+            ('# exceptions', 'not ok', result.exceptions),
+            ('# successes', 'ok', ({'msg': ''},) * result.successes),
+            ('# skip', 'ok', result.skipped),
+        ):
+            if title and entries:
+                lines.append(title)
+            for entry in entries:
+                counter += 1
+                lines.append(f'{status} {counter} - {prefix}{entry["msg"]}'.rstrip())
+    return '\n'.join(lines)
+
+
+def render_table(results: Tuple[CheckResult, ...]) -> str:
+    rows = []
+    for result in results:
+        rows += (('success', result.filename, result.namespace, '') for _ in range(result.successes))
+        rows += (('warning', result.filename, result.namespace, w['msg']) for w in result.warnings)
+        rows += (('failure', result.filename, result.namespace, f['msg']) for f in result.failures)
+        rows += (('exception', result.filename, result.namespace, e['msg']) for e in result.exceptions)
+        rows += (('skipped', result.filename, result.namespace, s['msg']) for s in result.skipped)
+
+    header = ('RESULT', 'FILE', 'NAMESPACE', 'MESSAGE')
+    widths = [max(len(row[column]) for row in rows + [header]) for column in range(len(header))]
+    border = '+' + '+'.join('-' * (width + 2) for width in widths) + '+'
+
+    def format_row(row):
+        return '| ' + ' | '.join(value.ljust(width) for value, width in zip(row, widths)) + ' |'
+
+    return '\n'.join([border, format_row(header), border] + [format_row(row) for row in rows] + [border])
+
+
+def render_junit(results: Tuple[CheckResult, ...]) -> str:
+    return '\n'.join(
+        ['<?xml version="1.0" encoding="UTF-8"?>', '<testsuites>']
+        + render_junit_testsuite('conftest', results)
+        + ['</testsuites>']
+    )
+
+
+def render_junit_testsuite(name: str, results: Tuple[CheckResult, ...]) -> List[str]:
+    # Warnings do not fail the test case, they are reported as its output
+    summary = get_summary(results)
+    skipped = sum(len(result.skipped) for result in results)
+    lines = [
+        f'\t<testsuite tests="{summary["tests"]}" failures="{summary["failures"]}" skipped="{skipped}" '
+        f'time="0.000" name={quoteattr(name)}>',
+    ]
+    for result in results:
+        prefix = f'{result.filename} - {result.namespace} - '
+        for failure in result.failures:
+            lines.append(_junit_testcase(prefix + failure['msg'],
+                                         f'<failure message="Failed" type="">{escape(failure["msg"])}</failure>'))
+        for warning in result.warnings:
+            lines.append(_junit_testcase(prefix + warning['msg'],
+                                         f'<system-out>{escape(warning["msg"])}</system-out>'))
+        for exception in result.exceptions:
+            lines.append(_junit_testcase(prefix + exception['msg'],
+                                         f'<system-out>{escape(exception["msg"])}</system-out>'))
+        for skipped in result.skipped:
+            lines.append(_junit_testcase(prefix + skipped['msg'], '<skipped message="Skipped"></skipped>'))
+        lines += (_junit_testcase(prefix, '') for _ in range(result.successes))
+    lines.append('\t</testsuite>')
+    return lines
+
+
+def render_github(results: Tuple[CheckResult, ...]) -> str:
+    lines = []
+    for result in results:
+        lines += render_github_group(result)
+    lines.append(format_summary(get_summary(results)))
+    return '\n'.join(lines)
+
+
+def render_github_group(result: CheckResult) -> List[str]:
+    tests = get_summary((result,))['tests']
+    lines = [f"::group::Testing '{result.filename}' against {tests} policies in namespace '{result.namespace}'"]
+    lines += (f'::error file={result.filename}::{f["msg"]}' for f in result.failures)
+    lines += (f'::warning file={result.filename}::{w["msg"]}' for w in result.warnings)
+    lines += (f'::notice file={result.filename}::{e["msg"]}' for e in result.exceptions)
+    lines.append(f'success file={result.filename} {result.successes}')
+    lines.append('::endgroup::')
+    return lines
+
+
+RENDERERS = {
+    'stdout': render_stdout,
+    'json': render_json,
+    'jsonl': render_jsonl,
+    'tap': render_tap,
+    'table': render_table,
+    'junit': render_junit,
+    'github': render_github,
+}
+
+
+def _junit_testcase(name: str, content: str) -> str:
+    return f'\t\t<testcase classname="conftest" name={quoteattr(name)} time="0.000">{content}</testcase>'
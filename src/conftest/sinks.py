@@ -0,0 +1,213 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import re
+from abc import ABC, abstractmethod
+from contextlib import ExitStack
+from os import makedirs, path
+from textwrap import indent
+from typing import Iterable, List, Optional, Tuple
+
+from common.exceptions import FileError
+from common.files import open_atomically, write_to_file_atomically
+from .results import CheckResult, ConstraintResult, OUTPUT_FILE_EXTENSIONS, format_summary, get_output_files, \
+    get_output_formats, get_summary, render, render_github_group, render_junit_testsuite, render_stdout_lines
+
+# Results are written as they arrive, at most this many characters are buffered before they reach the file
+OUTPUT_BUFFER_SIZE = 64 * 1024
+
+
+# Output file written incrementally, constraint by constraint. The file is only renamed into place when
+# the sink is closed without an error, so a failed run never leaves a truncated file behind.
+class OutputSink(ABC):
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._exit_stack = None
+        self._file = None
+
+    def __enter__(self):
+        self._exit_stack = ExitStack()
+        self._file = self._exit_stack.enter_context(open_atomically(self.file_path, OUTPUT_BUFFER_SIZE))
+        self._write_header()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._write_footer()
+        return self._exit_stack.__exit__(exc_type, exc_value, traceback)
+
+    @abstractmethod
+    def write(self, constraint_result: ConstraintResult):
+        pass
+
+    def _write_header(self):
+        pass
+
+    def _write_footer(self):
+        pass
+
+    def _write_lines(self, lines: Iterable[str]):
+        for line in lines:
+            self._file.write(line + '\n')
+
+
+class StdoutSink(OutputSink):
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self._summary = get_summary(())
+
+    def write(self, constraint_result: ConstraintResult):
+        for result in constraint_result.results:
+            self._write_lines(render_stdout_lines(result))
+            _add_summary(self._summary, result)
+
+    def _write_footer(self):
+        self._write_lines(('', format_summary(self._summary)))
+
+
+class JsonSink(OutputSink):
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self._empty = True
+
+    def write(self, constraint_result: ConstraintResult):
+        # The array is the same as the one rendered at once, every element is indented by one level
+        for result in constraint_result.results:
+            self._file.write('[\n' if self._empty else ',\n')
+            self._file.write(indent(json.dumps(result.as_dict(), indent=4), '    '))
+            self._empty = False
+
+    def _write_footer(self):
+        self._file.write('[]\n' if self._empty else '\n]\n')
+
+
+class JsonLinesSink(OutputSink):
+    def write(self, constraint_result: ConstraintResult):
+        self._write_lines(json.dumps(result.as_dict(), separators=(',', ':')) for result in constraint_result.results)
+
+
+class GithubSink(StdoutSink):
+    def write(self, constraint_result: ConstraintResult):
+        for result in constraint_result.results:
+            self._write_lines(render_github_group(result))
+            _add_summary(self._summary, result)
+
+    def _write_footer(self):
+        self._write_lines((format_summary(self._summary),))
+
+
+class JunitSink(OutputSink):
+    # Every constraint is a testsuite of its own, so nothing has to be kept until the end of the run
+    def write(self, constraint_result: ConstraintResult):
+        name = constraint_result.input_name
+        if constraint_result.job:
+            name = constraint_result.job + ' - ' + name
+        self._write_lines(render_junit_testsuite(name, constraint_result.results))
+
+    def _write_header(self):
+        self._write_lines(('<?xml version="1.0" encoding="UTF-8"?>', '<testsuites>'))
+
+    def _write_footer(self):
+        self._write_lines(('</testsuites>',))
+
+
+class RenderedSink(OutputSink):
+    # The tap plan and the table column widths depend on all results, they are rendered when the sink is closed
+    def __init__(self, file_path: str, output_format: str):
+        super().__init__(file_path)
+        self.output_format = output_format
+        self._results: List[CheckResult] = []
+
+    def write(self, constraint_result: ConstraintResult):
+        self._results += constraint_result.results
+
+    def _write_footer(self):
+        self._write_lines((render(self._results, self.output_format),))
+
+
+# Every constraint is written to files of its own, named after the constraint kind and name. Results of jobs are
+# kept in a subdirectory per job.
+class DirectorySink(object):
+    def __init__(self, dir_path: str, output_formats: Tuple[str, ...]):
+        self.dir_path = dir_path
+        self.output_formats = output_formats
+
+    def __enter__(self):
+        try:
+            makedirs(self.dir_path, exist_ok=True)
+        except OSError as e:
+            raise FileError('Creating directory failed: ' + str(e))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def write(self, constraint_result: ConstraintResult):
+        dir_path = self.dir_path
+        if constraint_result.job:
+            dir_path = path.join(dir_path, _get_safe_name(constraint_result.job))
+            try:
+                makedirs(dir_path, exist_ok=True)
+            except OSError as e:
+                raise FileError('Creating directory failed: ' + str(e))
+        file_name = _get_safe_name(constraint_result.input_name)
+        for output_format in self.output_formats:
+            write_to_file_atomically(path.join(dir_path, file_name + OUTPUT_FILE_EXTENSIONS[output_format]),
+                                     render(constraint_result.results, output_format) + '\n')
+
+
+class OutputSinks(object):
+    def __init__(self, output_format: Optional[str], output_file: Optional[str], output_dir: Optional[str] = None):
+        self.sinks = []
+        output_formats = get_output_formats(output_format)
+        if output_file:
+            self.sinks += (
+                _create_sink(output_format, file_path)
+                for output_format, file_path in get_output_files(output_file, output_formats).items()
+            )
+        if output_dir:
+            self.sinks.append(DirectorySink(output_dir, output_formats))
+        self._exit_stack = ExitStack()
+
+    def __bool__(self):
+        return bool(self.sinks)
+
+    def __enter__(self):
+        with ExitStack() as exit_stack:
+            for sink in self.sinks:
+                exit_stack.enter_context(sink)
+            self._exit_stack = exit_stack.pop_all()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._exit_stack.__exit__(exc_type, exc_value, traceback)
+
+    def write(self, constraint_result: ConstraintResult):
+        for sink in self.sinks:
+            sink.write(constraint_result)
+
+
+SINKS = {
+    'stdout': StdoutSink,
+    'json': JsonSink,
+    'jsonl': JsonLinesSink,
+    'junit': JunitSink,
+    'github': GithubSink,
+}
+
+
+def _create_sink(output_format: str, file_path: str):
+    if output_format in SINKS:
+        return SINKS[output_format](file_path)
+    return RenderedSink(file_path, output_format)
+
+
+def _add_summary(summary, result: CheckResult):
+    for key, value in get_summary((result,)).items():
+        summary[key] += value
+
+
+def _get_safe_name(name: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', name)
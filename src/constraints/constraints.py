@@ -2,7 +2,9 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import Dict, Iterable
+import json
+from hashlib import sha256
+from typing import Dict, Iterable, Tuple
 from common.exceptions import InvalidManifestError
 from common.files import read_file_to_str
 from common.logger import Logger
@@ -15,6 +17,23 @@ def generate_constraints(constraints_obj) -> Iterable[Dict]:
     return constraints
 
 
+def group_equivalent_constraints(constraints: Iterable[Dict]) -> Tuple[Tuple[Dict, ...], ...]:
+    # Constraints differing only in metadata, e.g. per-team copies, always give the same results
+    groups = {}
+    for constraint in constraints:
+        groups.setdefault(get_constraint_hash(constraint), []).append(constraint)
+    return tuple(tuple(group) for group in groups.values())
+
+
+def get_constraint_hash(constraint: Dict) -> str:
+    canonical = json.dumps(
+        (constraint['kind'], constraint['spec']['match'], constraint['spec'].get('parameters', {})),
+        sort_keys=True,
+        default=str
+    )
+    return sha256(canonical.encode()).hexdigest()
+
+
 def validate(constraints: Iterable[Dict]):
     for constraint in constraints:
         if (
@@ -37,6 +56,8 @@ def validate(constraints: Iterable[Dict]):
             validate_label_selector(match['namespaceSelector'])
         if 'labelSelector' in match:
             validate_label_selector(match['labelSelector'])
+        if 'scope' in match and match['scope'] not in ('*', 'Cluster', 'Namespaced'):
+            raise InvalidManifestError('Encountered invalid scope: ' + str(match['scope']))
 
 
 def validate_kinds(kinds: list):
@@ -66,9 +87,9 @@ def validate_label_selector(selector: dict):
                 or 'operator' not in expression
                 or type(expression['key']) != str
                 or type(expression['operator']) != str
-                or expression['operator'] not in ('In', 'NotIn', 'Exists')
+                or expression['operator'] not in ('In', 'NotIn', 'Exists', 'DoesNotExist')
                 or (
-                    expression['operator'] != 'Exists'
+                    expression['operator'] not in ('Exists', 'DoesNotExist')
                     and (
                         'values' not in expression
                         or type(expression['values']) != list
@@ -102,7 +123,8 @@ def get_constraints(args) -> Iterable[Dict]:
             args.helm_binary,
             args.helm_options,
             args.policy_chart_constraints,
-            args.policy_chart_constraints_values
+            args.policy_chart_constraints_values,
+            cache_dir=args.helm_cache_dir
         )
     logger.debug('Parsing constraints.')
     return parse_manifests(constraint_templates_str)
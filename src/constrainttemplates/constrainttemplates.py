@@ -1,19 +1,25 @@
 # Copyright 2021 Nokia
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
-from os import path
+from hashlib import sha256
+from os import makedirs, path
 from re import search, MULTILINE
-from typing import Dict, Iterable
+from typing import Dict, Iterable, Optional
 
-from common.exceptions import InvalidManifestError
+from common.exceptions import FileError, InvalidManifestError
 from common.files import write_to_file, read_file_to_str
 from common.logger import Logger
 from common.helm import render_manifests, parse_manifests
 
 from .policy import Policy
+from .policystore import PolicyStore
 
 
-def generate_policies(constraint_templates: Iterable[Dict], output_dir: str
+def generate_policies(
+    constraint_templates: Iterable[Dict],
+    output_dir: str,
+    constraints: Optional[Iterable[Dict]] = None,
+    policy_store: Optional[PolicyStore] = None
 ) -> Dict[str, Policy]:
 
     logger = Logger.get_instance()
@@ -23,11 +29,38 @@ def generate_policies(constraint_templates: Iterable[Dict], output_dir: str
     logger.debug('Extracting policies from constraint templates.')
     policies = extract_policies(constraint_templates)
 
+    if constraints is not None:
+        # Templates without any constraint are never queried, their policies are neither saved nor loaded
+        kinds = {constraint['kind'] for constraint in constraints}
+        logger.debug(f'Pruning {len(set(policies) - kinds)} constraint templates without constraints.')
+        policies = {kind: policy for kind, policy in policies.items() if kind in kinds}
+
+    if policy_store:
+        logger.debug('Saving policies into policy store.')
+        return {kind: policy_store.save(policy) for kind, policy in policies.items()}
+
     logger.debug('Saving policies into files.')
-    for policy in policies.values():
-        write_to_file(path.join(output_dir, policy.namespace + '.rego'), policy.policy)
+    # Libs are saved once under their content hash, policies importing the same lib share the file
+    lib_files = {}
+    for lib in {lib for policy in policies.values() for lib in policy.libs}:
+        lib_files[lib] = path.join(output_dir, 'lib', sha256(lib.encode()).hexdigest()[:16] + '.rego')
+    if lib_files:
+        try:
+            makedirs(path.join(output_dir, 'lib'), exist_ok=True)
+        except OSError as e:
+            raise FileError('Creating directory failed: ' + str(e))
+    for lib, lib_file in lib_files.items():
+        write_to_file(lib_file, lib)
+
+    saved_policies = {}
+    for kind, policy in policies.items():
+        policy_file = path.join(output_dir, policy.namespace + '.rego')
+        write_to_file(policy_file, policy.policy)
+        saved_policies[kind] = Policy(
+            policy.namespace, policy.policy, policy.libs, (policy_file,) + tuple(lib_files[lib] for lib in policy.libs)
+        )
 
-    return policies
+    return saved_policies
 
 
 def validate(constraint_templates: Iterable[Dict]):
@@ -41,6 +74,13 @@ def validate(constraint_templates: Iterable[Dict]):
                 raise InvalidManifestError(
                     'Encountered constraint template target without target key defined: ' + str(constraint_template)
                 )
+            if 'libs' in target and (
+                type(target['libs']) != list or any(type(lib) != str for lib in target['libs'])
+            ):
+                raise InvalidManifestError(
+                    'Encountered constraint template target with libs which are not a list of Rego modules: '
+                    + str(constraint_template)
+                )
 
 
 def extract_policies(constraint_templates: Iterable[Dict]) -> Dict[str, Policy]:
@@ -49,6 +89,7 @@ def extract_policies(constraint_templates: Iterable[Dict]) -> Dict[str, Policy]:
             constraint_template['spec']['crd']['spec']['names']['kind'],
             search(r'^\s*package\s+(\w+)\s*$', target['rego'], MULTILINE),
             target['rego'],
+            tuple(target.get('libs', ())),
         )
         for constraint_template in constraint_templates
         for target in constraint_template['spec']['targets']
@@ -56,8 +97,8 @@ def extract_policies(constraint_templates: Iterable[Dict]) -> Dict[str, Policy]:
     )
 
     return {
-        kind: Policy(namespace_match.groups()[0], policy)
-        for kind, namespace_match, policy in policies
+        kind: Policy(namespace_match.groups()[0], policy, libs)
+        for kind, namespace_match, policy, libs in policies
         if namespace_match is not None
     }
 
@@ -78,7 +119,8 @@ def get_constraint_templates(args) -> Iterable[Dict]:
             args.helm_binary,
             args.helm_options,
             args.policy_chart_constraint_templates,
-            args.policy_chart_constraint_templates_values
+            args.policy_chart_constraint_templates_values,
+            cache_dir=args.helm_cache_dir
         )
     logger.debug('Parsing constraint templates.')
     return filter_templates_by_kind(parse_manifests(constraint_templates_str), 'ConstraintTemplate')
\ No newline at end of file
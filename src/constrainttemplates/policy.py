@@ -2,16 +2,23 @@
 # Licensed under the BSD 3-Clause License.
 # SPDX-License-Identifier: BSD-3-Clause
 
-from typing import Optional
+from typing import Optional, Tuple
 from common.files import create_temp_dir
 from common.logger import Logger
 
+# libs are the Rego modules of the constraint template target the policy imports, files are the paths
+# the policy and its libs are saved to
 class Policy(object):
-    def __init__(self, namespace: Optional[str], policy: str):
+    def __init__(self, namespace: Optional[str], policy: str, libs: Tuple[str, ...] = (), files: Tuple[str, ...] = ()):
         self.namespace = namespace
         self.policy = policy
+        self.libs = libs
+        self.files = files
 
 def create_policies_dir(args) -> str:
+    # Policies kept in the policy store are passed to conftest by their files, no directory is needed
+    if args.policy_store:
+        return args.policy_store
     policies_dir = create_temp_dir(not args.no_cleanup)
     Logger.get_instance().debug('Created policies directory: ' + policies_dir)
     return policies_dir
\ No newline at end of file
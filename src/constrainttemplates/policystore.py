@@ -0,0 +1,105 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+from hashlib import sha256
+from os import makedirs, path, rename
+from shutil import rmtree
+from subprocess import CalledProcessError
+from tempfile import mkdtemp
+from typing import Dict, Optional
+
+from common.cmd import call_command
+from common.exceptions import ConftestError, FileError
+from common.files import write_to_file, write_to_file_atomically
+from common.logger import Logger
+
+from .policy import Policy
+
+
+# Policies saved between runs under a hash of their Rego, together with the result of their verification.
+# Saved files are never changed, so runs sharing the store only ever add entries: a policy directory is
+# complete before it is renamed into place, libs and verification results are replaced atomically.
+class PolicyStore(object):
+    def __init__(self, store_dir: str, version: str):
+        self.store_dir = store_dir
+        self.version = version
+        self.policies_dir = path.join(store_dir, 'policies')
+        self.libs_dir = path.join(store_dir, 'libs')
+
+    def open(self):
+        try:
+            makedirs(self.policies_dir, exist_ok=True)
+            makedirs(self.libs_dir, exist_ok=True)
+        except OSError as e:
+            raise FileError('Creating directory failed: ' + str(e))
+
+    def save(self, policy: Policy) -> Policy:
+        policy_dir = path.join(self.policies_dir, get_policy_key(policy))
+        policy_file = path.join(policy_dir, policy.namespace + '.rego')
+        if not path.isfile(policy_file):
+            self._save_policy_dir(policy_dir, policy)
+        else:
+            Logger.get_instance().debug('Policy found in policy store: ' + policy_dir)
+
+        lib_files = tuple(self._save_lib(lib) for lib in policy.libs)
+        saved_policy = Policy(policy.namespace, policy.policy, policy.libs, (policy_file,) + lib_files)
+        self._verify(policy_dir, saved_policy)
+        return saved_policy
+
+    def _save_policy_dir(self, policy_dir: str, policy: Policy):
+        try:
+            temp_dir = mkdtemp(dir=self.policies_dir, prefix='.')
+        except OSError as e:
+            raise FileError('Creating directory failed: ' + str(e))
+        write_to_file(path.join(temp_dir, policy.namespace + '.rego'), policy.policy)
+        try:
+            rename(temp_dir, policy_dir)
+            Logger.get_instance().debug('Policy saved to policy store: ' + policy_dir)
+        except OSError:
+            # Another run saved the same policy in the meantime
+            rmtree(temp_dir, ignore_errors=True)
+            if not path.isdir(policy_dir):
+                raise FileError('Saving policy to policy store failed: ' + policy_dir)
+
+    def _save_lib(self, lib: str) -> str:
+        lib_file = path.join(self.libs_dir, sha256(lib.encode()).hexdigest() + '.rego')
+        if not path.isfile(lib_file):
+            write_to_file_atomically(lib_file, lib)
+        return lib_file
+
+    def _verify(self, policy_dir: str, policy: Policy):
+        # Verification depends on the conftest version, its result is kept per version
+        result_file = path.join(policy_dir, 'verify-' + sha256(self.version.encode()).hexdigest()[:16] + '.json')
+        result = self._read_verification(result_file)
+        if result is None:
+            result = verify_policy(policy)
+            write_to_file_atomically(result_file, json.dumps(result))
+        if not result['passed']:
+            raise ConftestError(f'Verification of policy {policy.namespace} failed: {result["output"]}')
+
+    @staticmethod
+    def _read_verification(result_file: str) -> Optional[Dict]:
+        try:
+            with open(result_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+def get_policy_key(policy: Policy) -> str:
+    return sha256(json.dumps((policy.namespace, policy.policy, policy.libs)).encode()).hexdigest()
+
+
+def verify_policy(policy: Policy) -> Dict:
+    command = ['conftest', 'verify']
+    for policy_file in policy.files:
+        command += ['--policy', policy_file]
+    command.append('--no-color')
+    Logger.get_instance().debug(f'Verifying policy {policy.namespace}')
+    try:
+        process_result = call_command(command)
+    except CalledProcessError as e:
+        return {'passed': False, 'output': (e.stderr or e.stdout or b'').decode().strip()}
+    return {'passed': True, 'output': process_result.stdout.decode().strip()}
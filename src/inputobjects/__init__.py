@@ -3,3 +3,4 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 from .inputobjects import *
+from .matchengine import *
@@ -0,0 +1,184 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+from collections import defaultdict
+from typing import Callable, Dict, FrozenSet, Iterable, Tuple
+
+from admissionreviewrequest import AdmissionReviewRequest
+from common.logger import Logger, lazy
+
+# Kinds of the built-in cluster scoped resources, used by the `scope` match criterion.
+# Objects rendered from charts get a namespace assigned, so their scope cannot be read from metadata.
+CLUSTER_SCOPED_KINDS = frozenset((
+    ('', 'ComponentStatus'),
+    ('', 'Namespace'),
+    ('', 'Node'),
+    ('', 'PersistentVolume'),
+    ('admissionregistration.k8s.io', 'MutatingWebhookConfiguration'),
+    ('admissionregistration.k8s.io', 'ValidatingAdmissionPolicy'),
+    ('admissionregistration.k8s.io', 'ValidatingAdmissionPolicyBinding'),
+    ('admissionregistration.k8s.io', 'ValidatingWebhookConfiguration'),
+    ('apiextensions.k8s.io', 'CustomResourceDefinition'),
+    ('apiregistration.k8s.io', 'APIService'),
+    ('certificates.k8s.io', 'CertificateSigningRequest'),
+    ('flowcontrol.apiserver.k8s.io', 'FlowSchema'),
+    ('flowcontrol.apiserver.k8s.io', 'PriorityLevelConfiguration'),
+    ('networking.k8s.io', 'IngressClass'),
+    ('node.k8s.io', 'RuntimeClass'),
+    ('policy', 'PodSecurityPolicy'),
+    ('rbac.authorization.k8s.io', 'ClusterRole'),
+    ('rbac.authorization.k8s.io', 'ClusterRoleBinding'),
+    ('scheduling.k8s.io', 'PriorityClass'),
+    ('storage.k8s.io', 'CSIDriver'),
+    ('storage.k8s.io', 'CSINode'),
+    ('storage.k8s.io', 'StorageClass'),
+    ('storage.k8s.io', 'VolumeAttachment'),
+))
+
+
+class MatchEngine(object):
+    # Indexes admission reviews once by kind, namespace and labels, so a constraint `match` block
+    # is resolved with set operations instead of scanning all reviews for every constraint
+    def __init__(
+        self, admission_reviews: Iterable[AdmissionReviewRequest], namespaces: Iterable[AdmissionReviewRequest]
+    ):
+        self.admission_reviews = tuple(admission_reviews)
+        self.namespaces = tuple(namespaces)
+
+        self._all = frozenset(range(len(self.admission_reviews)))
+        self._objects_index = _LabelIndex(self.admission_reviews)
+        self._namespaces_index = _LabelIndex(self.namespaces)
+
+        self._by_kind = defaultdict(set)
+        self._by_namespace = defaultdict(set)
+        self._cluster_scoped = set()
+        for index, admission_review in enumerate(self.admission_reviews):
+            group_kind = (admission_review.resource.group, admission_review.resource.resource)
+            self._by_kind[group_kind].add(index)
+            self._by_namespace[admission_review.namespace].add(index)
+            if group_kind in CLUSTER_SCOPED_KINDS or not admission_review.namespace:
+                self._cluster_scoped.add(index)
+
+        # Selections are memoized by their canonical form, identical selectors are shared across constraints
+        self._selections = {}
+
+    def match(self, constraint_match_filter: dict) -> Tuple[AdmissionReviewRequest, ...]:
+        logger = Logger.get_instance()
+        logger.debug('filter_matching_constraint: constraint_match_filter: %s', constraint_match_filter)
+
+        selected = self._memoized('match', constraint_match_filter, self._select)
+        return tuple(self.admission_reviews[index] for index in sorted(selected))
+
+    def _select(self, constraint_match_filter: dict) -> FrozenSet[int]:
+        selected = self._all
+        self._log_phase('Phase-start', selected)
+
+        if 'kinds' in constraint_match_filter:
+            selected &= self._memoized('kinds', constraint_match_filter['kinds'], self._select_kinds)
+        self._log_phase('Phase-after-kinds', selected)
+
+        if 'namespaces' in constraint_match_filter:
+            selected &= self._select_namespaces(constraint_match_filter['namespaces'])
+        self._log_phase('Phase-after-namespaces', selected)
+
+        if 'excludedNamespaces' in constraint_match_filter:
+            selected -= self._select_namespaces(constraint_match_filter['excludedNamespaces'])
+        self._log_phase('Phase-after-excludedNamespaces', selected)
+
+        if 'namespaceSelector' in constraint_match_filter:
+            selected &= self._memoized(
+                'namespaceSelector', constraint_match_filter['namespaceSelector'], self._select_by_namespace_selector
+            )
+        self._log_phase('Phase-after-namespaceSelector', selected)
+
+        if 'labelSelector' in constraint_match_filter:
+            selected &= self._memoized(
+                'labelSelector', constraint_match_filter['labelSelector'], self._objects_index.select
+            )
+        self._log_phase('Phase-after-labelSelector', selected)
+
+        if 'scope' in constraint_match_filter:
+            selected &= self._select_scope(constraint_match_filter['scope'])
+        self._log_phase('Phase-after-scope', selected)
+
+        return selected
+
+    def _select_kinds(self, kinds_filter: Iterable[Dict]) -> FrozenSet[int]:
+        return frozenset().union(*(
+            self._by_kind.get((api_group, kind), ())
+            for kind_specification in kinds_filter
+            for api_group in kind_specification['apiGroups']
+            for kind in kind_specification['kinds']
+        ))
+
+    def _select_namespaces(self, namespaces: Iterable[str]) -> FrozenSet[int]:
+        return frozenset().union(*(self._by_namespace.get(namespace, ()) for namespace in namespaces))
+
+    def _select_by_namespace_selector(self, selector: dict) -> FrozenSet[int]:
+        return self._select_namespaces(
+            self.namespaces[index].name for index in self._namespaces_index.select(selector)
+        )
+
+    def _select_scope(self, scope: str) -> FrozenSet[int]:
+        if scope == 'Cluster':
+            return frozenset(self._cluster_scoped)
+        if scope == 'Namespaced':
+            return self._all - self._cluster_scoped
+        return self._all
+
+    def _memoized(self, kind: str, specification, select: Callable) -> FrozenSet[int]:
+        key = (kind, json.dumps(specification, sort_keys=True))
+        if key not in self._selections:
+            self._selections[key] = select(specification)
+        return self._selections[key]
+
+    def _log_phase(self, phase: str, selected: FrozenSet[int]):
+        Logger.get_instance().debug(
+            'filter_matching_constraint: %s - filtered objects: %s', phase, lazy(self._selected_to_str, selected)
+        )
+
+    def _selected_to_str(self, selected: FrozenSet[int]) -> str:
+        return admission_reviews_to_str(self.admission_reviews[index] for index in sorted(selected))
+
+
+class _LabelIndex(object):
+    def __init__(self, admission_reviews: Tuple[AdmissionReviewRequest, ...]):
+        self._all = frozenset(range(len(admission_reviews)))
+        self._by_label = defaultdict(set)
+        self._by_label_key = defaultdict(set)
+        for index, admission_review in enumerate(admission_reviews):
+            labels = admission_review.object['metadata'].get('labels') or {}
+            for key, value in labels.items():
+                self._by_label[(key, value)].add(index)
+                self._by_label_key[key].add(index)
+
+    def select(self, selector: dict) -> FrozenSet[int]:
+        requirements = [
+            {'key': key, 'operator': 'In', 'values': (value,)} for key, value in selector.get('matchLabels', {}).items()
+        ]
+        requirements += selector.get('matchExpressions', [])
+
+        selected = self._all
+        for requirement in requirements:
+            selected &= self._select_requirement(requirement)
+        return selected
+
+    def _select_requirement(self, requirement: dict) -> FrozenSet[int]:
+        key = requirement['key']
+        if requirement['operator'] == 'Exists':
+            return frozenset(self._by_label_key.get(key, ()))
+        if requirement['operator'] == 'DoesNotExist':
+            return self._all - self._by_label_key.get(key, set())
+
+        with_value = frozenset().union(*(self._by_label.get((key, value), ()) for value in requirement['values']))
+        if requirement['operator'] == 'In':
+            return with_value
+        if requirement['operator'] == 'NotIn':
+            return self._all - with_value
+        return self._all
+
+
+def admission_reviews_to_str(admission_reviews):
+    return f"{[{'name': admission_review.name, 'namespace': admission_review.namespace} for admission_review in admission_reviews]}"
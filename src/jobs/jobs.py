@@ -0,0 +1,146 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+from argparse import Namespace
+from concurrent.futures import Future
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+from yaml import YAMLError, safe_load
+
+from common.exceptions import InvalidParametersError
+from common.files import expand_paths, read_file_to_str
+from common.logger import Logger
+
+# Job file keys and the command line options they override for a single job
+JOB_OPTIONS = {
+    'chart': 'input_chart',
+    'values': 'input_chart_values',
+    'namespace': 'input_chart_namespace',
+    'releaseName': 'input_chart_release_name',
+    'kubernetesObjects': 'input_kubernetes_objects',
+    'namespacesFile': 'input_namespaces_file',
+}
+# Constraints of an evaluation and the future of its results, as submitted by submit_conftest
+Evaluations = Tuple[Tuple[Any, Future], ...]
+
+
+# Input of a single evaluation, the policy side is shared by all jobs of a job file
+class Job(object):
+    def __init__(self, name: str, options: Dict[str, Any]):
+        self.name = name
+        self.options = options
+
+    def get_args(self, args: Namespace) -> Namespace:
+        # Options not set by the job are taken from the command line
+        job_args = Namespace(**vars(args))
+        job_args.input_chart = None
+        job_args.input_kubernetes_objects = None
+        for key, value in self.options.items():
+            setattr(job_args, JOB_OPTIONS[key], value)
+        return job_args
+
+
+# Evaluations all jobs submit to the shared worker pool. Once stopped, e.g. by fail fast, the submitted evaluations
+# are cancelled and jobs still rendering their input do not submit any.
+class JobEvaluations(object):
+    def __init__(self):
+        self._stopped = Event()
+        self._lock = Lock()
+        self._futures: List[Future] = []
+
+    @property
+    def stopped(self) -> bool:
+        return self._stopped.is_set()
+
+    def submit(self, submit_evaluations: Callable[[], Evaluations]) -> Evaluations:
+        if self.stopped:
+            return ()
+        evaluations = submit_evaluations()
+        futures = tuple(future for _, future in evaluations)
+        with self._lock:
+            # Stopped while submitting, the evaluations are cancelled here as stop did not see them
+            if self.stopped:
+                _cancel(futures)
+                return ()
+            self._futures += futures
+        return evaluations
+
+    def stop(self):
+        with self._lock:
+            self._stopped.set()
+            _cancel(self._futures)
+
+
+def read_jobs(job_file: str) -> Tuple[Job, ...]:
+    Logger.get_instance().debug('Reading jobs from ' + job_file)
+    try:
+        content = safe_load(read_file_to_str(job_file))
+    except YAMLError as e:
+        raise InvalidParametersError('Parsing job file failed: ' + str(e))
+
+    # Jobs are listed either at the top level or under the jobs key
+    jobs = content.get('jobs') if type(content) == dict else content
+    if type(jobs) != list or not jobs:
+        raise InvalidParametersError('Job file must contain a non-empty list of jobs: ' + job_file)
+
+    validate(jobs)
+    return tuple(Job(job.get('name', _get_default_name(job)), _get_options(job)) for job in _expand_values(jobs))
+
+
+def get_values_jobs(args: Namespace) -> Tuple[Job, ...]:
+    # Every values file is a variant of the input chart, rendered and reported as a job of its own
+    return tuple(
+        Job(_get_default_name(job), job)
+        for job in ({'chart': args.input_chart, 'values': values} for values in args.input_chart_values_variants)
+    )
+
+
+def validate(jobs):
+    for job in jobs:
+        if type(job) != dict:
+            raise InvalidParametersError('Encountered job which is not a mapping: ' + str(job))
+        unknown_keys = set(job) - set(JOB_OPTIONS) - {'name'}
+        if unknown_keys:
+            raise InvalidParametersError(f'Encountered job with unknown keys {sorted(unknown_keys)}: {job}')
+        if ('chart' in job) == ('kubernetesObjects' in job):
+            raise InvalidParametersError('Exactly one of chart/kubernetesObjects must be set in job: ' + str(job))
+        for key, value in job.items():
+            if key == 'values' and type(value) == list and value and all(type(item) == str for item in value):
+                continue
+            if type(value) != str:
+                raise InvalidParametersError(f'Encountered job with {key} which is not a string: {job}')
+
+
+def _expand_values(jobs: Iterable[Dict]) -> Iterator[Dict]:
+    # Values may be given as a list or glob, the chart is then evaluated once per values file
+    for job in jobs:
+        if 'values' not in job:
+            yield job
+            continue
+        values_files = expand_paths(job['values'] if type(job['values']) == list else (job['values'],))
+        if len(values_files) == 1:
+            yield dict(job, values=values_files[0])
+            continue
+        for values_file in values_files:
+            variant = dict(job, values=values_file)
+            if 'name' in job:
+                variant['name'] = f'{job["name"]} ({values_file})'
+            yield variant
+
+
+def _get_options(job: Dict) -> Dict[str, Any]:
+    return {key: value for key, value in job.items() if key in JOB_OPTIONS}
+
+
+def _get_default_name(job: Dict) -> str:
+    name = job.get('chart', job.get('kubernetesObjects'))
+    if 'values' in job:
+        name += ' (' + job['values'] + ')'
+    return name
+
+
+def _cancel(futures: Iterable[Future]):
+    for future in futures:
+        future.cancel()
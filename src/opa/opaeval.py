@@ -0,0 +1,97 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+from os import path
+from re import MULTILINE, findall
+from shlex import join
+from shutil import rmtree
+from subprocess import CalledProcessError
+from threading import Lock
+from typing import Any, Dict, Tuple
+
+from common.cmd import call_command
+from common.exceptions import OpaError
+from common.files import create_temp_dir, write_to_file
+from common.logger import Logger
+from constrainttemplates.policy import Policy
+
+WRAPPER_PACKAGE = 'conftestrunner'
+
+
+# `opa eval` process per policy and batch of documents. A generated wrapper module evaluates the rules of the
+# policy for every element of the input array, so the query is compiled once for all documents of a call.
+class OpaEval(object):
+    description = 'opa eval'
+
+    def __init__(self, opa_binary: str, policies_dir: str):
+        self.opa_binary = opa_binary
+        self.policies_dir = policies_dir
+        self._wrappers_dir = None
+        self._wrappers = {}
+        self._lock = Lock()
+
+    def start(self):
+        self._wrappers_dir = create_temp_dir(cleanup=False)
+
+    def stop(self):
+        if self._wrappers_dir is not None:
+            rmtree(self._wrappers_dir, ignore_errors=True)
+            self._wrappers_dir = None
+            self._wrappers = {}
+
+    # Returns the deny/violation/warn rules of the policy evaluated against every document, in document order
+    def evaluate_documents(self, policy: Policy, documents: Tuple[Dict[str, Any], ...]) -> Tuple[Dict[str, Any], ...]:
+        command = [self.opa_binary, 'eval', '--format', 'json', '--stdin-input', '--data', self._get_wrapper(policy)]
+        for policy_path in policy.files or (self.policies_dir,):
+            command += ['--data', policy_path]
+        command.append(f'data.{WRAPPER_PACKAGE}.{policy.namespace}')
+        Logger.get_instance().debug(join(command))
+
+        try:
+            process_result = call_command(command, json.dumps({'documents': documents}))
+            result = json.loads(process_result.stdout)
+        except CalledProcessError as e:
+            raise OpaError(f'Evaluating policy {policy.namespace} failed: ' + (e.stderr or e.stdout or '').strip())
+        except ValueError as e:
+            raise OpaError(f'Unexpected output of opa eval for policy {policy.namespace}: ' + str(e))
+
+        # Rules undefined for a document, e.g. a complete deny rule, are left out as the opa server does
+        rules = result['result'][0]['expressions'][0]['value'] if result.get('result') else {}
+        return tuple(
+            {rule: rule_results[str(index)] for rule, rule_results in rules.items() if str(index) in rule_results}
+            for index in range(len(documents))
+        )
+
+    def _get_wrapper(self, policy: Policy) -> str:
+        with self._lock:
+            key = (policy.namespace, policy.policy)
+            if key not in self._wrappers:
+                wrapper_file = path.join(self._wrappers_dir, f'{WRAPPER_PACKAGE}-{len(self._wrappers)}.rego')
+                write_to_file(wrapper_file, generate_wrapper(policy))
+                self._wrappers[key] = wrapper_file
+            return self._wrappers[key]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def generate_wrapper(policy: Policy) -> str:
+    # Every rule of the wrapper maps the index of a document to the results of the policy rule of the same name.
+    # Rules are named the way conftest requires, other rules such as denylist and functions are helpers.
+    rules = sorted(set(findall(r'^((?:deny|violation|warn)(?:_[a-zA-Z0-9]+)*)\b(?!\s*\()', policy.policy, MULTILINE)))
+    lines = [f'package {WRAPPER_PACKAGE}.{policy.namespace}']
+    for rule in rules:
+        lines += [
+            '',
+            f'{rule}[index] = result {{',
+            '  document := input.documents[index]',
+            f'  result := data.{policy.namespace}.{rule} with input as document',
+            '}',
+        ]
+    return '\n'.join(lines) + '\n'
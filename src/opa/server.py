@@ -0,0 +1,104 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+from socket import socket
+from subprocess import DEVNULL, PIPE, Popen, TimeoutExpired
+from time import monotonic, sleep
+from typing import Any, Dict, Tuple
+from urllib.request import Request, urlopen
+
+from common.cmd import get_command_timeout
+from common.exceptions import OpaError
+from common.logger import Logger
+from constrainttemplates.policy import Policy
+
+STARTUP_TIMEOUT_SECONDS = 30
+HEALTH_CHECK_TIMEOUT_SECONDS = 1
+
+
+# Long-lived `opa run --server` process, policies are loaded and compiled once when it starts
+class OpaServer(object):
+    description = 'opa server'
+
+    def __init__(self, opa_binary: str, policies_dir: str):
+        self.opa_binary = opa_binary
+        self.policies_dir = policies_dir
+        self.address = None
+        self._process = None
+
+    def start(self):
+        logger = Logger.get_instance()
+
+        self.address = f'localhost:{_get_free_port()}'
+        command = [self.opa_binary, 'run', '--server', '--addr', self.address, self.policies_dir]
+        logger.debug(' '.join(command))
+        try:
+            self._process = Popen(command, stdout=DEVNULL, stderr=PIPE)
+        except OSError as e:
+            raise OpaError('Starting opa server failed: ' + str(e))
+
+        deadline = monotonic() + STARTUP_TIMEOUT_SECONDS
+        while not self._is_healthy():
+            if self._process.poll() is not None:
+                raise OpaError('Starting opa server failed: ' + self._process.stderr.read().decode())
+            if monotonic() > deadline:
+                self.stop()
+                raise OpaError(f'Opa server did not become ready within {STARTUP_TIMEOUT_SECONDS} seconds')
+            sleep(0.05)
+        logger.debug('Opa server listening on ' + self.address)
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=STARTUP_TIMEOUT_SECONDS)
+        except TimeoutExpired:
+            self._process.kill()
+        self._process.stderr.close()
+        self._process = None
+
+    # Returns all rules of the policy package evaluated against the given input document
+    def evaluate(self, namespace: str, document: Dict[str, Any]) -> Dict[str, Any]:
+        request = Request(
+            f'http://{self.address}/v1/data/{namespace.replace(".", "/")}',
+            data=json.dumps({'input': document}).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        # Requests are bounded by the command timeout, a hung server must not block a worker forever
+        try:
+            with urlopen(request, timeout=get_command_timeout()) as response:
+                content = json.loads(response.read())
+        except OSError as e:
+            raise OpaError(f'Evaluating policy {namespace} failed: ' + str(e))
+        except ValueError as e:
+            raise OpaError(f'Evaluating policy {namespace} returned invalid response: ' + str(e))
+        # An undefined package has no result rather than an empty one
+        if 'result' not in content:
+            raise OpaError(f'Policy {namespace} is not defined on opa server')
+        return content['result']
+
+    def evaluate_documents(self, policy: Policy, documents: Tuple[Dict[str, Any], ...]) -> Tuple[Dict[str, Any], ...]:
+        return tuple(self.evaluate(policy.namespace, document) for document in documents)
+
+    def _is_healthy(self) -> bool:
+        try:
+            with urlopen(f'http://{self.address}/health', timeout=HEALTH_CHECK_TIMEOUT_SECONDS) as response:
+                return response.status == 200
+        except OSError:
+            return False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def _get_free_port() -> int:
+    with socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
@@ -0,0 +1,89 @@
+# Copyright 2021 Nokia
+# Licensed under the BSD 3-Clause License.
+# SPDX-License-Identifier: BSD-3-Clause
+
+from os import path, stat, walk
+from time import sleep
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from common.logger import Logger
+from constrainttemplates import Policy
+
+
+# Polls modification times of the watched files and directories, every source is a named group of paths,
+# so the caller re-runs only the stages reading the changed group
+class Watcher(object):
+    def __init__(self, sources: Dict[str, Iterable[Optional[str]]]):
+        self.sources = {name: tuple(p for p in paths if p) for name, paths in sources.items()}
+        self._snapshots = {name: _get_snapshot(paths) for name, paths in self.sources.items()}
+
+    def poll(self) -> Set[str]:
+        changed = set()
+        for name, paths in self.sources.items():
+            snapshot = _get_snapshot(paths)
+            if snapshot != self._snapshots[name]:
+                self._snapshots[name] = snapshot
+                changed.add(name)
+        return changed
+
+    def wait(self, interval: float) -> Set[str]:
+        changed = set()
+        while not changed:
+            sleep(interval)
+            changed = self.poll()
+        # Editors and helm dependency updates write several files, changes are collected until the sources settle
+        while True:
+            sleep(interval)
+            settled = self.poll()
+            if not settled:
+                break
+            changed |= settled
+        Logger.get_instance().debug('Changed sources: ' + ', '.join(sorted(changed)))
+        return changed
+
+
+def get_changed_constraints(
+    constraints: Iterable[Dict],
+    previous_constraints: Iterable[Dict],
+    policies: Dict[str, Policy],
+    previous_policies: Dict[str, Policy]
+) -> Tuple[Dict, ...]:
+    # A constraint is evaluated again only if it is new, was edited or the policy of its kind changed
+    previous_constraints = {get_constraint_id(constraint): constraint for constraint in previous_constraints}
+    return tuple(
+        constraint for constraint in constraints
+        if previous_constraints.get(get_constraint_id(constraint)) != constraint
+        or _is_policy_changed(policies.get(constraint['kind']), previous_policies.get(constraint['kind']))
+    )
+
+
+def get_constraint_id(constraint: Dict) -> Tuple[str, str]:
+    return constraint['kind'], constraint.get('metadata', {}).get('name', '')
+
+
+def _is_policy_changed(policy: Optional[Policy], previous_policy: Optional[Policy]) -> bool:
+    if policy is None or previous_policy is None:
+        return policy is not previous_policy
+    return policy.namespace != previous_policy.namespace or policy.policy != previous_policy.policy \
+        or policy.libs != previous_policy.libs
+
+
+def _get_snapshot(paths: Iterable[str]) -> Tuple:
+    snapshot = []
+    for watched_path in paths:
+        if path.isdir(watched_path):
+            for root, dirs, files in walk(watched_path):
+                dirs.sort()
+                snapshot += (_get_file_snapshot(path.join(root, file)) for file in sorted(files))
+        else:
+            snapshot.append(_get_file_snapshot(watched_path))
+    return tuple(snapshot)
+
+
+def _get_file_snapshot(file_path: str) -> Tuple:
+    # Charts from repositories and deleted files have no modification time and never change
+    try:
+        file_stat = stat(file_path)
+    except OSError:
+        return file_path, None
+    return file_path, file_stat.st_mtime_ns, file_stat.st_size
@@ -36,3 +36,27 @@ class TestAdmissionReviewRequest:
         assert dict_representation['kind']['version'] == admission_review_request.kind.version
         assert dict_representation['kind']['kind'] == admission_review_request.kind.kind
         assert dict_representation['name'] == admission_review_request.name
+
+    def test_should_share_static_sub_objects(self):
+        # given
+        first = AdmissionReviewRequest({'apiVersion': 'apps/v1', 'kind': 'Deployment', 'metadata': {'name': 'first'}})
+        second = AdmissionReviewRequest({'apiVersion': 'apps/v1', 'kind': 'Deployment', 'metadata': {'name': 'second'}})
+
+        # then
+        assert first.kind is second.kind
+        assert first.resource is second.resource
+        assert first.user_info is second.user_info
+        assert first.options is second.options
+        assert not hasattr(first, '__dict__')
+
+    def test_should_not_share_dicts_between_conversions(self):
+        # given
+        admission_review_request = AdmissionReviewRequest({'apiVersion': 'v1', 'kind': 'Pod', 'metadata': {'name': 'test'}})
+
+        # when
+        admission_review_request.as_dict()['userInfo']['groups'].append('modified')
+
+        # then
+        assert admission_review_request.as_dict()['userInfo']['groups'] == ['system:authenticated', 'my-admin-group']
+        assert admission_review_request.as_dict()['options'] == {'api_version': 'meta.k8s.io/v1', 'kind': 'CreateOptions'}
+        assert admission_review_request.as_dict()['requestResource'] == {'group': '', 'version': 'v1', 'resource': 'Pod'}
@@ -0,0 +1,209 @@
+# Benchmark of the runner's own overhead. helm and conftest are replaced by the stand-ins in bin/, every stage of
+# the pipeline is timed in-process and the timings are compared with a stored baseline.
+# Absolute timings depend on the machine, so the baseline stores the share of every stage in the total time instead.
+# A uniform slowdown of all stages keeps the shares, compare the seconds written by --output of two local runs for it.
+#
+#   python test/benchmark/benchmark.py --scenario small
+#   python test/benchmark/benchmark.py --objects 20000 --constraints 200 --repeat 5
+#   python test/benchmark/benchmark.py --scenario medium --update-baseline
+
+import json
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from os import cpu_count, environ, path, pathsep
+from statistics import median
+from subprocess import DEVNULL, PIPE, run
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+BENCHMARK_DIR = path.dirname(path.abspath(__file__))
+ROOT_DIR = path.dirname(path.dirname(BENCHMARK_DIR))
+BIN_DIR = path.join(BENCHMARK_DIR, 'bin')
+BASELINE_FILE = path.join(BENCHMARK_DIR, 'baseline.json')
+sys.path.insert(0, path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from common.cmd import call_command  # noqa: E402
+from common.helm import parse_manifests, read_manifests, render_manifests  # noqa: E402
+from conftest import get_conftest_command, get_summary, parse_conftest_json, serialize_inputs  # noqa: E402
+from constraints import generate_constraints  # noqa: E402
+from constrainttemplates import generate_policies  # noqa: E402
+from inputobjects import MatchEngine, convert_kubernetes_objects_to_admission_reviews  # noqa: E402
+from namespaces import convert_namespaces_to_admission_reviews  # noqa: E402
+from workload import generate_workload  # noqa: E402
+
+SCENARIOS = {
+    'small': (1000, 10),
+    'medium': (10000, 100),
+    'large': (100000, 1000),
+}
+STAGES = ('render', 'parse', 'convert', 'match', 'serialize', 'execute', 'summarize', 'total', 'cli')
+
+
+@contextmanager
+def timer(timings, stage):
+    start = perf_counter()
+    yield
+    timings[stage] = perf_counter() - start
+
+
+def run_stages(workload, policies_dir, jobs, input_encoding):
+    timings = {}
+
+    with timer(timings, 'render'):
+        manifests = render_manifests(path.join(BIN_DIR, 'helm'), '', workload.chart)
+
+    with timer(timings, 'parse'):
+        kubernetes_objects = parse_manifests(manifests)
+        namespaces = tuple(read_manifests(workload.namespaces))
+        constraint_templates = tuple(read_manifests(workload.constraint_templates))
+        constraints_obj = tuple(read_manifests(workload.constraints))
+
+    with timer(timings, 'convert'):
+        admission_review_requests = convert_kubernetes_objects_to_admission_reviews(kubernetes_objects, 'default')
+        admission_review_namespaces = convert_namespaces_to_admission_reviews(namespaces)
+        constraints = generate_constraints(constraints_obj)
+        policies = generate_policies(constraint_templates, policies_dir, constraints)
+
+    with timer(timings, 'match'):
+        match_engine = MatchEngine(admission_review_requests, admission_review_namespaces)
+        matches = tuple((constraint, match_engine.match(constraint['spec']['match'])) for constraint in constraints)
+
+    with timer(timings, 'serialize'):
+        inputs = tuple(
+            (constraint, serialize_inputs(admission_reviews, constraint['spec'].get('parameters', {}), input_encoding))
+            for constraint, admission_reviews in matches if admission_reviews
+        )
+
+    with timer(timings, 'execute'):
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = tuple(executor.map(
+                lambda constraint_input: call_command(
+                    get_conftest_command(('-',), policies_dir, policies[constraint_input[0]['kind']]),
+                    constraint_input[1],
+                    check=False
+                ),
+                inputs
+            ))
+
+    with timer(timings, 'summarize'):
+        tests = sum(get_summary(parse_conftest_json(result.stdout))['tests'] for result in results)
+
+    timings['total'] = sum(timings.values())
+    return timings, tests
+
+
+def run_cli(workload, jobs, input_encoding):
+    start = perf_counter()
+    result = run(
+        (
+            sys.executable, path.join(ROOT_DIR, 'src', 'conftest-runner.py'),
+            '--input-chart', workload.chart,
+            '--input-namespaces-file', workload.namespaces,
+            '--policy-constraint-templates-file', workload.constraint_templates,
+            '--policy-constraints-file', workload.constraints,
+            '--helm-binary', path.join(BIN_DIR, 'helm'),
+            '--jobs', str(jobs),
+            '--input-encoding', input_encoding,
+        ),
+        stdout=DEVNULL,
+        stderr=PIPE,
+        universal_newlines=True,
+    )
+    seconds = perf_counter() - start
+    # Every document passes the conftest stand-in, a failing run is a broken runner rather than a slow one
+    if result.returncode != 0:
+        sys.exit(f'conftest-runner failed with exit code {result.returncode}:\n{result.stderr}')
+    return seconds
+
+
+def get_shares(timings):
+    # The command line run is compared with the in-process pipeline as well, it may exceed a share of 1
+    return {stage: timings[stage] / timings['total'] for stage in STAGES if stage != 'total'}
+
+
+def compare(timings, baseline, tolerance, min_delta):
+    regressions = []
+    shares = get_shares(timings)
+    print(f'{"stage":<10} {"seconds":>10} {"share":>8} {"baseline":>10} {"change":>8}')
+    for stage in STAGES:
+        line = f'{stage:<10} {timings[stage]:>10.3f}'
+        if stage in shares:
+            line += f' {shares[stage]:>8.1%}'
+        if stage in shares and stage in baseline:
+            change = (shares[stage] - baseline[stage]) / baseline[stage] if baseline[stage] else 0.0
+            line += f' {baseline[stage]:>10.1%} {change:>+8.0%}'
+            # Tiny stages are dominated by noise, a regression must also be noticeable in absolute time
+            if change > tolerance and (shares[stage] - baseline[stage]) * timings['total'] > min_delta:
+                regressions.append(stage)
+                line += '  REGRESSION'
+        print(line)
+    return regressions
+
+
+def parse_args():
+    parser = ArgumentParser(description='Benchmark of conftest-runner with stand-ins of helm and conftest')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='small', help='workload scale (default: small)')
+    parser.add_argument('--objects', type=int, help='number of Kubernetes objects, overrides the scenario')
+    parser.add_argument('--constraints', type=int, help='number of constraints, overrides the scenario')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the median is reported')
+    parser.add_argument('--jobs', type=int, default=cpu_count() or 1, help='concurrent conftest commands')
+    parser.add_argument('--input-encoding', choices=('yaml', 'json'), default='yaml')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline file to compare with')
+    parser.add_argument('--update-baseline', action='store_true', help='store the shares as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative growth of the share of a stage (default: 0.25)')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='ignored absolute slowdown in seconds')
+    parser.add_argument('--output', help='file the timings are written to as JSON')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    objects, constraints = SCENARIOS[args.scenario]
+    if args.objects or args.constraints:
+        objects = args.objects or objects
+        constraints = args.constraints or constraints
+        scenario = f'{objects}-objects-{constraints}-constraints'
+    else:
+        scenario = args.scenario
+    scenario += '-json' if args.input_encoding == 'json' else ''
+
+    environ['PATH'] = BIN_DIR + pathsep + environ['PATH']
+
+    with TemporaryDirectory() as workload_dir, TemporaryDirectory() as policies_dir:
+        print(f'Generating workload of {objects} objects and {constraints} constraints')
+        workload = generate_workload(workload_dir, objects, constraints)
+
+        runs = []
+        for _ in range(args.repeat):
+            timings, tests = run_stages(workload, policies_dir, args.jobs, args.input_encoding)
+            timings['cli'] = run_cli(workload, args.jobs, args.input_encoding)
+            runs.append(timings)
+    timings = {stage: median(timings[stage] for timings in runs) for stage in STAGES}
+    print(f'Scenario {scenario}, {tests} tests, median of {args.repeat} runs')
+
+    baselines = {}
+    if path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    regressions = compare(timings, baselines.get(scenario, {}), args.tolerance, args.min_delta)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'scenario': scenario, 'tests': tests, 'timings': timings, 'regressions': regressions}, f,
+                      indent=4)
+    if args.update_baseline:
+        baselines[scenario] = {stage: round(share, 4) for stage, share in get_shares(timings).items()}
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+            f.write('\n')
+        print('Baseline updated: ' + args.baseline)
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
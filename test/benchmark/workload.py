@@ -0,0 +1,128 @@
+from os import makedirs, path
+from random import Random
+
+from yaml import safe_dump, safe_dump_all
+
+# Workloads are generated from a fixed seed, so the same scale always produces the same files
+SEED = 2021
+
+LABELS = ('app', 'team', 'tier', 'owner', 'cost-center')
+KINDS = (
+    ('apps/v1', 'Deployment'),
+    ('apps/v1', 'StatefulSet'),
+    ('v1', 'Service'),
+    ('v1', 'ConfigMap'),
+)
+
+REGO = '''package {namespace}
+
+violation[{{"msg": msg, "details": {{"missing_labels": missing}}}}] {{
+  provided := {{label | input.review.object.metadata.labels[label]}}
+  required := {{label | label := input.parameters.labels[_]}}
+  missing := required - provided
+  count(missing) > 0
+  msg := sprintf("you must provide labels: %v", [missing])
+}}
+'''
+
+
+class Workload(object):
+    def __init__(self, workload_dir: str):
+        self.workload_dir = workload_dir
+        self.chart = path.join(workload_dir, 'input-chart')
+        self.manifests = path.join(self.chart, 'rendered.yaml')
+        self.namespaces = path.join(workload_dir, 'namespaces.yaml')
+        self.constraint_templates = path.join(workload_dir, 'constraint-templates.yaml')
+        self.constraints = path.join(workload_dir, 'constraints.yaml')
+
+
+def generate_workload(workload_dir: str, objects: int, constraints: int, templates: int = 10) -> Workload:
+    random = Random(SEED)
+    workload = Workload(workload_dir)
+    makedirs(workload.chart, exist_ok=True)
+
+    namespaces = tuple(f'namespace-{index}' for index in range(max(1, min(50, objects // 100))))
+
+    with open(path.join(workload.chart, 'Chart.yaml'), 'w') as f:
+        safe_dump({'apiVersion': 'v2', 'name': 'input-chart', 'version': '0.1.0'}, f)
+    with open(workload.manifests, 'w') as f:
+        safe_dump_all((_generate_object(random, index, namespaces) for index in range(objects)), f)
+    with open(workload.namespaces, 'w') as f:
+        safe_dump_all((_generate_namespace(random, namespace) for namespace in namespaces), f)
+    with open(workload.constraint_templates, 'w') as f:
+        safe_dump_all((_generate_constraint_template(index) for index in range(templates)), f)
+    with open(workload.constraints, 'w') as f:
+        safe_dump_all(
+            (_generate_constraint(random, index, templates, namespaces) for index in range(constraints)), f
+        )
+
+    return workload
+
+
+def _generate_object(random: Random, index: int, namespaces) -> dict:
+    api_version, kind = KINDS[index % len(KINDS)]
+    manifest = {
+        'apiVersion': api_version,
+        'kind': kind,
+        'metadata': {
+            'name': f'{kind.lower()}-{index}',
+            'namespace': random.choice(namespaces),
+            'labels': {label: f'{label}-{random.randrange(5)}' for label in random.sample(LABELS, random.randrange(4))},
+        },
+    }
+    if kind in ('Deployment', 'StatefulSet'):
+        manifest['spec'] = {
+            'replicas': random.randrange(1, 4),
+            'template': {
+                'metadata': {'labels': dict(manifest['metadata']['labels'])},
+                'spec': {'containers': [{'name': 'main', 'image': f'registry.local/image-{index % 20}:1.0'}]},
+            },
+        }
+    elif kind == 'Service':
+        manifest['spec'] = {'ports': [{'port': 80, 'targetPort': 8080}], 'selector': {'app': f'app-{index % 5}'}}
+    else:
+        manifest['data'] = {f'key-{key}': f'value-{index}-{key}' for key in range(5)}
+    return manifest
+
+
+def _generate_namespace(random: Random, namespace: str) -> dict:
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Namespace',
+        'metadata': {'name': namespace, 'labels': {'environment': random.choice(('dev', 'stage', 'prod'))}},
+    }
+
+
+def _generate_constraint_template(index: int) -> dict:
+    return {
+        'apiVersion': 'templates.gatekeeper.sh/v1beta1',
+        'kind': 'ConstraintTemplate',
+        'metadata': {'name': f'k8srequiredlabels{index}'},
+        'spec': {
+            'crd': {'spec': {'names': {'kind': f'K8sRequiredLabels{index}'}}},
+            'targets': [
+                {
+                    'target': 'admission.k8s.gatekeeper.sh',
+                    'rego': REGO.format(namespace=f'k8srequiredlabels{index}'),
+                }
+            ],
+        },
+    }
+
+
+def _generate_constraint(random: Random, index: int, templates: int, namespaces) -> dict:
+    api_version, kind = random.choice(KINDS)
+    match = {'kinds': [{'apiGroups': [api_version.split('/')[0] if '/' in api_version else ''], 'kinds': [kind]}]}
+    # A mix of the selectors supported by the match engine
+    if index % 3 == 1:
+        match['namespaces'] = random.sample(namespaces, min(len(namespaces), 3))
+    if index % 4 == 2:
+        match['labelSelector'] = {'matchExpressions': [{'key': random.choice(LABELS), 'operator': 'Exists'}]}
+    if index % 5 == 3:
+        match['namespaceSelector'] = {'matchLabels': {'environment': random.choice(('dev', 'stage', 'prod'))}}
+    return {
+        'apiVersion': 'constraints.gatekeeper.sh/v1beta1',
+        'kind': f'K8sRequiredLabels{index % templates}',
+        'metadata': {'name': f'constraint-{index}'},
+        'spec': {'match': match, 'parameters': {'labels': random.sample(LABELS, random.randrange(1, 3))}},
+    }
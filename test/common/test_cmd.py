@@ -1,6 +1,7 @@
 import pytest
 
 from common.cmd import call_command, exit_if_command_not_found
+from common.exceptions import CommandError
 
 
 class TestCmd:
@@ -35,3 +36,38 @@ class TestCmd:
         # then
         assert pytest_wrapped_e.type == SystemExit
         assert pytest_wrapped_e.value.code == 1
+
+    def test_should_call_command_without_shell(self):
+        # given
+        command = ['echo', '$HOME', '|| exit 0']
+
+        # when
+        completed_process = call_command(command)
+
+        # then
+        assert completed_process.stdout == b'$HOME || exit 0\n'
+
+    def test_should_pass_bytes_to_command(self):
+        # given
+        stdin = b'\x00test'
+
+        # when
+        completed_process = call_command(['cat'], stdin)
+
+        # then
+        assert completed_process.stdout == stdin
+
+    def test_should_return_exit_code_of_unchecked_command(self):
+        # when
+        completed_process = call_command(['false'], check=False)
+
+        # then
+        assert completed_process.returncode == 1
+
+    def test_should_stop_command_after_timeout(self):
+        # when
+        with pytest.raises(CommandError) as e:
+            call_command(['sleep', '10'], timeout=0.1)
+
+        # then
+        assert 'timed out' in str(e.value)
@@ -1,7 +1,7 @@
 import os
 from os.path import isdir
 
-from common.files import create_temp_dir, remove_dir, write_to_file, read_file_to_str
+from common.files import create_temp_dir, expand_paths, remove_dir, write_to_file, read_file_to_str
 
 
 class TestFiles:
@@ -30,3 +30,18 @@ class TestFiles:
 
         # then
         assert read_string == file_content
+
+    def test_should_expand_paths(self):
+        # given
+        dir_path = create_temp_dir(cleanup=True)
+        for file_name in ('values-prod.yaml', 'values-dev.yaml', 'chart.yaml'):
+            write_to_file(os.path.join(dir_path, file_name), '')
+        missing_path = os.path.join(dir_path, 'missing.yaml')
+
+        # when
+        paths = expand_paths((os.path.join(dir_path, 'values-*.yaml'), missing_path))
+
+        # then
+        assert paths == (
+            os.path.join(dir_path, 'values-dev.yaml'), os.path.join(dir_path, 'values-prod.yaml'), missing_path
+        )
@@ -1,4 +1,18 @@
-from common.helm import render_manifests, parse_manifests
+from os import listdir, makedirs, path
+from shutil import copytree
+
+from common.files import create_temp_dir, write_to_file
+import pytest
+
+from common.exceptions import TemplateError
+from common.helm import get_option_files, render_cache_key, render_manifests, parse_manifests, stream_manifests
+from common.profiler import Profiler
+
+
+@pytest.fixture
+def helm_version(monkeypatch):
+    # Cache keys are checked independently of whether helm is installed
+    monkeypatch.setattr('common.helm._get_helm_version', lambda helm_binary: 'v3.0.0')
 
 
 class TestHelm:
@@ -33,6 +47,158 @@ class TestHelm:
 
         assert manifests == expected_manifests
 
+    def test_render_manifests_with_cache(self):
+        # given
+        helm_binary = 'helm'
+        helm_options = ''
+        chart_location = 'test/charts/simple-chart'
+        cache_dir = path.join(create_temp_dir(cleanup=True), 'cache')
+
+        # when
+        manifests = render_manifests(helm_binary, helm_options, chart_location, cache_dir=cache_dir)
+        cached_manifests = render_manifests(helm_binary, helm_options, chart_location, cache_dir=cache_dir)
+
+        # then
+        cache_file = path.join(cache_dir, render_cache_key(helm_binary, helm_options, chart_location) + '.yaml')
+        assert path.isfile(cache_file)
+        assert cached_manifests == manifests
+
+    @pytest.mark.usefixtures('helm_version')
+    def test_render_cache_key(self, monkeypatch):
+        # given
+        chart_location = path.join(create_temp_dir(cleanup=True), 'simple-chart')
+        copytree('test/charts/simple-chart', chart_location)
+        values_location = 'test/common/values.yaml'
+
+        # when
+        key = render_cache_key('helm', '', chart_location, values_location, 'default', 'release')
+
+        # then
+        assert key == render_cache_key('helm', '', chart_location, values_location, 'default', 'release')
+        assert key != render_cache_key('helm', '--debug', chart_location, values_location, 'default', 'release')
+        assert key != render_cache_key('helm', '', chart_location, None, 'default', 'release')
+        assert key != render_cache_key('helm', '', chart_location, values_location, 'test', 'release')
+        assert key != render_cache_key('helm', '', chart_location, values_location, 'default', 'test')
+
+        # when
+        monkeypatch.setattr('common.helm._get_helm_version', lambda helm_binary: 'v3.1.0')
+
+        # then
+        assert key != render_cache_key('helm', '', chart_location, values_location, 'default', 'release')
+        monkeypatch.setattr('common.helm._get_helm_version', lambda helm_binary: 'v3.0.0')
+
+        # when
+        makedirs(path.join(chart_location, 'charts'))
+        write_to_file(path.join(chart_location, 'charts', 'dependency.yaml'), 'test')
+
+        # then
+        assert key != render_cache_key('helm', '', chart_location, values_location, 'default', 'release')
+
+    @pytest.mark.usefixtures('helm_version')
+    def test_render_cache_key_with_values_files_in_options(self):
+        # given
+        temp_dir = create_temp_dir(cleanup=True)
+        chart_location = 'test/charts/simple-chart'
+        values_location = path.join(temp_dir, 'values.yaml')
+        file_location = path.join(temp_dir, 'file.txt')
+        write_to_file(values_location, 'replicaCount: 1')
+        write_to_file(file_location, 'first')
+        helm_options = f'-f {values_location} --set-file config={file_location}'
+
+        # when
+        key = render_cache_key('helm', helm_options, chart_location)
+        write_to_file(values_location, 'replicaCount: 2')
+        changed_values_key = render_cache_key('helm', helm_options, chart_location)
+        write_to_file(file_location, 'second')
+        changed_file_key = render_cache_key('helm', helm_options, chart_location)
+
+        # then
+        assert len({key, changed_values_key, changed_file_key}) == 3
+        assert render_cache_key('helm', '--values https://example.com/values.yaml', chart_location) is None
+
+    def test_get_option_files(self):
+        # when
+        option_files = get_option_files('--namespace test -f a.yaml,b.yaml --values=c.yaml -fd.yaml '
+                                        + '--set-file key=e.txt,other=f.txt --set image=g')
+
+        # then
+        assert option_files == ('a.yaml', 'b.yaml', 'c.yaml', 'd.yaml', 'e.txt', 'f.txt')
+
+    @pytest.mark.usefixtures('helm_version')
+    def test_render_cache_key_with_file_dependency_outside_chart(self):
+        # given
+        temp_dir = create_temp_dir(cleanup=True)
+        chart_location = path.join(temp_dir, 'simple-chart')
+        dependency_location = path.join(temp_dir, 'dependency')
+        copytree('test/charts/simple-chart', chart_location)
+        copytree('test/charts/simple-chart', dependency_location)
+        with open(path.join(chart_location, 'Chart.yaml'), 'a') as f:
+            f.write('dependencies:\n- name: dependency\n  repository: file://../dependency\n')
+
+        # when
+        key = render_cache_key('helm', '', chart_location)
+        write_to_file(path.join(dependency_location, 'values.yaml'), 'replicaCount: 2')
+
+        # then
+        assert key != render_cache_key('helm', '', chart_location)
+
+    @pytest.mark.usefixtures('helm_version')
+    def test_render_cache_key_of_remote_chart(self):
+        # when
+        key = render_cache_key('helm', '', 'repository/chart')
+
+        # then
+        assert key is None
+
+    def test_stream_manifests(self):
+        # given
+        helm_binary = 'helm'
+        helm_options = ''
+        chart_location = 'test/charts/simple-chart'
+        cache_dir = path.join(create_temp_dir(cleanup=True), 'cache')
+
+        # when
+        manifests = tuple(stream_manifests(helm_binary, helm_options, chart_location, cache_dir=cache_dir))
+        cached_manifests = tuple(stream_manifests(helm_binary, helm_options, chart_location, cache_dir=cache_dir))
+
+        # then
+        with open('test/common/expected_manifests_default.yaml') as f:
+            expected_manifests = parse_manifests(f.read())
+
+        assert manifests == expected_manifests
+        assert cached_manifests == expected_manifests
+
+    def test_stream_manifests_should_fail_if_rendering_fails(self):
+        # given
+        helm_binary = 'false'
+        helm_options = ''
+        chart_location = 'test/charts/simple-chart'
+        cache_dir = path.join(create_temp_dir(cleanup=True), 'cache')
+        makedirs(cache_dir)
+
+        # when
+        with pytest.raises(TemplateError):
+            tuple(stream_manifests(helm_binary, helm_options, chart_location, cache_dir=cache_dir))
+
+        # then
+        assert listdir(cache_dir) == []
+
+    def test_stream_manifests_should_record_helm_as_subprocess(self):
+        # given
+        profiler = Profiler()
+        profiler.enable()
+        Profiler._instance = profiler
+
+        # when
+        try:
+            with pytest.raises(TemplateError):
+                tuple(stream_manifests('false', '', 'test/charts/simple-chart'))
+        finally:
+            Profiler._instance = None
+
+        # then
+        assert profiler.get_report()['subprocess']['calls'] == 1
+
     def test_parse_manifests(self):
         # given
         with open('test/common/expected_manifests_default.yaml') as f:
@@ -46,3 +212,11 @@ class TestHelm:
         assert len(manifests_as_dicts) == 4
         for manifest in manifests_as_dicts:
             assert 'kind' in manifest
+
+    def test_parse_manifests_should_fail_on_non_dict_manifest(self):
+        # given
+        manifests_as_yaml = 'kind: Pod\n---\n- item\n'
+
+        # when
+        with pytest.raises(TemplateError):
+            parse_manifests(manifests_as_yaml)
@@ -0,0 +1,29 @@
+from logging import DEBUG, INFO, getLogger
+
+from common.logger import lazy
+
+
+class TestLogger:
+    def test_should_not_evaluate_lazy_message_below_log_level(self):
+        # given
+        calls = []
+        logger = getLogger('test_lazy_disabled')
+        logger.setLevel(INFO)
+
+        # when
+        logger.debug('objects: %s', lazy(calls.append, 'evaluated'))
+
+        # then
+        assert calls == []
+
+    def test_should_evaluate_lazy_message_when_emitted(self, caplog):
+        # given
+        logger = getLogger('test_lazy_enabled')
+        logger.setLevel(DEBUG)
+
+        # when
+        with caplog.at_level(DEBUG, logger='test_lazy_enabled'):
+            logger.debug('objects: %s', lazy(lambda names: ', '.join(names), ('a', 'b')))
+
+        # then
+        assert caplog.messages == ['objects: a, b']
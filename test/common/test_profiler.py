@@ -0,0 +1,62 @@
+import json
+from os import path
+from threading import Thread
+
+from common.files import create_temp_dir, read_file_to_str
+from common.profiler import Profiler
+
+
+def busy_function():
+    return sum(index * index for index in range(100000))
+
+
+class TestProfiler:
+    def test_should_not_record_when_disabled(self):
+        # given
+        profiler = Profiler()
+
+        # when
+        with profiler.stage('render'):
+            pass
+        profiler.add_subprocess(1.0)
+
+        # then
+        assert profiler._stages == {}
+        assert profiler._subprocess_calls == 0
+
+    def test_should_report_stages_and_subprocesses(self):
+        # given
+        profiler = Profiler()
+        profiler.enable()
+
+        # when
+        for _ in range(2):
+            with profiler.stage('serialize'):
+                pass
+        profiler.add_subprocess(0.5)
+        profiler.add_subprocess(0.25)
+        report = profiler.get_report()
+
+        # then
+        assert report['stages']['serialize']['calls'] == 2
+        assert report['subprocess']['calls'] == 2
+        assert report['subprocess']['wall_seconds'] == 0.75
+        assert report['wall_seconds'] >= report['stages']['serialize']['seconds']
+        assert 'cpu_seconds' in report['in_process']
+        assert 'hotspots' not in report
+
+    def test_should_write_report_with_hotspots_of_all_threads(self):
+        # given
+        report_file = path.join(create_temp_dir(cleanup=True), 'profile.json')
+        profiler = Profiler()
+        profiler.enable(hotspots=True)
+
+        # when
+        thread = Thread(target=busy_function)
+        thread.start()
+        thread.join()
+        profiler.write_report(report_file)
+
+        # then
+        report = json.loads(read_file_to_str(report_file))
+        assert any('busy_function' in hotspot['function'] for hotspot in report['hotspots'])
@@ -0,0 +1,36 @@
+from datetime import date
+
+from common.serialization import dump_documents, load_documents
+
+
+class TestSerialization:
+    def test_should_dump_and_load_yaml_documents(self):
+        # given
+        documents = ({'review': {'name': 'first'}, 'parameters': {}}, {'review': {'name': 'second'}, 'parameters': {}})
+
+        # when
+        dumped = dump_documents(documents)
+
+        # then
+        assert tuple(load_documents(dumped)) == documents
+
+    def test_should_dump_json_documents_as_yaml_stream(self):
+        # given
+        documents = ({'review': {'name': 'first'}, 'parameters': {'labels': ['a']}}, {'review': {'name': 'second'}})
+
+        # when
+        dumped = dump_documents(documents, 'json')
+
+        # then
+        assert dumped.startswith('{"review": {"name": "first"}')
+        assert tuple(load_documents(dumped)) == documents
+
+    def test_should_dump_timestamps_as_strings_to_json(self):
+        # given
+        documents = ({'created': date(2021, 1, 1)},)
+
+        # when
+        dumped = dump_documents(documents, 'json')
+
+        # then
+        assert tuple(load_documents(dumped)) == ({'created': '2021-01-01'},)
@@ -0,0 +1,45 @@
+from conftest.chunks import ChunkSizer, INITIAL_CHUNK_SIZE
+
+
+class TestChunkSizer:
+    def test_should_split_documents_by_memory_limit(self):
+        # given
+        chunk_sizer = ChunkSizer(10)
+        documents = ((0, 'aaaa'), (0, 'bbbb'), (1, 'cccc'), (1, 'd' * 20), (1, 'eeee'))
+
+        # when
+        chunks = tuple(chunk_sizer.chunks(documents))
+
+        # then
+        assert chunks == (
+            ((0, 'aaaa'), (0, 'bbbb')),
+            ((1, 'cccc'),),
+            ((1, 'd' * 20),),
+            ((1, 'eeee'),),
+        )
+
+    def test_should_split_documents_by_chunk_size(self):
+        # given
+        chunk_sizer = ChunkSizer(1024 * 1024)
+        documents = tuple((0, 'document') for _ in range(INITIAL_CHUNK_SIZE + 1))
+
+        # when
+        chunks = tuple(chunk_sizer.chunks(documents))
+
+        # then
+        assert tuple(len(chunk) for chunk in chunks) == (INITIAL_CHUNK_SIZE, 1)
+
+    def test_should_adapt_chunk_size_to_latency(self):
+        # given
+        chunk_sizer = ChunkSizer(1024 * 1024, target_seconds=1.0)
+
+        # when
+        chunk_sizer.record(INITIAL_CHUNK_SIZE, INITIAL_CHUNK_SIZE * 0.001)
+        grown = chunk_sizer.size
+        for _ in range(10):
+            chunk_sizer.record(chunk_sizer.size, chunk_sizer.size * 0.1)
+        shrunk = chunk_sizer.size
+
+        # then
+        assert grown == INITIAL_CHUNK_SIZE * 2
+        assert shrunk == 10
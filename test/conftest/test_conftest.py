@@ -1,165 +1,68 @@
+import json
+from glob import glob
 from os import path
 
 from yaml import load_all, SafeLoader
 
 from admissionreviewrequest import AdmissionReviewRequest
 from common.files import create_temp_dir
-from conftest.conftest import extract_summary, run_conftest
+from conftest.chunks import ChunkSizer
+from conftest.conftest import group_constraints_by_policy_namespace, run_conftest
+from conftest.resultcache import ResultCache
+from conftest.results import get_summary, parse_conftest_json
 from constrainttemplates.policy import Policy
 
 
-class TestSummary:
-    def test_should_extract_empty_summary(self):
-        # given
-        result = ResultMock('')
-        output_format = 'stdout'
-
-        # when
-        summary = extract_summary(result, output_format)
-
-        # then
-        expected_summary = {
-            'tests': 0,
-            'passed': 0,
-            'warnings': 0,
-            'failures': 0,
-            'exceptions': 0
-        }
-        TestSummary.check_summary(summary, expected_summary)
-
-    def test_should_extract_stdout_summary(self):
-        # given
-        with open('test/conftest/summary.txt') as f:
-            result = ResultMock(f.read())
-
-        output_format = 'stdout'
-
-        # when
-        summary = extract_summary(result, output_format)
+def load_constraints():
+    with open('test/charts/constraints-chart/templates/constraint.yaml') as f:
+        return tuple(load_all(f.read(), Loader=SafeLoader))
 
-        # then
-        expected_summary = {
-            'tests': 5,
-            'passed': 1,
-            'warnings': 0,
-            'failures': 4,
-            'exceptions': 0
-        }
-        TestSummary.check_summary(summary, expected_summary)
-
-    def test_should_extract_json_summary(self):
-        # given
-        with open('test/conftest/summary.json') as f:
-            result = ResultMock(f.read())
-
-        output_format = 'json'
 
-        # when
-        summary = extract_summary(result, output_format)
+def load_admission_review_namespaces():
+    with open('test/namespaces/namespaces.yaml') as f:
+        return tuple(AdmissionReviewRequest(namespace) for namespace in load_all(f.read(), Loader=SafeLoader))
 
-        # then
-        expected_summary = {
-            'tests': 5,
-            'passed': 1,
-            'warnings': 0,
-            'failures': 4,
-            'exceptions': 0
-        }
-        TestSummary.check_summary(summary, expected_summary)
-
-    def test_should_extract_tap_summary(self):
-        # given
-        with open('test/conftest/summary.tap') as f:
-            result = ResultMock(f.read())
 
-        output_format = 'tap'
+def run_conftest_on_namespaces(output_file, constraints=None, admission_reviews=None, policy='', **options):
+    # Evaluates the constraints, by default those of the constraints chart, against the test namespaces.
+    # Options are passed by keyword, so tests do not depend on the order of the run_conftest parameters.
+    admission_reviews = admission_reviews or load_admission_review_namespaces()
+    return run_conftest(
+        policies_dir='test/policy',
+        policies={'K8sRequiredLabels': Policy('k8srequiredlabels', policy)},
+        constraints=constraints or load_constraints(),
+        admission_review_namespaces=admission_reviews,
+        admission_review_requests=admission_reviews,
+        output_format='json',
+        output_file=output_file,
+        warning_mode=False,
+        fail_fast=False,
+        **options)
 
-        # when
-        summary = extract_summary(result, output_format)
 
-        # then
-        expected_summary = {
-            'tests': 5,
-            'passed': 1,
-            'warnings': 0,
-            'failures': 4,
-            'exceptions': 0
-        }
-        TestSummary.check_summary(summary, expected_summary)
-
-    def test_should_extract_table_summary(self):
-        # given
-        with open('test/conftest/summary.table') as f:
-            result = ResultMock(f.read())
+def read_output(output_file):
+    with open(output_file) as f:
+        return tuple(load_all(f.read().replace('\t', ''), Loader=SafeLoader))
 
-        output_format = 'table'
 
+class TestSummary:
+    def test_should_get_empty_summary(self):
         # when
-        summary = extract_summary(result, output_format)
+        summary = get_summary(parse_conftest_json('[]'))
 
         # then
-        expected_summary = {
-            'tests': 5,
-            'passed': 4,
-            'warnings': 1,
-            'failures': 0,
-            'exceptions': 0
-        }
-        TestSummary.check_summary(summary, expected_summary)
-
-    def test_should_extract_junit_summary(self):
-        # given
-        with open('test/conftest/summary.xml') as f:
-            result = ResultMock(f.read())
-
-        output_format = 'junit'
-
-        # when
-        summary = extract_summary(result, output_format)
+        assert summary == {'tests': 0, 'passed': 0, 'warnings': 0, 'failures': 0, 'exceptions': 0}
 
-        # then
-        expected_summary = {
-            'tests': 5,
-            'passed': 1,
-            'warnings': 0,
-            'failures': 4,
-            'exceptions': 0
-        }
-        TestSummary.check_summary(summary, expected_summary)
-
-    def test_should_extract_github_summary(self):
+    def test_should_get_json_summary(self):
         # given
-        with open('test/conftest/summary.github') as f:
-            result = ResultMock(f.read())
-
-        output_format = 'github'
+        with open('test/conftest/summary.json') as f:
+            output = f.read()
 
         # when
-        summary = extract_summary(result, output_format)
+        summary = get_summary(parse_conftest_json(output))
 
         # then
-        expected_summary = {
-            'tests': 5,
-            'passed': 1,
-            'warnings': 0,
-            'failures': 4,
-            'exceptions': 0
-        }
-        TestSummary.check_summary(summary, expected_summary)
-
-    @staticmethod
-    def check_summary(summary, expected_summary):
-        assert isinstance(summary, dict)
-        assert len(summary) == len(expected_summary)
-
-        for key, value in expected_summary.items():
-            assert key in summary
-            assert summary[key] == expected_summary[key]
-
-
-class ResultMock:
-    def __init__(self, stdout):
-        self.stdout = stdout
+        assert summary == {'tests': 5, 'passed': 1, 'warnings': 0, 'failures': 4, 'exceptions': 0}
 
 
 class TestConftest:
@@ -206,3 +109,154 @@ class TestConftest:
 
         assert output_first_item['successes'] == 1
         assert len(output_first_item['failures']) == 1
+
+    def test_should_run_conftest_with_multiple_jobs(self):
+        # given
+        output_file = path.join(create_temp_dir(cleanup=True), 'result.json')
+
+        # when
+        run_conftest_on_namespaces(output_file, jobs=4)
+
+        # then
+        output = read_output(output_file)
+        assert len(output) == 1
+        assert output[0][0]['successes'] == 1
+        assert len(output[0][0]['failures']) == 1
+
+    def test_should_run_conftest_in_batch_mode(self):
+        # given
+        constraint = load_constraints()[0]
+        constraints = (
+            constraint,
+            dict(constraint, metadata={'name': 'ns-must-have-name'},
+                 spec=dict(constraint['spec'], parameters={'labels': ['name']})),
+            dict(constraint, metadata={'name': 'ns-must-have-gk-copy'}),
+        )
+        output_file = path.join(create_temp_dir(cleanup=True), 'result.json')
+
+        # when
+        run_conftest_on_namespaces(output_file, constraints=constraints, batch=True)
+
+        # then
+        output = read_output(output_file)
+        assert len(output) == 1
+        assert len(output[0]) == 3
+        assert output[0][0]['filename'] == 'K8sRequiredLabels-ns-must-have-gk'
+        assert output[0][1]['filename'] == 'K8sRequiredLabels-ns-must-have-gk-copy'
+        assert output[0][2]['filename'] == 'K8sRequiredLabels-ns-must-have-name'
+        for output_item in output[0]:
+            assert output_item['successes'] == 1
+            assert len(output_item['failures']) == 1
+
+    def test_should_run_conftest_with_result_cache(self):
+        # given
+        output_dir = create_temp_dir(cleanup=True)
+        output_files = (path.join(output_dir, 'first.json'), path.join(output_dir, 'second.json'))
+        result_cache = ResultCache(path.join(output_dir, 'cache'), 1024 * 1024, 'test')
+
+        # when
+        with result_cache:
+            for output_file in output_files:
+                run_conftest_on_namespaces(output_file, policy='package k8srequiredlabels', result_cache=result_cache)
+
+        # then
+        outputs = tuple(read_output(output_file) for output_file in output_files)
+        assert outputs[0] == outputs[1]
+        assert outputs[1][0][0]['successes'] == 1
+        assert len(outputs[1][0][0]['failures']) == 1
+        assert len(glob(path.join(result_cache.entries_dir, '*.json'))) == 2
+
+    def test_should_report_cached_exceptions(self):
+        # given
+        output_dir = create_temp_dir(cleanup=True)
+        output_file = path.join(output_dir, 'result.json')
+        result_cache = ResultCache(path.join(output_dir, 'cache'), 1024 * 1024, 'test')
+        exception = {'msg': 'data.main.exception[_][_] == "ns-must-have-gk"'}
+
+        # when
+        with result_cache:
+            run_conftest_on_namespaces(output_file, policy='package k8srequiredlabels', result_cache=result_cache)
+            for entry in glob(path.join(result_cache.entries_dir, '*.json')):
+                with open(entry) as f:
+                    verdict = json.load(f)
+                with open(entry, 'w') as f:
+                    json.dump(dict(verdict, exceptions=[exception]), f)
+            run_conftest_on_namespaces(output_file, policy='package k8srequiredlabels', result_cache=result_cache)
+
+        # then
+        output = read_output(output_file)[0][0]
+        assert output['exceptions'] == [exception, exception]
+        assert output['successes'] == 1
+        assert len(output['failures']) == 1
+
+    def test_should_run_conftest_in_chunks(self):
+        # given
+        admission_reviews = load_admission_review_namespaces()
+        output_dir = create_temp_dir(cleanup=True)
+        output_files = {batch: path.join(output_dir, f'{batch}.json') for batch in (False, True)}
+
+        # when
+        for batch, output_file in output_files.items():
+            # Every document is larger than the limit, so each one is evaluated by a conftest command of its own
+            run_conftest_on_namespaces(output_file, admission_reviews=admission_reviews, batch=batch,
+                                       chunk_sizer=ChunkSizer(1))
+
+        # then
+        for output_file in output_files.values():
+            output = read_output(output_file)
+            assert len(output) == 1
+            assert len(output[0]) == 1
+            assert output[0][0]['filename'] == 'K8sRequiredLabels-ns-must-have-gk'
+            assert output[0][0]['successes'] == 1
+            assert len(output[0][0]['failures']) == 1
+        # Evaluated chunks are not kept in memory by the serialized reviews
+        assert all(admission_review._serialized is None for admission_review in admission_reviews)
+
+    def test_should_count_only_conftest_rules_with_opa_evaluator(self):
+        # given
+        output_file = path.join(create_temp_dir(cleanup=True), 'result.json')
+        opa_evaluator = OpaEvaluatorMock({
+            'violation': [{'msg': 'you must provide labels'}],
+            'deny_privileged': [],
+            'denylisted': ['gatekeeper'],
+            'warnings': ['helper'],
+        })
+
+        # when
+        run_conftest_on_namespaces(output_file, opa_evaluator=opa_evaluator)
+
+        # then
+        output = read_output(output_file)
+        # Both namespaces are tested by violation and deny_privileged only
+        assert output[0][0]['successes'] == 2
+        assert output[0][0]['failures'] == [{'msg': 'you must provide labels'}] * 2
+        assert 'warnings' not in output[0][0]
+
+
+class TestConstraintGroups:
+    def test_should_group_constraints_by_policy_namespace(self):
+        # given
+        policies = {'K8sRequiredLabels': Policy('k8srequiredlabels', ''), 'K8sAllowedRepos': Policy('k8sallowedrepos', '')}
+        constraints = (
+            {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'first'}},
+            {'kind': 'K8sAllowedRepos', 'metadata': {'name': 'second'}},
+            {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'third'}},
+        )
+
+        # when
+        groups = group_constraints_by_policy_namespace(constraints, policies)
+
+        # then
+        assert list(groups) == ['k8srequiredlabels', 'k8sallowedrepos']
+        assert groups['k8srequiredlabels'] == (constraints[0], constraints[2])
+        assert groups['k8sallowedrepos'] == (constraints[1],)
+
+
+class OpaEvaluatorMock:
+    description = 'opa mock'
+
+    def __init__(self, document_results):
+        self.document_results = document_results
+
+    def evaluate_documents(self, policy, documents):
+        return tuple(self.document_results for _ in documents)
@@ -0,0 +1,51 @@
+from admissionreviewrequest import AdmissionReviewRequest
+from common.serialization import dump_documents, load_documents
+from conftest.input import Input, serialize_inputs
+
+
+class TestInput:
+    def test_should_serialize_inputs_as_yaml(self):
+        # given
+        admission_reviews = TestInput.admission_reviews()
+        parameters = {'labels': ['gatekeeper']}
+
+        # when
+        serialized = serialize_inputs(admission_reviews, parameters)
+
+        # then
+        expected = tuple(Input(admission_review, parameters).as_dict() for admission_review in admission_reviews)
+        assert TestInput.load(serialized) == TestInput.load(dump_documents(expected))
+
+    def test_should_serialize_inputs_as_json(self):
+        # given
+        admission_reviews = TestInput.admission_reviews()
+        parameters = {'labels': ['gatekeeper']}
+
+        # when
+        serialized = serialize_inputs(admission_reviews, parameters, 'json')
+
+        # then
+        expected = tuple(Input(admission_review, parameters).as_dict() for admission_review in admission_reviews)
+        assert TestInput.load(serialized) == TestInput.load(dump_documents(expected))
+
+    def test_should_reuse_serialized_review(self):
+        # given
+        admission_review = TestInput.admission_reviews()[0]
+
+        # when
+        first = admission_review.serialize('json')
+        second = admission_review.serialize('json')
+
+        # then
+        assert first is second
+
+    @staticmethod
+    def admission_reviews():
+        return tuple(
+            AdmissionReviewRequest({'apiVersion': 'v1', 'kind': 'Namespace', 'metadata': {'name': name, 'labels': {}}})
+            for name in ('first', 'second')
+        )
+
+    @staticmethod
+    def load(serialized):
+        return tuple(load_documents(serialized))
@@ -0,0 +1,62 @@
+from os import listdir, makedirs, path, utime
+
+from common.files import create_temp_dir
+from conftest.resultcache import RESULT_CACHE_MARKER, ResultCache, get_result_key
+
+
+class TestResultCache:
+    def test_should_return_cached_result(self):
+        # given
+        result_cache = ResultCache(create_temp_dir(cleanup=True), 1024, 'Conftest: 0.30.0')
+        result = {'successes': 0, 'failures': [{'msg': 'you must provide labels'}], 'warnings': []}
+
+        # when
+        with result_cache:
+            result_cache.put('key', result)
+            cached_result = result_cache.get('key')
+            missing_result = result_cache.get('missing-key')
+
+        # then
+        assert cached_result == result
+        assert missing_result is None
+
+    def test_should_not_return_results_of_other_version(self):
+        # given
+        cache_dir = create_temp_dir(cleanup=True)
+        result = {'successes': 1, 'failures': [], 'warnings': []}
+        with ResultCache(cache_dir, 1024, 'Conftest: 0.30.0') as result_cache:
+            result_cache.put('key', result)
+        makedirs(path.join(cache_dir, '0123456789abcdef'))
+        makedirs(path.join(cache_dir, 'other'))
+
+        # when
+        with ResultCache(cache_dir, 1024, 'Conftest: 0.31.0') as result_cache:
+            cached_result = result_cache.get('key')
+
+        # then
+        assert cached_result is None
+        assert sorted(listdir(cache_dir)) == sorted(
+            ('0123456789abcdef', 'other', path.basename(result_cache.entries_dir)))
+
+    def test_should_prune_least_recently_used_results(self):
+        # given
+        result_cache = ResultCache(create_temp_dir(cleanup=True), 100, 'Conftest: 0.30.0')
+        result = {'successes': 1, 'failures': [], 'warnings': []}
+
+        # when
+        with result_cache:
+            for modification_time, key in enumerate(('first', 'second', 'third')):
+                result_cache.put(key, result)
+                utime(path.join(result_cache.entries_dir, key + '.json'), (modification_time, modification_time))
+
+        # then
+        assert sorted(listdir(result_cache.entries_dir)) == [RESULT_CACHE_MARKER, 'second.json', 'third.json']
+
+    def test_should_get_result_key(self):
+        # when
+        key = get_result_key('package k8srequiredlabels', 'review: {}\nparameters: {}\n')
+
+        # then
+        assert key == get_result_key('package k8srequiredlabels', 'review: {}\nparameters: {}\n')
+        assert key != get_result_key('package k8srequiredlabels', 'review: {}\nparameters: {labels: [gk]}\n')
+        assert key != get_result_key('package k8srequired', 'review: {}\nparameters: {}\n')
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from conftest.results import CheckResult, ConstraintResult, get_output_files, get_summary, merge_results, \
+    parse_conftest_json, render
+
+
+class TestResults:
+    def test_should_parse_conftest_json(self):
+        # given
+        with open('test/conftest/summary.json') as f:
+            output = f.read()
+
+        # when
+        results = parse_conftest_json(output)
+
+        # then
+        assert len(results) == 1
+        assert results[0].filename == 'examples/kubernetes/deployment.yaml'
+        assert results[0].successes == 1
+        assert len(results[0].failures) == 4
+        assert results[0].warnings == []
+        assert get_summary(results) == {'tests': 5, 'passed': 1, 'warnings': 0, 'failures': 4, 'exceptions': 0}
+
+    @pytest.mark.parametrize('output_format, expected_output', (
+        ('stdout', '\n\n7 tests, 3 passed, 0 warnings, 4 failures, 0 exceptions'),
+        ('tap', '1..7\nnot ok 1 - K8sRequiredLabels-ns-must-have-gk - k8srequiredlabels - '),
+        ('table', '| failure | K8sRequiredLabels-ns-must-have-gk   | k8srequiredlabels | you must provide labels'),
+        ('junit', '<testsuite tests="7" failures="4" skipped="0"'),
+        ('github', '::endgroup::\n7 tests, 3 passed, 0 warnings, 4 failures, 0 exceptions'),
+    ))
+    def test_should_render_results_in_every_format(self, output_format, expected_output):
+        # when
+        output = render(self.results(), output_format)
+
+        # then
+        assert expected_output in output
+
+    def test_should_render_json_parsed_back_to_same_summary(self):
+        # when
+        output = render(self.results(), 'json')
+
+        # then
+        expected_summary = {'tests': 7, 'passed': 3, 'warnings': 0, 'failures': 4, 'exceptions': 0}
+        assert get_summary(parse_conftest_json(output)) == expected_summary
+
+    def test_should_report_failed_constraint(self):
+        # given
+        constraint = {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'ns-must-have-gk'}}
+
+        # when
+        passed = ConstraintResult(constraint, (CheckResult('-', 'main', 1, warnings=[{'msg': 'warning'}]),))
+        failed = ConstraintResult(constraint, (CheckResult('-', 'main', 0, failures=[{'msg': 'failure'}]),))
+        errored = ConstraintResult(constraint, (), 'policy failed to compile')
+
+        # then
+        assert passed.name == 'ns-must-have-gk'
+        assert not passed.failed
+        assert failed.failed
+        assert errored.failed
+
+    def test_should_get_output_files(self):
+        # when
+        single_file = get_output_files('result.xml', ('junit',))
+        several_files = get_output_files('result.txt', ('stdout', 'junit', 'json'))
+
+        # then
+        assert single_file == {'junit': 'result.xml'}
+        assert several_files == {'stdout': 'result.txt', 'junit': 'result.xml', 'json': 'result.json'}
+
+    def test_should_render_json_lines(self):
+        # given
+        results = (CheckResult('first', 'main', 1, failures=[{'msg': 'failure'}]), CheckResult('second', 'main', 2))
+
+        # when
+        output = render(results, 'jsonl')
+
+        # then
+        lines = output.splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[0]) == {'filename': 'first', 'namespace': 'main', 'successes': 1,
+                                        'failures': [{'msg': 'failure'}]}
+        assert json.loads(lines[1]) == {'filename': 'second', 'namespace': 'main', 'successes': 2}
+
+    def test_should_merge_results_of_same_file(self):
+        # given
+        results = (
+            CheckResult('first', 'main', 1, failures=[{'msg': 'first failure'}]),
+            CheckResult('second', 'main', 2),
+            CheckResult('first', 'main', 3, failures=[{'msg': 'second failure'}], warnings=[{'msg': 'warning'}]),
+        )
+
+        # when
+        merged = merge_results(results)
+
+        # then
+        assert [result.as_dict() for result in merged] == [
+            {'filename': 'first', 'namespace': 'main', 'successes': 4, 'warnings': [{'msg': 'warning'}],
+             'failures': [{'msg': 'first failure'}, {'msg': 'second failure'}]},
+            {'filename': 'second', 'namespace': 'main', 'successes': 2},
+        ]
+
+    @staticmethod
+    def results():
+        return (
+            CheckResult('K8sRequiredLabels-ns-must-have-gk', 'k8srequiredlabels', 1,
+                        failures=[{'msg': f'you must provide labels: {{"gk{index}"}}'} for index in range(4)]),
+            CheckResult('K8sRequiredLabels-ns-must-have-name', 'k8srequiredlabels', 2),
+        )
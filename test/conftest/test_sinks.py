@@ -0,0 +1,111 @@
+from os import listdir, path
+from xml.etree import ElementTree
+
+import pytest
+
+from common.files import create_temp_dir, read_file_to_str
+from conftest.results import CheckResult, ConstraintResult, render
+from conftest.sinks import OutputSink, OutputSinks
+
+
+def create_constraint_result(name, results, job=None):
+    return ConstraintResult({'kind': 'K8sRequiredLabels', 'metadata': {'name': name}}, results, job=job)
+
+
+CONSTRAINT_RESULTS = (
+    create_constraint_result('ns-must-have-gk', (
+        CheckResult('K8sRequiredLabels-ns-must-have-gk', 'main', 1, failures=[{'msg': 'failure'}]),
+    )),
+    create_constraint_result('ns-must-have-name', (
+        CheckResult('K8sRequiredLabels-ns-must-have-name', 'main', 2, warnings=[{'msg': 'warning'}]),
+    )),
+)
+RESULTS = tuple(result for constraint_result in CONSTRAINT_RESULTS for result in constraint_result.results)
+
+
+class TestSinks:
+    @pytest.mark.parametrize('output_format', ('stdout', 'json', 'tap', 'table', 'github'))
+    def test_should_stream_same_output_as_rendered(self, output_format):
+        # given
+        output_file = path.join(create_temp_dir(cleanup=True), 'result')
+
+        # when
+        with OutputSinks(output_format, output_file) as output_sinks:
+            for constraint_result in CONSTRAINT_RESULTS:
+                output_sinks.write(constraint_result)
+
+        # then
+        assert read_file_to_str(output_file) == render(RESULTS, output_format) + '\n'
+
+    def test_should_stream_junit_testsuite_per_constraint(self):
+        # given
+        output_file = path.join(create_temp_dir(cleanup=True), 'result.xml')
+
+        # when
+        with OutputSinks('junit', output_file) as output_sinks:
+            for constraint_result in CONSTRAINT_RESULTS:
+                output_sinks.write(constraint_result)
+
+        # then
+        testsuites = ElementTree.parse(output_file).getroot().findall('testsuite')
+        assert [testsuite.get('name') for testsuite in testsuites] == [
+            'K8sRequiredLabels-ns-must-have-gk', 'K8sRequiredLabels-ns-must-have-name'
+        ]
+        assert [testsuite.get('tests') for testsuite in testsuites] == ['2', '3']
+        assert [testsuite.get('failures') for testsuite in testsuites] == ['1', '0']
+
+    def test_should_write_file_per_constraint_and_format(self):
+        # given
+        output_dir = path.join(create_temp_dir(cleanup=True), 'results')
+        job_result = create_constraint_result('ns-must-have-gk', CONSTRAINT_RESULTS[0].results, 'charts/app')
+
+        # when
+        with OutputSinks('json,stdout', None, output_dir) as output_sinks:
+            for constraint_result in CONSTRAINT_RESULTS + (job_result,):
+                output_sinks.write(constraint_result)
+
+        # then
+        assert sorted(listdir(output_dir)) == [
+            'K8sRequiredLabels-ns-must-have-gk.json', 'K8sRequiredLabels-ns-must-have-gk.txt',
+            'K8sRequiredLabels-ns-must-have-name.json', 'K8sRequiredLabels-ns-must-have-name.txt', 'charts_app'
+        ]
+        assert read_file_to_str(path.join(output_dir, 'K8sRequiredLabels-ns-must-have-name.json')) == \
+            render(CONSTRAINT_RESULTS[1].results, 'json') + '\n'
+        assert sorted(listdir(path.join(output_dir, 'charts_app'))) == [
+            'K8sRequiredLabels-ns-must-have-gk.json', 'K8sRequiredLabels-ns-must-have-gk.txt'
+        ]
+
+    def test_should_write_several_formats_to_files_differing_in_extension(self):
+        # given
+        output_dir = create_temp_dir(cleanup=True)
+
+        # when
+        with OutputSinks('jsonl,stdout', path.join(output_dir, 'result.jsonl')) as output_sinks:
+            for constraint_result in CONSTRAINT_RESULTS:
+                output_sinks.write(constraint_result)
+
+        # then
+        assert sorted(listdir(output_dir)) == ['result.jsonl', 'result.txt']
+        assert read_file_to_str(path.join(output_dir, 'result.jsonl')) == render(RESULTS, 'jsonl') + '\n'
+
+    def test_should_not_leave_partial_output_file(self):
+        # given
+        output_dir = create_temp_dir(cleanup=True)
+
+        # when
+        with pytest.raises(RuntimeError):
+            with OutputSinks('json', path.join(output_dir, 'result.json')) as output_sinks:
+                output_sinks.write(CONSTRAINT_RESULTS[0])
+                raise RuntimeError('evaluation failed')
+
+        # then
+        assert listdir(output_dir) == []
+
+    def test_should_not_create_sink_without_write(self):
+        # given
+        class IncompleteSink(OutputSink):
+            pass
+
+        # when
+        with pytest.raises(TypeError):
+            IncompleteSink(path.join(create_temp_dir(cleanup=True), 'result'))
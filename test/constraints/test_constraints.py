@@ -1,4 +1,4 @@
-from constraints import get_constraints, validate
+from constraints import get_constraints, group_equivalent_constraints, validate
 
 
 class TestConstraints:
@@ -22,6 +22,26 @@ class TestConstraints:
         # then
         validate(manifests)
 
+    def test_should_group_equivalent_constraints(self):
+        # given
+        match = {'kinds': [{'apiGroups': [''], 'kinds': ['Namespace']}]}
+        constraints = (
+            {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'team-a'},
+             'spec': {'match': match, 'parameters': {'labels': ['gatekeeper']}}},
+            {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'team-b'},
+             'spec': {'match': dict(match), 'parameters': {'labels': ['gatekeeper']}}},
+            {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'other-parameters'},
+             'spec': {'match': match, 'parameters': {'labels': ['owner']}}},
+            {'kind': 'K8sOtherKind', 'metadata': {'name': 'other-kind'},
+             'spec': {'match': match, 'parameters': {'labels': ['gatekeeper']}}},
+        )
+
+        # when
+        groups = group_equivalent_constraints(constraints)
+
+        # then
+        assert groups == ((constraints[0], constraints[1]), (constraints[2],), (constraints[3],))
+
 
 class ArgsFromFileMock:
     def __init__(self, policy_constraints_file):
@@ -33,5 +53,6 @@ class ArgsFromChartMock:
         self.policy_constraints_file = ''
         self.helm_binary = 'helm'
         self.helm_options = ''
+        self.helm_cache_dir = None
         self.policy_chart_constraints = chart_location
         self.policy_chart_constraints_values = None
\ No newline at end of file
@@ -1,4 +1,4 @@
-from os import path
+from os import listdir, path
 from os.path import isfile
 
 from common.files import create_temp_dir
@@ -44,6 +44,35 @@ class TestConstraints:
         TestConstraints.verify_policies(policies)
         TestConstraints.verify_output_file(output_file)
 
+    def test_should_prune_policies_without_constraints_and_save_libs(self):
+        # given
+        lib = 'package lib.labels\n\nmissing(provided, required) = required - provided\n'
+        constraint_templates = (
+            create_constraint_template('K8sRequiredLabels', 'k8srequiredlabels', [lib]),
+            create_constraint_template('K8sRequiredAnnotations', 'k8srequiredannotations', [lib]),
+            create_constraint_template('K8sAllowedRepos', 'k8sallowedrepos'),
+        )
+        constraints = (
+            {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'ns-must-have-gk'}},
+            {'kind': 'K8sRequiredAnnotations', 'metadata': {'name': 'ns-must-have-owner'}},
+        )
+        output_dir = create_temp_dir(cleanup=True)
+
+        # when
+        policies = generate_policies(constraint_templates, output_dir, constraints)
+
+        # then
+        assert sorted(policies) == ['K8sRequiredAnnotations', 'K8sRequiredLabels']
+        assert sorted(listdir(output_dir)) == ['k8srequiredannotations.rego', 'k8srequiredlabels.rego', 'lib']
+        assert len(listdir(path.join(output_dir, 'lib'))) == 1
+
+        policy = policies['K8sRequiredLabels']
+        assert policy.libs == (lib,)
+        assert policy.files[0] == path.join(output_dir, 'k8srequiredlabels.rego')
+        assert policy.files[1:] == policies['K8sRequiredAnnotations'].files[1:]
+        with open(policy.files[1]) as f:
+            assert f.read() == lib
+
     @staticmethod
     def verify_policies(policies):
         assert isinstance(policies, dict)
@@ -63,6 +92,13 @@ class TestConstraints:
         assert output_file_content == expected_output_file_content
 
 
+def create_constraint_template(kind, package, libs=None):
+    target = {'target': 'admission.k8s.gatekeeper.sh', 'rego': f'package {package}\n'}
+    if libs:
+        target['libs'] = libs
+    return {'kind': 'ConstraintTemplate', 'spec': {'crd': {'spec': {'names': {'kind': kind}}}, 'targets': [target]}}
+
+
 class ArgsFromFileMock:
     def __init__(self, policy_constraint_templates_file):
         self.policy_constraint_templates_file = policy_constraint_templates_file
@@ -73,5 +109,6 @@ class ArgsFromChartMock:
         self.policy_constraint_templates_file = ''
         self.helm_binary = 'helm'
         self.helm_options = ''
+        self.helm_cache_dir = None
         self.policy_chart_constraint_templates = chart_location
         self.policy_chart_constraint_templates_values = None
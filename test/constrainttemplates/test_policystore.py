@@ -0,0 +1,76 @@
+from os import listdir, path, stat
+
+import pytest
+
+from common.exceptions import ConftestError
+from common.files import create_temp_dir
+from constrainttemplates.policy import Policy
+from constrainttemplates.policystore import PolicyStore, get_policy_key
+
+
+class TestPolicyStore:
+    def test_should_save_policy_once(self):
+        # given
+        store_dir = create_temp_dir(cleanup=True)
+        policy = Policy('k8srequiredlabels', 'package k8srequiredlabels\n', ('package lib.labels\n',))
+        policy_store = PolicyStore(store_dir, 'test')
+        policy_store.open()
+
+        # when
+        first_policy = policy_store.save(policy)
+        first_stats = tuple(stat(policy_file).st_mtime_ns for policy_file in first_policy.files)
+        second_policy = PolicyStore(store_dir, 'test').save(policy)
+
+        # then
+        assert first_policy.files == second_policy.files
+        assert first_stats == tuple(stat(policy_file).st_mtime_ns for policy_file in second_policy.files)
+        assert listdir(path.join(store_dir, 'policies')) == [get_policy_key(policy)]
+        with open(first_policy.files[0]) as f:
+            assert f.read() == policy.policy
+        with open(first_policy.files[1]) as f:
+            assert f.read() == policy.libs[0]
+
+    def test_should_save_changed_policy_next_to_previous_one(self):
+        # given
+        store_dir = create_temp_dir(cleanup=True)
+        policy_store = PolicyStore(store_dir, 'test')
+        policy_store.open()
+
+        # when
+        first_policy = policy_store.save(Policy('k8srequiredlabels', 'package k8srequiredlabels\n'))
+        second_policy = policy_store.save(Policy('k8srequiredlabels', 'package k8srequiredlabels\n\n'))
+
+        # then
+        assert first_policy.files != second_policy.files
+        assert len(listdir(path.join(store_dir, 'policies'))) == 2
+
+    def test_should_fail_for_invalid_policy(self):
+        # given
+        policy_store = PolicyStore(create_temp_dir(cleanup=True), 'test')
+        policy_store.open()
+        policy = Policy('k8srequiredlabels', 'package k8srequiredlabels\n\nviolation[{"msg": msg}] {\n')
+
+        # when
+        with pytest.raises(ConftestError) as e:
+            policy_store.save(policy)
+
+        # then
+        assert 'k8srequiredlabels' in str(e.value)
+
+    def test_should_use_cached_verification(self):
+        # given
+        store_dir = create_temp_dir(cleanup=True)
+        policy = Policy('k8srequiredlabels', 'package k8srequiredlabels\n')
+        policy_store = PolicyStore(store_dir, 'test')
+        policy_store.open()
+        policy_dir = path.dirname(policy_store.save(policy).files[0])
+        verification_file = next(file for file in listdir(policy_dir) if file.startswith('verify-'))
+        with open(path.join(policy_dir, verification_file), 'w') as f:
+            f.write('{"passed": false, "output": "rego_parse_error"}')
+
+        # when
+        with pytest.raises(ConftestError) as e:
+            policy_store.save(policy)
+
+        # then
+        assert 'rego_parse_error' in str(e.value)
@@ -57,6 +57,7 @@ class ArgsFromChartMock:
         self.input_kubernetes_objects = None
         self.helm_binary = 'helm'
         self.helm_options = ''
+        self.helm_cache_dir = None
         self.input_chart = chart_location
         self.input_chart_values = None
         self.input_chart_namespace = 'test_namespace'
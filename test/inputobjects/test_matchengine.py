@@ -0,0 +1,128 @@
+from admissionreviewrequest import AdmissionReviewRequest
+from inputobjects import MatchEngine, filter_matching_constraint
+
+
+class TestMatchEngine:
+    def test_should_match_all_objects_with_empty_match(self):
+        # given
+        match_engine = MatchEngine(TestMatchEngine.objects(), TestMatchEngine.namespaces())
+
+        # when
+        matching = match_engine.match({})
+
+        # then
+        assert TestMatchEngine.names(matching) == ['pod-a', 'pod-b', 'deployment-a', 'cluster-role']
+
+    def test_should_match_by_kinds(self):
+        # given
+        match_engine = MatchEngine(TestMatchEngine.objects(), TestMatchEngine.namespaces())
+
+        # when
+        matching = match_engine.match({'kinds': [{'apiGroups': [''], 'kinds': ['Pod']},
+                                                 {'apiGroups': ['apps'], 'kinds': ['Deployment']}]})
+
+        # then
+        assert TestMatchEngine.names(matching) == ['pod-a', 'pod-b', 'deployment-a']
+
+    def test_should_match_by_namespaces(self):
+        # given
+        match_engine = MatchEngine(TestMatchEngine.objects(), TestMatchEngine.namespaces())
+
+        # when
+        included = match_engine.match({'namespaces': ['production']})
+        excluded = match_engine.match({'excludedNamespaces': ['production']})
+
+        # then
+        assert TestMatchEngine.names(included) == ['pod-b', 'deployment-a']
+        assert TestMatchEngine.names(excluded) == ['pod-a', 'cluster-role']
+
+    def test_should_match_by_namespace_selector(self):
+        # given
+        match_engine = MatchEngine(TestMatchEngine.objects(), TestMatchEngine.namespaces())
+
+        # when
+        matching = match_engine.match({'namespaceSelector': {'matchLabels': {'environment': 'production'}}})
+
+        # then
+        assert TestMatchEngine.names(matching) == ['pod-b', 'deployment-a']
+
+    def test_should_match_by_label_selector(self):
+        # given
+        match_engine = MatchEngine(TestMatchEngine.objects(), TestMatchEngine.namespaces())
+
+        # when
+        match_labels = match_engine.match({'labelSelector': {'matchLabels': {'app': 'a'}}})
+        match_in = match_engine.match(
+            {'labelSelector': {'matchExpressions': [{'key': 'app', 'operator': 'In', 'values': ['a', 'b']}]}})
+        match_not_in = match_engine.match(
+            {'labelSelector': {'matchExpressions': [{'key': 'app', 'operator': 'NotIn', 'values': ['a']}]}})
+        match_exists = match_engine.match(
+            {'labelSelector': {'matchExpressions': [{'key': 'app', 'operator': 'Exists'}]}})
+        match_does_not_exist = match_engine.match(
+            {'labelSelector': {'matchExpressions': [{'key': 'app', 'operator': 'DoesNotExist'}]}})
+        match_both = match_engine.match({'labelSelector': {
+            'matchLabels': {'app': 'a'},
+            'matchExpressions': [{'key': 'tier', 'operator': 'Exists'}]}})
+
+        # then
+        assert TestMatchEngine.names(match_labels) == ['pod-a', 'deployment-a']
+        assert TestMatchEngine.names(match_in) == ['pod-a', 'pod-b', 'deployment-a']
+        assert TestMatchEngine.names(match_not_in) == ['pod-b', 'cluster-role']
+        assert TestMatchEngine.names(match_exists) == ['pod-a', 'pod-b', 'deployment-a']
+        assert TestMatchEngine.names(match_does_not_exist) == ['cluster-role']
+        assert TestMatchEngine.names(match_both) == ['deployment-a']
+
+    def test_should_match_by_scope(self):
+        # given
+        match_engine = MatchEngine(TestMatchEngine.objects(), TestMatchEngine.namespaces())
+
+        # when
+        cluster = match_engine.match({'scope': 'Cluster'})
+        namespaced = match_engine.match({'scope': 'Namespaced'})
+        everything = match_engine.match({'scope': '*'})
+
+        # then
+        assert TestMatchEngine.names(cluster) == ['cluster-role']
+        assert TestMatchEngine.names(namespaced) == ['pod-a', 'pod-b', 'deployment-a']
+        assert len(everything) == 4
+
+    def test_should_combine_criteria(self):
+        # given
+        match = {
+            'kinds': [{'apiGroups': [''], 'kinds': ['Pod']}],
+            'namespaceSelector': {'matchExpressions': [{'key': 'environment', 'operator': 'Exists'}]},
+            'labelSelector': {'matchLabels': {'app': 'b'}},
+        }
+
+        # when
+        matching = filter_matching_constraint(TestMatchEngine.objects(), match, TestMatchEngine.namespaces())
+
+        # then
+        assert TestMatchEngine.names(matching) == ['pod-b']
+
+    @staticmethod
+    def objects():
+        return (
+            TestMatchEngine.review('v1', 'Pod', 'pod-a', 'default', {'app': 'a'}),
+            TestMatchEngine.review('v1', 'Pod', 'pod-b', 'production', {'app': 'b'}),
+            TestMatchEngine.review('apps/v1', 'Deployment', 'deployment-a', 'production', {'app': 'a', 'tier': 'web'}),
+            TestMatchEngine.review('rbac.authorization.k8s.io/v1', 'ClusterRole', 'cluster-role', 'default', None),
+        )
+
+    @staticmethod
+    def namespaces():
+        return (
+            TestMatchEngine.review('v1', 'Namespace', 'default', None, {}),
+            TestMatchEngine.review('v1', 'Namespace', 'production', None, {'environment': 'production'}),
+        )
+
+    @staticmethod
+    def review(api_version, kind, name, namespace, labels):
+        metadata = {'name': name, 'labels': labels}
+        if namespace:
+            metadata['namespace'] = namespace
+        return AdmissionReviewRequest({'apiVersion': api_version, 'kind': kind, 'metadata': metadata})
+
+    @staticmethod
+    def names(admission_reviews):
+        return [admission_review.name for admission_review in admission_reviews]
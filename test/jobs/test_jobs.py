@@ -0,0 +1,170 @@
+from argparse import Namespace
+from concurrent.futures import Future
+from os import path
+
+import pytest
+
+from common.exceptions import InvalidParametersError
+from common.files import create_temp_dir, write_to_file
+from jobs.jobs import JobEvaluations, get_values_jobs, read_jobs
+
+
+class TestJobs:
+    def test_should_read_jobs(self):
+        # given
+        job_file = path.join(create_temp_dir(cleanup=True), 'jobs.yaml')
+        write_to_file(job_file, '''
+jobs:
+  - name: simple
+    chart: test/charts/simple-chart
+    values: test/common/values.yaml
+    releaseName: simple
+  - kubernetesObjects: test/namespaces/namespaces.yaml
+''')
+
+        # when
+        jobs = read_jobs(job_file)
+
+        # then
+        assert len(jobs) == 2
+        assert jobs[0].name == 'simple'
+        assert jobs[1].name == 'test/namespaces/namespaces.yaml'
+
+    def test_should_read_jobs_listed_at_top_level(self):
+        # given
+        job_file = path.join(create_temp_dir(cleanup=True), 'jobs.yaml')
+        write_to_file(job_file, '''
+- name: simple
+  chart: test/charts/simple-chart
+- kubernetesObjects: test/namespaces/namespaces.yaml
+''')
+
+        # when
+        jobs = read_jobs(job_file)
+
+        # then
+        assert [job.name for job in jobs] == ['simple', 'test/namespaces/namespaces.yaml']
+
+    def test_should_override_args_with_job_options(self):
+        # given
+        job_file = path.join(create_temp_dir(cleanup=True), 'jobs.yaml')
+        write_to_file(job_file, '''
+jobs:
+  - chart: test/charts/simple-chart
+    values: test/common/values.yaml
+''')
+        args = Namespace(
+            input_chart=None,
+            input_chart_values=None,
+            input_chart_namespace='default',
+            input_chart_release_name='release',
+            input_kubernetes_objects=None,
+            input_namespaces_file='test/namespaces/namespaces.yaml',
+            jobs=4
+        )
+
+        # when
+        job_args = read_jobs(job_file)[0].get_args(args)
+
+        # then
+        assert job_args.input_chart == 'test/charts/simple-chart'
+        assert job_args.input_chart_values == 'test/common/values.yaml'
+        assert job_args.input_chart_namespace == 'default'
+        assert job_args.input_namespaces_file == 'test/namespaces/namespaces.yaml'
+        assert job_args.jobs == 4
+        assert args.input_chart is None
+
+    def test_should_fail_for_job_without_input(self):
+        # given
+        job_file = path.join(create_temp_dir(cleanup=True), 'jobs.yaml')
+        write_to_file(job_file, '''
+jobs:
+  - name: no-input
+    values: test/common/values.yaml
+''')
+
+        # when
+        with pytest.raises(InvalidParametersError):
+            read_jobs(job_file)
+
+    def test_should_fail_for_unknown_job_keys(self):
+        # given
+        job_file = path.join(create_temp_dir(cleanup=True), 'jobs.yaml')
+        write_to_file(job_file, '''
+jobs:
+  - chart: test/charts/simple-chart
+    value: test/common/values.yaml
+''')
+
+        # when
+        with pytest.raises(InvalidParametersError):
+            read_jobs(job_file)
+
+    def test_should_read_job_for_every_values_file(self):
+        # given
+        job_file = path.join(create_temp_dir(cleanup=True), 'jobs.yaml')
+        write_to_file(job_file, '''
+jobs:
+  - name: simple
+    chart: test/charts/simple-chart
+    values: [test/common/values.yaml, test/common/missing-values.yaml]
+''')
+
+        # when
+        jobs = read_jobs(job_file)
+
+        # then
+        assert len(jobs) == 2
+        assert jobs[0].name == 'simple (test/common/values.yaml)'
+        assert jobs[0].options['values'] == 'test/common/values.yaml'
+        assert jobs[1].name == 'simple (test/common/missing-values.yaml)'
+        assert jobs[1].options['values'] == 'test/common/missing-values.yaml'
+
+    def test_should_get_job_for_every_values_file(self):
+        # given
+        args = Namespace(
+            input_chart='test/charts/simple-chart',
+            input_chart_values=None,
+            input_chart_values_variants=('dev.yaml', 'prod.yaml')
+        )
+
+        # when
+        jobs = get_values_jobs(args)
+
+        # then
+        assert tuple(job.name for job in jobs) == (
+            'test/charts/simple-chart (dev.yaml)', 'test/charts/simple-chart (prod.yaml)'
+        )
+        assert jobs[1].get_args(args).input_chart_values == 'prod.yaml'
+        assert jobs[1].get_args(args).input_chart == 'test/charts/simple-chart'
+
+    def test_should_cancel_submitted_evaluations_when_stopped(self):
+        # given
+        job_evaluations = JobEvaluations()
+        future = Future()
+        evaluations = job_evaluations.submit(lambda: (('constraint', future),))
+
+        # when
+        job_evaluations.stop()
+        late_evaluations = job_evaluations.submit(lambda: (('constraint', Future()),))
+
+        # then
+        assert evaluations == (('constraint', future),)
+        assert future.cancelled()
+        assert late_evaluations == ()
+
+    def test_should_cancel_evaluations_submitted_while_stopping(self):
+        # given
+        job_evaluations = JobEvaluations()
+        future = Future()
+
+        def submit_evaluations():
+            job_evaluations.stop()
+            return (('constraint', future),)
+
+        # when
+        evaluations = job_evaluations.submit(submit_evaluations)
+
+        # then
+        assert evaluations == ()
+        assert future.cancelled()
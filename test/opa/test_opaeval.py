@@ -0,0 +1,48 @@
+from constrainttemplates.policy import Policy
+from opa import OpaEval, generate_wrapper
+
+
+class TestOpaEval:
+    def test_should_generate_wrapper_evaluating_every_document(self):
+        # given
+        with open('test/policy/k8srequiredlabels.rego') as f:
+            policy = Policy('k8srequiredlabels', f.read() + '\nwarn_missing_owner[msg] {\n  msg := "owner"\n}\n'
+                            + '\nwarn_if(labels) {\n  count(labels) == 0\n}\n'
+                            + '\ndenylisted[name] {\n  name := "gatekeeper"\n}\n')
+
+        # when
+        wrapper = generate_wrapper(policy)
+
+        # then
+        assert wrapper.startswith('package conftestrunner.k8srequiredlabels\n')
+        assert 'violation[index] = result {' in wrapper
+        assert 'result := data.k8srequiredlabels.violation with input as document' in wrapper
+        assert 'warn_missing_owner[index] = result {' in wrapper
+        assert 'result := data.k8srequiredlabels.warn_missing_owner with input as document' in wrapper
+        assert 'warn_if' not in wrapper
+        assert 'denylisted' not in wrapper
+
+    def test_should_evaluate_all_documents_in_one_query(self):
+        # given
+        with open('test/policy/k8srequiredlabels.rego') as f:
+            policy = Policy('k8srequiredlabels', f.read(), files=('test/policy/k8srequiredlabels.rego',))
+        documents = (
+            {
+                'review': {'object': {'metadata': {'name': 'first', 'labels': {'owner': 'test'}}}},
+                'parameters': {'labels': ['gatekeeper']},
+            },
+            {
+                'review': {'object': {'metadata': {'name': 'second', 'labels': {'gatekeeper': 'test'}}}},
+                'parameters': {'labels': ['gatekeeper']},
+            },
+        )
+
+        # when
+        with OpaEval('opa', 'test/policy') as opa_eval:
+            results = opa_eval.evaluate_documents(policy, documents)
+
+        # then
+        assert len(results) == 2
+        assert len(results[0]['violation']) == 1
+        assert results[0]['violation'][0]['details']['missing_labels'] == ['gatekeeper']
+        assert results[1]['violation'] == []
@@ -0,0 +1,55 @@
+from socket import socket
+
+import pytest
+
+from common.cmd import set_command_timeout
+from common.exceptions import OpaError
+from opa import OpaServer
+
+
+class TestOpaServer:
+    def test_should_evaluate_policy(self):
+        # given
+        document = {
+            'review': {'object': {'metadata': {'name': 'test', 'labels': {'owner': 'test'}}}},
+            'parameters': {'labels': ['gatekeeper']},
+        }
+
+        # when
+        with OpaServer('opa', 'test/policy') as opa_server:
+            result = opa_server.evaluate('k8srequiredlabels', document)
+
+        # then
+        assert 'violation' in result
+        assert len(result['violation']) == 1
+        assert result['violation'][0]['details']['missing_labels'] == ['gatekeeper']
+
+    def test_should_fail_for_undefined_policy(self):
+        # given
+        document = {'review': {}, 'parameters': {}}
+
+        # when
+        with OpaServer('opa', 'test/policy') as opa_server, pytest.raises(OpaError) as e:
+            opa_server.evaluate('k8srequiredlabel', document)
+
+        # then
+        assert 'k8srequiredlabel' in str(e.value)
+
+    def test_should_fail_if_opa_server_does_not_respond(self):
+        # given
+        opa_server = OpaServer('opa', 'test/policy')
+        set_command_timeout(0.1)
+
+        # when
+        try:
+            with socket() as listening_socket:
+                listening_socket.bind(('localhost', 0))
+                listening_socket.listen()
+                opa_server.address = f'localhost:{listening_socket.getsockname()[1]}'
+                with pytest.raises(OpaError) as e:
+                    opa_server.evaluate('k8srequiredlabels', {})
+        finally:
+            set_command_timeout(None)
+
+        # then
+        assert 'timed out' in str(e.value)
@@ -0,0 +1,79 @@
+from os import path, utime
+
+from common.files import create_temp_dir, write_to_file
+from constrainttemplates.policy import Policy
+from watch.watcher import Watcher, get_changed_constraints
+
+
+class TestWatcher:
+    def test_should_report_changed_sources(self):
+        # given
+        watched_dir = create_temp_dir(cleanup=True)
+        constraints_file = path.join(watched_dir, 'constraints.yaml')
+        namespaces_file = path.join(watched_dir, 'namespaces.yaml')
+        write_to_file(constraints_file, 'kind: K8sRequiredLabels')
+        write_to_file(namespaces_file, 'kind: Namespace')
+        watcher = Watcher({'constraints': (constraints_file,), 'namespaces': (namespaces_file, None)})
+
+        # when
+        unchanged_sources = watcher.poll()
+        write_to_file(constraints_file, 'kind: K8sRequiredLabels\nmetadata: {}')
+        utime(constraints_file, (0, 0))
+        changed_sources = watcher.poll()
+
+        # then
+        assert unchanged_sources == set()
+        assert changed_sources == {'constraints'}
+        assert watcher.poll() == set()
+
+    def test_should_report_changed_file_in_directory(self):
+        # given
+        chart_dir = create_temp_dir(cleanup=True)
+        write_to_file(path.join(chart_dir, 'Chart.yaml'), 'name: chart')
+        watcher = Watcher({'input': (chart_dir, path.join(chart_dir, 'missing-values.yaml'))})
+
+        # when
+        write_to_file(path.join(chart_dir, 'values.yaml'), 'labels: {}')
+        changed_sources = watcher.wait(0.01)
+
+        # then
+        assert changed_sources == {'input'}
+
+
+class TestChangedConstraints:
+    def test_should_get_changed_constraints(self):
+        # given
+        unchanged = {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'unchanged'}, 'spec': {'match': {}}}
+        edited = {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'edited'}, 'spec': {'match': {}}}
+        added = {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'added'}, 'spec': {'match': {}}}
+        edited_after = dict(edited, spec={'match': {}, 'parameters': {'labels': ['gatekeeper']}})
+        policies = {'K8sRequiredLabels': Policy('k8srequiredlabels', 'package k8srequiredlabels')}
+
+        # when
+        changed_constraints = get_changed_constraints(
+            (unchanged, edited_after, added), (unchanged, edited), policies, policies
+        )
+
+        # then
+        assert changed_constraints == (edited_after, added)
+
+    def test_should_get_constraints_of_changed_policy(self):
+        # given
+        required_labels = {'kind': 'K8sRequiredLabels', 'metadata': {'name': 'labels'}, 'spec': {'match': {}}}
+        allowed_repos = {'kind': 'K8sAllowedRepos', 'metadata': {'name': 'repos'}, 'spec': {'match': {}}}
+        previous_policies = {
+            'K8sRequiredLabels': Policy('k8srequiredlabels', 'package k8srequiredlabels'),
+            'K8sAllowedRepos': Policy('k8sallowedrepos', 'package k8sallowedrepos')
+        }
+        policies = dict(
+            previous_policies,
+            K8sRequiredLabels=Policy('k8srequiredlabels', 'package k8srequiredlabels\n\nviolation[{}] { false }')
+        )
+
+        # when
+        changed_constraints = get_changed_constraints(
+            (required_labels, allowed_repos), (required_labels, allowed_repos), policies, previous_policies
+        )
+
+        # then
+        assert changed_constraints == (required_labels,)